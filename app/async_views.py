@@ -0,0 +1,177 @@
+import asyncio
+import json
+import os
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import F, Prefetch
+from django.http import JsonResponse, Http404
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+
+from app.conditional import (get_content_etag, make_listing_etag, get_last_modified, request_not_modified,
+                             not_modified_response, set_validators)
+from app.db_router import read_from_replica
+from app.download_stats import record_download
+from app.models import User, File, Session
+from app.serializers import UserSerializer, FileSerializer
+from app.session_cache import get_session_cache
+from app.share_links import ShareLinkExpired, get_share_link_lookup
+from app.streaming import file_delivery_response
+from app.views import create_file_object, user_can_access_file
+
+
+# Асинхронные (ASGI) версии представлений для передачи файлов и проверки сессии: пока клиент медленно
+# получает или отправляет данные, рабочий процесс продолжает обслуживать другие запросы.
+# Представления DRF не поддерживают async, поэтому здесь используются обычные представления Django
+# с теми же форматами запросов и ответов
+
+
+# функция возвращает тело JSON-запроса в виде словаря; тело, не являющееся объектом JSON, считается некорректным
+def get_json_data(request):
+    if not request.body:
+        return {}
+    data = json.loads(request.body)
+    if not isinstance(data, dict):
+        raise ValueError("тело запроса должно быть объектом JSON")
+    return data
+
+
+# функция возвращает ответ 400 на некорректный запрос в формате синхронных представлений
+def bad_request_response(error):
+    return JsonResponse({
+        "status_code": 400,
+        "status": "ERROR",
+        "error_message": f"Некорректный запрос: {error}"
+    }, status=400)
+
+
+@csrf_exempt
+@require_http_methods(["PATCH"])
+async def async_download_file(request):
+    try:
+        request_data = get_json_data(request)
+        user_id, file_id, is_user_files_for_admin = (
+            request_data["user_id"],
+            request_data["file_id"],
+            request_data["is_user_files_for_admin"]
+        )
+
+        file_obj = await File.objects.select_related("blob").aget(id=file_id)
+        if user_can_access_file(file_obj, user_id, is_user_files_for_admin):
+            file_path = file_obj.file_content.path
+            if not await asyncio.to_thread(os.path.exists, file_path):
+                raise Http404("File does not exist")
+
+            # os.stat и открытие файла выполняются в пуле потоков, а не в цикле событий
+            response = await sync_to_async(file_delivery_response, thread_sensitive=False)(
+                request, file_path, file_obj.file_name, codec=file_obj.codec, original_size=file_obj.original_size,
+                etag=get_content_etag(file_obj), asynchronous=True
+            )
+            if response.status_code != 304:
+                record_download(file_obj.id)
+            return response
+
+        return JsonResponse({"Error_message": "Недостаточно прав"}, status=401)
+
+    except (ValueError, KeyError) as e:
+        return bad_request_response(e)
+
+    except ObjectDoesNotExist:
+        raise Http404("File is not found")
+
+
+@require_http_methods(["GET"])
+@read_from_replica
+async def async_retrieve_by_link(request):
+    try:
+        file_link = request.GET.get("link")
+        file_instance = await File.objects.annotate(
+            files_version=F("user__files_version"),
+            files_changed_at=F("user__files_changed_at")
+        ).aget(**get_share_link_lookup(file_link))
+
+        etag = make_listing_etag("file", file_instance.id, file_instance.files_version)
+        last_modified = get_last_modified(file_instance.files_changed_at)
+        if request_not_modified(request, etag, last_modified):
+            return not_modified_response(etag, last_modified)
+
+        serializer = FileSerializer(file_instance)
+        return set_validators(JsonResponse(serializer.data), etag, last_modified)
+    except ObjectDoesNotExist:
+        return JsonResponse({"Error": "File is not found"}, status=404)
+    except ShareLinkExpired as e:
+        return JsonResponse({"Error": f"{e}"}, status=410)
+    except Exception as e:
+        return JsonResponse({"Error": f"{e}"}, status=500)
+
+
+@require_http_methods(["GET"])
+@read_from_replica
+async def async_get_mycloud_user(request):
+    try:
+        session_id = request.COOKIES.get("user_session_id", None)
+        if session_id is not None:
+            # кэш сессий может обращаться к внешнему хранилищу (django), поэтому вызывается в пуле потоков
+            exist_session_user = await sync_to_async(get_session_cache().get, thread_sensitive=False)(session_id)
+
+            if exist_session_user is None:
+                user_session = await Session.objects.filter(session_id=session_id).afirst()
+                if user_session is not None:
+                    user = await User.objects.prefetch_related(
+                        Prefetch('files', queryset=File.objects.only('id', 'user_id'))
+                    ).filter(login=user_session.login).afirst()
+                    if user is not None:
+                        exist_session_user = UserSerializer(user).data
+                        await sync_to_async(get_session_cache().set, thread_sensitive=False)(
+                            session_id, exist_session_user["id"], exist_session_user
+                        )
+
+            if exist_session_user is not None:
+                return JsonResponse({
+                    "status_code": 200,
+                    "status": True,
+                    "user": exist_session_user
+                })
+
+        return JsonResponse({"Error_message": "Ошибка авторизации"}, status=401)
+
+    except Exception as e:
+        return JsonResponse({"Error": f"{e}"}, status=500)
+
+
+# функция возвращает поля формы загрузки файла. Разбор multipart-тела записывает большие файлы во временные
+# файлы на диске, поэтому request.POST и request.FILES читаются в пуле потоков, а не в цикле событий
+def get_create_file_data(request):
+    return (
+        request.POST["file_name"],
+        request.POST["user_id"],
+        request.POST["comment"],
+        request.FILES["new_file"],
+        request.POST["file_size"],
+        request.POST["extension"]
+    )
+
+
+# При работе через ASGI тело запроса вычитывается сервером асинхронно ещё до вызова представления,
+# поэтому медленная отправка файла клиентом не занимает поток; сохранение файла выполняется в пуле потоков
+@csrf_exempt
+@require_http_methods(["POST"])
+async def async_create_file(request):
+    try:
+        file_name, user_id, comment, file_content, file_size, extension = await sync_to_async(
+            get_create_file_data
+        )(request)
+
+        file = await sync_to_async(create_file_object)(user_id, file_name, comment, file_content, file_size, extension)
+
+        file_data = FileSerializer(file).data
+        content = {
+            "status_code": 200,
+            "status": "OK",
+            "create_object": file_data
+        }
+        return JsonResponse(content)
+
+    except Exception as e:
+        return JsonResponse({"Error": f"{e}"}, status=500)
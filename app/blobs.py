@@ -0,0 +1,190 @@
+import hashlib
+import os
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.files.move import file_move_safe
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from app.compression import write_compressed_content
+from app.models import Blob
+
+
+BLOBS_DIR_NAME = "blobs"
+# каталог, в который новый блоб записывается до фиксации транзакции; файлы старше BLOB_STAGING_MAX_AGE секунд
+# остались от отменённых транзакций и удаляются
+BLOB_STAGING_DIR_NAME = "tmp"
+BLOB_STAGING_MAX_AGE = 60 * 60
+
+
+# функция возвращает путь блоба относительно MEDIA_ROOT: blobs/ab/cd/<sha256>
+def get_blob_storage_path(sha256):
+    return f"{BLOBS_DIR_NAME}/{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+
+# функция вычисляет sha256 и размер загруженного содержимого, читая его блоками
+def get_content_hash(content):
+    content_hash = hashlib.sha256()
+    content_size = 0
+    for chunk in content.chunks(settings.FILE_STREAM_CHUNK_SIZE):
+        content_hash.update(chunk)
+        content_size += len(chunk)
+    return content_hash.hexdigest(), content_size
+
+
+# функция записывает содержимое в хранилище блобов (сжимая его, если указан codec); если несжимаемое содержимое
+# уже лежит на диске во временном файле, он перемещается без копирования
+def write_blob_content(content, storage_path, codec=""):
+    full_path = get_blob_full_path(storage_path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+
+    if codec:
+        write_compressed_content(content, full_path)
+    elif hasattr(content, "temporary_file_path"):
+        file_move_safe(content.temporary_file_path(), full_path, allow_overwrite=True)
+    else:
+        with open(full_path, "wb") as blob_file:
+            for chunk in content.chunks(settings.FILE_STREAM_CHUNK_SIZE):
+                blob_file.write(chunk)
+
+
+# функция возвращает полный путь к файлу в хранилище блобов
+def get_blob_full_path(storage_path):
+    return os.path.join(settings.MEDIA_ROOT, storage_path)
+
+
+# функция удаляет из каталога промежуточных файлов блобов файлы отменённых транзакций
+def remove_stale_staged_blobs():
+    staging_dir = get_blob_full_path(f"{BLOBS_DIR_NAME}/{BLOB_STAGING_DIR_NAME}")
+    stale_before = time.time() - BLOB_STAGING_MAX_AGE
+    try:
+        entries = list(os.scandir(staging_dir))
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        try:
+            if entry.stat().st_mtime < stale_before:
+                os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+
+
+# функция записывает содержимое блоба во временный файл и возвращает его полный путь; время изменения файла
+# обновляется, так как перемещённый файл сохраняет время изменения исходного
+def stage_blob_content(content, codec=""):
+    remove_stale_staged_blobs()
+    staging_storage_path = f"{BLOBS_DIR_NAME}/{BLOB_STAGING_DIR_NAME}/{uuid.uuid4().hex}"
+    write_blob_content(content, staging_storage_path, codec)
+    staging_path = get_blob_full_path(staging_storage_path)
+    os.utime(staging_path)
+    return staging_path
+
+
+# функция атомарно перемещает временный файл блоба на его постоянное место
+def publish_staged_blob(staging_path, storage_path):
+    full_path = get_blob_full_path(storage_path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    os.replace(staging_path, full_path)
+
+
+# функция возвращает блоб с таким же содержимым, увеличивая число ссылок на него,
+# или создаёт новый блоб; физическая запись на диск выполняется только для нового содержимого.
+# Новый блоб записывается во временный файл и перемещается на место только после фиксации транзакции,
+# поэтому откат транзакции не оставляет в хранилище файл без записи Blob (временный файл удаляется позже).
+# Блоб идентифицируется по sha256 исходного содержимого, поэтому существующий блоб используется
+# со своим способом сжатия независимо от переданного codec
+def store_blob(content, codec=""):
+    sha256, content_size = get_content_hash(content)
+
+    with transaction.atomic():
+        # блокировка строки упорядочивает загрузку с удалением блоба без ссылок (remove_unused_blobs)
+        blob = Blob.objects.select_for_update().filter(sha256=sha256).first()
+        if blob is not None:
+            Blob.objects.filter(id=blob.id).update(ref_count=F("ref_count") + 1)
+            blob.refresh_from_db()
+            # файла может не быть, если процесс, создавший блоб, завершился до перемещения файла на место
+            if not os.path.exists(get_blob_full_path(blob.storage_path)):
+                publish_staged_blob(stage_blob_content(content, blob.codec), blob.storage_path)
+            return blob
+
+        storage_path = get_blob_storage_path(sha256)
+        staging_path = stage_blob_content(content, codec)
+        try:
+            with transaction.atomic():
+                blob = Blob.objects.create(
+                    sha256=sha256, size=content_size, storage_path=storage_path, codec=codec, ref_count=1
+                )
+        except IntegrityError:
+            # такой же блоб одновременно создан другим запросом, используем его
+            os.remove(staging_path)
+            Blob.objects.filter(sha256=sha256).update(ref_count=F("ref_count") + 1)
+            return Blob.objects.get(sha256=sha256)
+
+    transaction.on_commit(lambda: publish_staged_blob(staging_path, storage_path))
+    return blob
+
+
+deferred_release = threading.local()
+
+
+# функция уменьшает число ссылок на блобы (идентификатор может повторяться); запросы выполняются для всего
+# набора блобов сразу. Блобы, на которые не осталось ссылок, удаляются после фиксации транзакции: при её откате
+# восстановленные записи File должны ссылаться на существующее содержимое
+def release_blobs(blob_ids):
+    released_counts = Counter(blob_ids)
+    if not released_counts:
+        return
+
+    with transaction.atomic():
+        blobs = list(Blob.objects.select_for_update().filter(id__in=released_counts))
+
+        ids_by_decrement = {}
+        for blob in blobs:
+            decrement = min(released_counts[blob.id], blob.ref_count)
+            ids_by_decrement.setdefault(decrement, []).append(blob.id)
+        for decrement, ids in ids_by_decrement.items():
+            Blob.objects.filter(id__in=ids).update(ref_count=F("ref_count") - decrement)
+
+        unused_ids = [blob.id for blob in blobs if blob.ref_count <= released_counts[blob.id]]
+        if unused_ids:
+            transaction.on_commit(lambda: remove_unused_blobs(unused_ids), robust=True)
+
+
+# функция удаляет блобы без ссылок вместе с файлами. Строки блокируются и проверяются заново: store_blob,
+# загружающий такое же содержимое, ждёт эту блокировку и либо раньше снова начинает использовать блоб
+# (тогда он не удаляется), либо после удаления создаёт новый блоб и записывает файл заново
+def remove_unused_blobs(blob_ids):
+    with transaction.atomic():
+        blobs = list(Blob.objects.select_for_update().filter(id__in=blob_ids, ref_count__lte=0))
+        Blob.objects.filter(id__in=[blob.id for blob in blobs]).delete()
+        for blob in blobs:
+            full_path = get_blob_full_path(blob.storage_path)
+            if os.path.exists(full_path):
+                os.remove(full_path)
+
+
+# функция освобождает ссылку на блоб сразу или, внутри batched_blob_release, откладывает её до конца блока
+def release_blob(blob_id):
+    pending_blob_ids = getattr(deferred_release, "blob_ids", None)
+    if pending_blob_ids is not None:
+        pending_blob_ids.append(blob_id)
+        return
+    release_blobs([blob_id])
+
+
+# контекстный менеджер для групповых удалений: ссылки на блобы освобождаются одним набором запросов
+# после успешного удаления всех файлов, а не отдельно для каждого файла
+@contextmanager
+def batched_blob_release():
+    deferred_release.blob_ids = []
+    try:
+        yield
+        blob_ids = deferred_release.blob_ids
+    finally:
+        deferred_release.blob_ids = None
+    release_blobs(blob_ids)
@@ -0,0 +1,77 @@
+import gzip
+import os
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+
+
+GZIP_CODEC = "gzip"
+TEMPORARY_DIR_NAME = "tmp"
+
+# типы файлов, которые обычно сжимаются в несколько раз: текст, логи, таблицы, JSON и XML
+COMPRESSIBLE_EXTENSIONS = {
+    '.css', '.csv', '.htm', '.html', '.ini', '.js', '.json', '.log', '.md', '.sql', '.svg', '.tsv', '.txt',
+    '.xml', '.yaml', '.yml'
+}
+COMPRESSIBLE_CONTENT_TYPES = ('text/', 'application/json', 'application/xml', 'application/x-ndjson')
+
+
+# функция выбирает способ сжатия содержимого при сохранении: gzip для сжимаемых типов файлов
+# или пустую строку, если файл хранится как есть
+def get_content_codec(file_name, content_type, content_size):
+    if not settings.FILE_COMPRESSION_ENABLED or content_size < settings.FILE_COMPRESSION_MIN_SIZE:
+        return ""
+
+    extension = os.path.splitext(file_name)[1].lower()
+    if extension in COMPRESSIBLE_EXTENSIONS or (content_type or "").startswith(COMPRESSIBLE_CONTENT_TYPES):
+        return GZIP_CODEC
+    return ""
+
+
+# функция сжимает содержимое в файл блоками по мере чтения, не загружая его в память целиком
+def write_compressed_content(content, target_path):
+    with open(target_path, "wb") as target_file:
+        # mtime=0 делает результат сжатия одинакового содержимого побайтно одинаковым
+        with gzip.GzipFile(fileobj=target_file, mode="wb", compresslevel=settings.FILE_COMPRESSION_LEVEL,
+                           mtime=0) as compressed_file:
+            for chunk in content.chunks(settings.FILE_STREAM_CHUNK_SIZE):
+                compressed_file.write(chunk)
+
+
+# контекстный менеджер сжимает содержимое во временный файл внутри MEDIA_ROOT и возвращает его в виде файла,
+# который хранилище Django переместит на место без копирования. При выходе из блока файл закрывается,
+# а если он не был перемещён (сохранение не удалось), удаляется
+@contextmanager
+def compress_to_staging_file(content, file_name):
+    from app.uploads import StagedUploadFile
+
+    temporary_dir = os.path.join(settings.MEDIA_ROOT, TEMPORARY_DIR_NAME)
+    os.makedirs(temporary_dir, exist_ok=True)
+    file_descriptor, temporary_path = tempfile.mkstemp(dir=temporary_dir, suffix=".gz")
+    os.close(file_descriptor)
+
+    try:
+        write_compressed_content(content, temporary_path)
+        with StagedUploadFile(temporary_path, file_name) as staged_file:
+            yield staged_file
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+
+# функция открывает сохранённое содержимое для чтения; сжатые файлы распаковываются на лету при чтении
+def open_stored_file(file_path, codec):
+    if codec == GZIP_CODEC:
+        return gzip.open(file_path, "rb")
+    return open(file_path, "rb")
+
+
+# функция проверяет, принимает ли клиент ответ, сжатый gzip
+def client_accepts_gzip(request):
+    accept_encoding = request.headers.get("Accept-Encoding", "")
+    for encoding in accept_encoding.split(","):
+        name, _, params = encoding.strip().partition(";")
+        if name.strip().lower() in ("gzip", "*") and params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00"):
+            return True
+    return False
@@ -0,0 +1,86 @@
+import hashlib
+import json
+from datetime import datetime, timezone
+
+from django.db.models import F
+from django.http import HttpResponse
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+
+from app.models import User
+
+
+# Условные запросы (If-None-Match / If-Modified-Since): если у клиента или CDN актуальная копия ответа,
+# возвращается 304 Not Modified без тела, а сериализация и чтение файла не выполняются.
+# Для содержимого файлов используются строгие ETag (sha256 блоба или размер и время изменения файла),
+# для списков - слабые ETag по версии списка файлов пользователя (User.files_version)
+
+
+# функция увеличивает версию списка файлов пользователей; user_ids - список id или подзапрос
+def bump_files_version(user_ids):
+    User.objects.filter(id__in=user_ids).update(
+        files_version=F("files_version") + 1,
+        files_changed_at=datetime.now(timezone.utc)
+    )
+
+
+# функция возвращает слабый ETag списка: версия данных и параметры запроса (страница, поля), от которых зависит ответ
+def make_listing_etag(kind, object_id, version, params=None):
+    params_digest = ""
+    if params:
+        params_digest = "-" + hashlib.sha1(
+            json.dumps(params, sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()[:12]
+    return f'W/"{kind}-{object_id}-{version}{params_digest}"'
+
+
+# функция возвращает строгий ETag содержимого файла по контрольной сумме блоба или None,
+# если файл хранится вне хранилища блобов и ETag нужно вычислить по размеру и времени изменения
+def get_content_etag(file_obj):
+    if file_obj.blob_id is not None:
+        return f'"{file_obj.blob.sha256}"'
+    return None
+
+
+# функция возвращает ETag сжатого представления файла, отличающийся от ETag исходного содержимого
+def get_encoded_etag(etag, codec):
+    return f'{etag[:-1]}-{codec}"'
+
+
+# функция переводит дату изменения в секунды для заголовка Last-Modified
+def get_last_modified(changed_at):
+    if changed_at is None:
+        return None
+    return int(changed_at.timestamp())
+
+
+# функция проверяет, совпадает ли копия клиента с текущей версией ответа;
+# If-Modified-Since учитывается, только если клиент не прислал If-None-Match
+def request_not_modified(request, etag, last_modified=None):
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match is not None:
+        if etag is None:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        # для If-None-Match используется слабое сравнение: префикс W/ не учитывается
+        client_etags = {client_etag.removeprefix("W/") for client_etag in parse_etags(if_none_match)}
+        return etag.removeprefix("W/") in client_etags
+
+    if_modified_since = parse_http_date_safe(request.headers.get("If-Modified-Since", ""))
+    return if_modified_since is not None and last_modified is not None and last_modified <= if_modified_since
+
+
+# функция возвращает ответ 304 Not Modified с текущими валидаторами
+def not_modified_response(etag, last_modified=None):
+    response = HttpResponse(status=304)
+    set_validators(response, etag, last_modified)
+    return response
+
+
+# функция добавляет в ответ заголовки ETag и Last-Modified
+def set_validators(response, etag, last_modified=None):
+    if etag is not None:
+        response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified)
+    return response
@@ -0,0 +1,129 @@
+import contextvars
+import functools
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+# cookie с моментом (timestamp), до которого чтения клиента выполняются на основной базе данных после его записи
+PRIMARY_PIN_COOKIE = "db_primary_until"
+
+# состояние маршрутизации текущего HTTP-запроса: разрешено ли чтение с реплики, выбранная реплика, была ли
+# запись и закреплён ли клиент за основной базой данных; ContextVar работает и для потоков WSGI,
+# и для асинхронных представлений ASGI (запросы ORM из них выполняются в потоке с копией контекста)
+current_routing_state = contextvars.ContextVar("current_routing_state", default=None)
+
+
+# Маршрутизатор баз данных: все записи выполняются на основной базе данных (default), а чтения в представлениях,
+# помеченных декоратором read_from_replica, - на одной из реплик DATABASE_REPLICAS. Чтения идут на основную
+# базу данных, если в текущем запросе уже была запись, если открыта транзакция или если клиент недавно
+# записывал данные (cookie PRIMARY_PIN_COOKIE), поэтому клиент сразу видит свои изменения
+class ReadReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = current_routing_state.get()
+        if state is None or not state["replica_reads"] or state["wrote"] or state["pinned"]:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+
+        # в пределах одного запроса чтения выполняются на одной реплике, чтобы не видеть разные состояния данных
+        if state["replica"] is None:
+            state["replica"] = random.choice(settings.DATABASE_REPLICAS)
+        return state["replica"]
+
+    def db_for_write(self, model, **hints):
+        state = current_routing_state.get()
+        if state is not None:
+            state["wrote"] = True
+        return DEFAULT_DB_ALIAS
+
+    # реплики содержат те же данные, что и основная база данных, поэтому связи между объектами разрешены
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+# функция проверяет, закреплён ли клиент за основной базой данных после своей записи
+def is_pinned_to_primary(request):
+    try:
+        return float(request.COOKIES.get(PRIMARY_PIN_COOKIE) or 0) > time.time()
+    except ValueError:
+        return False
+
+
+# функция закрепляет клиента за основной базой данных на DATABASE_READ_YOUR_WRITES_WINDOW секунд после записи
+def set_primary_pin(response):
+    window = settings.DATABASE_READ_YOUR_WRITES_WINDOW
+    response.set_cookie(
+        PRIMARY_PIN_COOKIE,
+        value=f"{time.time() + window:.3f}",
+        max_age=window,
+        secure=settings.SESSION_COOKIE_SECURE,
+        httponly=True,
+        samesite=settings.SESSION_COOKIE_SAMESITE
+    )
+    return response
+
+
+# Middleware создаёт состояние маршрутизации для каждого запроса и после запроса, в котором была запись
+# в базу данных, выставляет cookie закрепления за основной базой данных. Без настроенных реплик не делает ничего
+class ReadReplicaMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = bool(settings.DATABASE_REPLICAS)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+
+        state = {"replica_reads": False, "replica": None, "wrote": False, "pinned": is_pinned_to_primary(request)}
+        token = current_routing_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_routing_state.reset(token)
+        return set_primary_pin(response) if state["wrote"] else response
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+
+        state = {"replica_reads": False, "replica": None, "wrote": False, "pinned": is_pinned_to_primary(request)}
+        token = current_routing_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_routing_state.reset(token)
+        return set_primary_pin(response) if state["wrote"] else response
+
+
+# декоратор разрешает представлению (синхронному или асинхронному) читать данные с реплики
+def read_from_replica(view):
+    if iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            state = current_routing_state.get()
+            if state is not None:
+                state["replica_reads"] = True
+            return await view(request, *args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        state = current_routing_state.get()
+        if state is not None:
+            state["replica_reads"] = True
+        return view(request, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,127 @@
+import atexit
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Case, F, IntegerField, Q, Value, When
+
+from app.conditional import bump_files_version
+from app.models import User, File
+
+
+logger = logging.getLogger(__name__)
+
+# количество файлов в одном UPDATE при сбросе буфера
+FLUSH_BATCH_SIZE = 500
+
+
+# Буфер статистики скачиваний: события копятся в памяти процесса и записываются в базу данных
+# фоновым потоком раз в DOWNLOAD_STATS_FLUSH_INTERVAL секунд (или раньше, когда в буфере накопилось
+# DOWNLOAD_STATS_BUFFER_SIZE файлов) одним UPDATE на пачку, а не отдельной записью на каждое скачивание
+class DownloadStatsBuffer:
+    def __init__(self, flush_interval, max_size):
+        self.flush_interval = flush_interval
+        self.max_size = max_size
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.flush_requested = threading.Event()
+        self.flush_thread = None
+
+    def record(self, file_id, download_date):
+        with self.lock:
+            download_count, _ = self.pending.get(file_id, (0, None))
+            self.pending[file_id] = (download_count + 1, download_date)
+            buffer_is_full = len(self.pending) >= self.max_size
+
+        self.start()
+        if buffer_is_full:
+            self.flush_requested.set()
+
+    def start(self):
+        if self.flush_thread is None:
+            with self.lock:
+                if self.flush_thread is None:
+                    self.flush_thread = threading.Thread(
+                        target=self.run, name="download-stats-flush", daemon=True
+                    )
+                    self.flush_thread.start()
+                    atexit.register(self.flush)
+
+    def run(self):
+        while True:
+            self.flush_requested.wait(self.flush_interval)
+            self.flush_requested.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Не удалось записать статистику скачиваний")
+            finally:
+                connections.close_all()
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+
+        items = list(pending.items())
+        for start in range(0, len(items), FLUSH_BATCH_SIZE):
+            try:
+                update_download_stats(items[start:start + FLUSH_BATCH_SIZE])
+            except Exception:
+                # незаписанные пачки возвращаются в буфер и будут записаны при следующем сбросе
+                self.restore(items[start:])
+                raise
+
+    # функция возвращает незаписанную статистику в буфер, складывая её со скачиваниями, учтёнными после сброса
+    def restore(self, items):
+        with self.lock:
+            for file_id, (download_count, download_date) in items:
+                pending_count, pending_date = self.pending.get(file_id, (0, download_date))
+                self.pending[file_id] = (download_count + pending_count, max(download_date, pending_date))
+
+
+# функция записывает накопленную статистику пачки файлов одним UPDATE. Счётчик скачиваний входит в список файлов,
+# но версия списков владельцев увеличивается не чаще раза в DOWNLOAD_STATS_LISTING_REFRESH_INTERVAL секунд:
+# иначе частые скачивания сбрасывали бы ETag списка каждые несколько секунд и ответы 304 не работали бы
+def update_download_stats(items):
+    File.objects.filter(id__in=[file_id for file_id, _ in items]).update(
+        download_count=F('download_count') + Case(
+            *[When(id=file_id, then=Value(download_count)) for file_id, (download_count, _) in items],
+            default=Value(0),
+            output_field=IntegerField()
+        ),
+        last_upload_date=Case(
+            *[When(id=file_id, then=Value(download_date)) for file_id, (_, download_date) in items],
+            default=F('last_upload_date')
+        )
+    )
+    refresh_before = datetime.now(timezone.utc) - timedelta(seconds=settings.DOWNLOAD_STATS_LISTING_REFRESH_INTERVAL)
+    bump_files_version(
+        User.objects.filter(
+            Q(files_changed_at__isnull=True) | Q(files_changed_at__lt=refresh_before),
+            id__in=File.objects.filter(id__in=[file_id for file_id, _ in items]).values('user_id')
+        ).values('id')
+    )
+
+
+download_stats_buffer = None
+download_stats_lock = threading.Lock()
+
+
+# функция возвращает буфер статистики скачиваний текущего процесса
+def get_download_stats_buffer():
+    global download_stats_buffer
+    if download_stats_buffer is None:
+        with download_stats_lock:
+            if download_stats_buffer is None:
+                download_stats_buffer = DownloadStatsBuffer(
+                    settings.DOWNLOAD_STATS_FLUSH_INTERVAL,
+                    settings.DOWNLOAD_STATS_BUFFER_SIZE
+                )
+    return download_stats_buffer
+
+
+# функция регистрирует скачивание файла без записи в базу данных на пути запроса
+def record_download(file_id):
+    get_download_stats_buffer().record(file_id, datetime.now(timezone.utc))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from app.uploads import clear_expired_upload_sessions
+
+
+# Команда удаляет брошенные сессии возобновляемой загрузки и их промежуточные файлы,
+# её удобно запускать периодически, например из cron
+class Command(BaseCommand):
+    help = "Удаляет сессии загрузки с истёкшим сроком действия вместе с промежуточными файлами"
+
+    def handle(self, *args, **options):
+        deleted_count = clear_expired_upload_sessions()
+        self.stdout.write(self.style.SUCCESS(f"Удалено сессий загрузки: {deleted_count}"))
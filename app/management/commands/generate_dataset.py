@@ -0,0 +1,195 @@
+import math
+import os
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from app.models import User, File, Session
+from app.share_links import make_share_token
+from app.storage_layout import make_file_path_in_user_dir
+from app.storage_analytics import apply_summary_changes, collect_summary_changes
+
+
+# слова для имён файлов и комментариев
+NAME_WORDS = (
+    'report', 'invoice', 'photo', 'scan', 'contract', 'notes', 'backup', 'draft', 'presentation', 'budget',
+    'summary', 'plan', 'schedule', 'diagram', 'letter', 'resume', 'archive', 'export', 'design', 'meeting'
+)
+COMMENT_WORDS = ('важно', 'проверить', 'черновик', 'итог', 'для отчёта', 'копия', 'старая версия', 'на подпись')
+
+# расширения файлов с весами и медианой размера в байтах: размеры распределены логнормально вокруг медианы
+FILE_TYPES = (
+    ('.jpg', 30, 2 * 1024 * 1024),
+    ('.png', 10, 500 * 1024),
+    ('.pdf', 20, 800 * 1024),
+    ('.docx', 12, 120 * 1024),
+    ('.xlsx', 8, 80 * 1024),
+    ('.txt', 8, 8 * 1024),
+    ('.csv', 4, 200 * 1024),
+    ('.zip', 5, 20 * 1024 * 1024),
+    ('.mp4', 3, 150 * 1024 * 1024),
+)
+
+
+# Команда генерирует синтетический набор данных для проверки масштабирования запросов: пользователей,
+# их файлы (только метаданные или с разреженными файлами на диске, которые не занимают места) и сессии.
+# Записи создаются bulk_create пачками по --batch-size, поэтому миллион файлов создаётся за минуты
+# и без загрузки всего набора в память
+class Command(BaseCommand):
+    help = "Генерирует синтетических пользователей, файлы и сессии для нагрузочного тестирования"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000, help="Количество пользователей")
+        parser.add_argument("--files", type=int, default=100000, help="Общее количество файлов")
+        parser.add_argument("--sessions", type=float, default=0.3, help="Доля пользователей с открытой сессией")
+        parser.add_argument("--shared", type=float, default=0.1, help="Доля файлов со ссылкой для доступа")
+        parser.add_argument("--payload", choices=("none", "sparse"), default="none",
+                            help="none - только записи в базе данных, sparse - разреженные файлы на диске")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Количество записей в одном bulk_create")
+        parser.add_argument("--prefix", default="synthetic", help="Префикс логинов создаваемых пользователей")
+        parser.add_argument("--seed", type=int, default=1, help="Начальное значение генератора случайных чисел")
+
+    def handle(self, *args, **options):
+        users_count = options["users"]
+        files_count = options["files"]
+        batch_size = options["batch_size"]
+        prefix = options["prefix"]
+        if users_count < 1 or files_count < 0 or batch_size < 1:
+            raise CommandError("Количество пользователей и размер пачки должны быть положительными")
+        if User.objects.filter(login__startswith=prefix).exists():
+            raise CommandError(f"Пользователи с префиксом {prefix} уже существуют, укажите другой --prefix")
+
+        self.random = random.Random(options["seed"])
+        self.now = datetime.now(timezone.utc)
+        self.password_hash = make_password(f"{prefix}#Pass1")
+        self.file_types = [file_type for file_type, _, _ in FILE_TYPES]
+        self.file_weights = [weight for _, weight, _ in FILE_TYPES]
+        self.median_sizes = {file_type: median for file_type, _, median in FILE_TYPES}
+
+        # количество файлов у пользователей распределено неравномерно (степенной закон): у немногих
+        # пользователей тысячи файлов, у большинства - десятки
+        weights = [1 / (index + 1) ** 0.8 for index in range(users_count)]
+        weights_sum = sum(weights)
+        files_per_user = [int(files_count * weight / weights_sum) for weight in weights]
+        files_per_user[0] += files_count - sum(files_per_user)
+        self.random.shuffle(files_per_user)
+
+        created_files = 0
+        for start in range(0, users_count, batch_size):
+            batch_files_counts = files_per_user[start:start + batch_size]
+            created_files += self.create_users_batch(start, batch_files_counts, options)
+            self.stdout.write(
+                f"Пользователей: {start + len(batch_files_counts)} из {users_count}, файлов: {created_files}"
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Создано пользователей: {users_count}, файлов: {created_files}"
+        ))
+
+    def create_users_batch(self, start, files_counts, options):
+        prefix = options["prefix"]
+        batch_size = options["batch_size"]
+
+        # файлы генерируются до создания пользователей, чтобы сразу записать files_storage_size
+        files_by_user = [[self.make_file_data() for _ in range(files_count)] for files_count in files_counts]
+
+        with transaction.atomic():
+            users = User.objects.bulk_create([
+                User(
+                    name=f"{prefix.title()} {start + index}",
+                    login=f"{prefix}{start + index}",
+                    password=self.password_hash,
+                    email=f"{prefix}{start + index}@example.com",
+                    files_storage_size=sum(file_data["file_size"] for file_data in user_files)
+                )
+                for index, user_files in enumerate(files_by_user)
+            ], batch_size=batch_size)
+            if users[0].pk is None:
+                users = list(User.objects.filter(login__startswith=prefix).order_by("id")[start:start + len(users)])
+
+            Session.objects.bulk_create([
+                Session(session_id=str(uuid.uuid4()), login=user.login, user=user)
+                for user in users
+                if self.random.random() < options["sessions"]
+            ], batch_size=batch_size)
+
+            file_objects = []
+            created_files = 0
+            for user, user_files in zip(users, files_by_user):
+                for file_data in user_files:
+                    file_objects.append(self.make_file(user, file_data, options))
+                    if len(file_objects) >= batch_size:
+                        created_files += self.create_files(file_objects, options)
+                        file_objects = []
+            created_files += self.create_files(file_objects, options)
+
+        return created_files
+
+    def make_file_data(self):
+        extension = self.random.choices(self.file_types, self.file_weights)[0]
+        median_size = self.median_sizes[extension]
+        file_size = max(int(self.random.lognormvariate(math.log(median_size), 1.0)), 1)
+        # размер поля file_size ограничен IntegerField
+        file_size = min(file_size, 2 ** 31 - 1)
+
+        words = self.random.sample(NAME_WORDS, self.random.randint(1, 3))
+        # часть имён повторяется, как у реальных пользователей (scan.pdf, photo.jpg)
+        if self.random.random() < 0.7:
+            words.append(str(self.random.randint(1, 500)))
+
+        return {
+            "file_name": "_".join(words) + extension,
+            "extension": extension,
+            "file_size": file_size,
+            "date": self.now - timedelta(seconds=self.random.randint(0, 365 * 24 * 3600)),
+        }
+
+    def make_file(self, user, file_data, options):
+        file_path_in_user_dir = make_file_path_in_user_dir(file_data["extension"])
+        return File(
+            user=user,
+            file_content=f"user_{user.id}/{file_path_in_user_dir}",
+            file_name=file_data["file_name"],
+            file_path_in_user_dir=file_path_in_user_dir,
+            file_link="",
+            file_size=file_data["file_size"],
+            original_size=file_data["file_size"],
+            date=file_data["date"],
+            last_upload_date=file_data["date"] if self.random.random() < 0.4 else None,
+            download_count=int(self.random.expovariate(0.2)),
+            comment=self.random.choice(COMMENT_WORDS) if self.random.random() < 0.5 else ""
+        )
+
+    def create_files(self, file_objects, options):
+        if not file_objects:
+            return 0
+
+        created = File.objects.bulk_create(file_objects)
+        # bulk_create не отправляет post_save, поэтому сводная таблица аналитики обновляется явно и сразу,
+        # без буфера процесса, который команда не успела бы записать
+        apply_summary_changes(collect_summary_changes(created, 1))
+
+        # ссылки содержат id файла, поэтому выдаются после создания записей
+        shared_files = [file_obj for file_obj in created if self.random.random() < options["shared"]]
+        if shared_files and shared_files[0].pk is not None:
+            for file_obj in shared_files:
+                file_obj.file_link = make_share_token(file_obj.id, 0, 0)
+            File.objects.bulk_update(shared_files, ["file_link"])
+
+        if options["payload"] == "sparse":
+            for file_obj in created:
+                self.create_sparse_file(file_obj)
+
+        return len(created)
+
+    # разреженный файл нужного размера: занимает место в каталоге, но не на диске
+    def create_sparse_file(self, file_obj):
+        full_path = os.path.join(settings.MEDIA_ROOT, file_obj.file_content.name)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "wb") as sparse_file:
+            sparse_file.truncate(file_obj.file_size)
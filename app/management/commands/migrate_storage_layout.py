@@ -0,0 +1,99 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app.conditional import bump_files_version
+from app.models import File
+from app.storage_layout import is_sharded_path, make_migrated_file_path
+
+
+# Команда переносит файлы из плоского каталога user_<id>/ во вложенные каталоги user_<id>/ab/cd/<имя>
+# и обновляет file_content и file_path_in_user_dir. Файлы обрабатываются пачками по возрастанию id,
+# приложение продолжает работать во время переноса: новый путь создаётся жёсткой ссылкой, запись в базе
+# данных обновляется, и только после этого удаляется старый путь. Имя файла в новой структуре вычисляется
+# по id файла, поэтому прерванный перенос можно запустить повторно (или продолжить с --start-id)
+class Command(BaseCommand):
+    help = "Переносит файлы пользователей в структуру вложенных каталогов с уникальными именами"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Количество файлов в одной пачке")
+        parser.add_argument("--start-id", type=int, default=0, help="Продолжить перенос с файла с этим id")
+        parser.add_argument("--pause", type=float, default=0.0,
+                            help="Пауза между пачками в секундах, чтобы снизить нагрузку на диск")
+        parser.add_argument("--dry-run", action="store_true", help="Только показать, какие файлы будут перенесены")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        dry_run = options["dry_run"]
+        last_id = options["start_id"]
+
+        moved_count = 0
+        skipped_count = 0
+        while True:
+            # файлы из хранилища блобов уже разложены по каталогам sha256 и не переносятся
+            batch = list(
+                File.objects.filter(id__gt=last_id, blob__isnull=True)
+                .order_by("id")
+                .only("id", "user_id", "file_content", "file_path_in_user_dir")[:batch_size]
+            )
+            if not batch:
+                break
+
+            moved_user_ids = set()
+            for file_obj in batch:
+                if is_sharded_path(file_obj.file_path_in_user_dir):
+                    continue
+
+                if dry_run:
+                    self.stdout.write(f"file_id={file_obj.id}: {file_obj.file_content.name}")
+                    moved_count += 1
+                elif self.migrate_file(file_obj):
+                    moved_count += 1
+                    moved_user_ids.add(file_obj.user_id)
+                else:
+                    skipped_count += 1
+
+            # у владельцев перенесённых файлов изменились пути в списках файлов, поэтому сохранённые
+            # клиентами копии списков (ETag) становятся неактуальными
+            if moved_user_ids:
+                bump_files_version(moved_user_ids)
+
+            last_id = batch[-1].id
+            self.stdout.write(f"Обработаны файлы до id={last_id}, перенесено: {moved_count}")
+            if options["pause"]:
+                time.sleep(options["pause"])
+
+        action = "будет перенесено" if dry_run else "перенесено"
+        self.stdout.write(self.style.SUCCESS(
+            f"Файлов {action}: {moved_count}, пропущено (нет на диске или изменены во время переноса): {skipped_count}"
+        ))
+
+    def migrate_file(self, file_obj):
+        old_name = file_obj.file_content.name
+        old_path = os.path.join(settings.MEDIA_ROOT, old_name)
+        extension = os.path.splitext(file_obj.file_path_in_user_dir)[1]
+        new_path_in_user_dir = make_migrated_file_path(file_obj.id, old_name, extension)
+        new_name = f"user_{file_obj.user_id}/{new_path_in_user_dir}"
+        new_path = os.path.join(settings.MEDIA_ROOT, new_name)
+
+        if not os.path.exists(new_path):
+            if not os.path.exists(old_path):
+                self.stderr.write(f"file_id={file_obj.id}: файл {old_name} не найден")
+                return False
+            os.makedirs(os.path.dirname(new_path), exist_ok=True)
+            os.link(old_path, new_path)
+
+        # запись обновляется, только если файл не изменился и не удалён с начала обработки пачки
+        updated = File.objects.filter(id=file_obj.id, file_content=old_name).update(
+            file_content=new_name,
+            file_path_in_user_dir=new_path_in_user_dir
+        )
+
+        if updated:
+            if os.path.exists(old_path):
+                os.remove(old_path)
+        else:
+            os.remove(new_path)
+        return bool(updated)
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from app.storage_analytics import rebuild_storage_summary
+
+
+# Команда заново заполняет сводную таблицу аналитики хранилища по таблице файлов: для первоначального заполнения
+# и для исправления расхождений. Файлы читаются пачками через iterator(), а таблица заменяется в одной транзакции.
+# Изменения по расширениям и дням, накопленные в памяти рабочих процессов, команде недоступны и после
+# пересчёта учлись бы повторно, поэтому на время её выполнения рабочие процессы должны быть остановлены
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает сводную таблицу аналитики хранилища по таблице файлов. Перед запуском остановите "
+        "рабочие процессы приложения (или снимите с них нагрузку и подождите STORAGE_SUMMARY_FLUSH_INTERVAL "
+        "секунд): изменения, накопленные в их памяти, иначе будут учтены повторно"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=2000, help="Количество файлов в одной пачке")
+
+    def handle(self, *args, **options):
+        deleted_count, created_count = rebuild_storage_summary(options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Удалено строк сводной таблицы: {deleted_count}, создано: {created_count}"
+        ))
@@ -0,0 +1,80 @@
+from django.core.management.base import BaseCommand
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from app.models import User, File
+
+
+# Команда пересчитывает files_storage_size всех пользователей по SUM(file_size) их файлов и сообщает о расхождениях.
+# Пользователи читаются пачками через iterator() (на PostgreSQL - серверный курсор), поэтому команда
+# не загружает в память всю таблицу
+class Command(BaseCommand):
+    help = "Пересчитывает размер файлового хранилища пользователей и сообщает о расхождениях со счётчиком"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Количество пользователей в одной пачке")
+        parser.add_argument("--dry-run", action="store_true", help="Только сообщить о расхождениях, не исправляя их")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        dry_run = options["dry_run"]
+
+        users = User.objects.order_by("id").values_list("id", "files_storage_size").iterator(chunk_size=batch_size)
+
+        checked_count = 0
+        drifted_count = 0
+        total_drift = 0
+        batch = []
+        for user in users:
+            batch.append(user)
+            if len(batch) >= batch_size:
+                drifted, drift = self.reconcile_batch(batch, dry_run)
+                checked_count += len(batch)
+                drifted_count += drifted
+                total_drift += drift
+                batch = []
+
+        if batch:
+            drifted, drift = self.reconcile_batch(batch, dry_run)
+            checked_count += len(batch)
+            drifted_count += drifted
+            total_drift += drift
+
+        action = "найдено" if dry_run else "исправлено"
+        self.stdout.write(self.style.SUCCESS(
+            f"Проверено пользователей: {checked_count}, {action} расхождений: {drifted_count}, "
+            f"суммарное расхождение: {total_drift} байт"
+        ))
+
+    def reconcile_batch(self, batch, dry_run):
+        user_ids = [user_id for user_id, _ in batch]
+        actual_sizes = dict(
+            File.objects.filter(user_id__in=user_ids)
+            .values("user_id")
+            .annotate(total_size=Sum("file_size"))
+            .values_list("user_id", "total_size")
+        )
+
+        drifted_user_ids = []
+        total_drift = 0
+        for user_id, files_storage_size in batch:
+            actual_size = actual_sizes.get(user_id) or 0
+            if actual_size != files_storage_size:
+                drifted_user_ids.append(user_id)
+                total_drift += abs(actual_size - files_storage_size)
+                self.stdout.write(f"user_id={user_id}: счётчик {files_storage_size}, фактически {actual_size}")
+
+        if drifted_user_ids and not dry_run:
+            # пересчёт одним UPDATE с подзапросом: значение берётся на момент выполнения запроса,
+            # поэтому загрузки, завершившиеся после проверки, не теряются
+            files_total_size = (
+                File.objects.filter(user_id=OuterRef("id"))
+                .values("user_id")
+                .annotate(total_size=Sum("file_size"))
+                .values("total_size")
+            )
+            User.objects.filter(id__in=drifted_user_ids).update(
+                files_storage_size=Coalesce(Subquery(files_total_size), 0)
+            )
+
+        return len(drifted_user_ids), total_drift
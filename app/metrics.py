@@ -0,0 +1,268 @@
+import atexit
+import contextvars
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+# границы корзин гистограммы времени ответа в секундах
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# методы HTTP, которые учитываются в метке method; остальные (произвольные строки от клиента) объединяются
+# в "other", чтобы число рядов метрик не росло без ограничений
+HTTP_METHODS = frozenset(("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"))
+OTHER_METHOD_LABEL = "other"
+
+# индексы значений в статистике одного маршрута
+REQUESTS, LATENCY_SUM, DB_QUERIES, DB_TIME, REQUEST_BYTES, RESPONSE_BYTES, BUCKETS = range(7)
+
+# счётчики запросов к базе данных текущего HTTP-запроса: [количество, время в секундах];
+# ContextVar работает и для потоков WSGI, и для асинхронных представлений ASGI
+current_query_stats = contextvars.ContextVar("current_query_stats", default=None)
+
+
+# Метрики процесса: статистика по ключу (маршрут, метод, код ответа) копится в памяти и фоновым потоком
+# раз в METRICS_FLUSH_INTERVAL секунд записывается в файл процесса в METRICS_DIR. Эндпоинт метрик суммирует
+# файлы всех рабочих процессов, поэтому на пути запроса нет ни записи на диск, ни межпроцессных блокировок
+class MetricsRegistry:
+    def __init__(self, metrics_dir, flush_interval):
+        self.metrics_dir = metrics_dir
+        self.flush_interval = flush_interval
+        self.file_path = os.path.join(metrics_dir, f"{os.getpid()}-{uuid.uuid4().hex[:8]}.json")
+        self.stats = {}
+        self.lock = threading.Lock()
+        self.flush_thread = None
+
+    def record(self, key, latency, db_queries, db_time, request_bytes, response_bytes):
+        bucket = bisect_left(LATENCY_BUCKETS, latency)
+        with self.lock:
+            stats = self.stats.get(key)
+            if stats is None:
+                stats = self.stats[key] = [0, 0.0, 0, 0.0, 0, 0, [0] * (len(LATENCY_BUCKETS) + 1)]
+            stats[REQUESTS] += 1
+            stats[LATENCY_SUM] += latency
+            stats[DB_QUERIES] += db_queries
+            stats[DB_TIME] += db_time
+            stats[REQUEST_BYTES] += request_bytes
+            stats[RESPONSE_BYTES] += response_bytes
+            stats[BUCKETS][bucket] += 1
+
+        if self.flush_thread is None:
+            self.start()
+
+    def start(self):
+        with self.lock:
+            if self.flush_thread is None:
+                self.flush_thread = threading.Thread(target=self.run, name="metrics-flush", daemon=True)
+                self.flush_thread.start()
+                atexit.register(self.flush)
+
+    def run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Не удалось записать метрики процесса")
+
+    def snapshot(self):
+        with self.lock:
+            return [
+                [list(key), stats[:BUCKETS] + [list(stats[BUCKETS])]]
+                for key, stats in self.stats.items()
+            ]
+
+    # файл записывается во временный и переименовывается, чтобы читатель не увидел его частично записанным
+    def flush(self):
+        os.makedirs(self.metrics_dir, exist_ok=True)
+        temporary_path = f"{self.file_path}.tmp"
+        with open(temporary_path, "w") as metrics_file:
+            json.dump(self.snapshot(), metrics_file)
+        os.replace(temporary_path, self.file_path)
+
+
+metrics_registry = None
+metrics_registry_lock = threading.Lock()
+
+
+# функция возвращает реестр метрик текущего процесса
+def get_metrics_registry():
+    global metrics_registry
+    if metrics_registry is None:
+        with metrics_registry_lock:
+            if metrics_registry is None:
+                metrics_registry = MetricsRegistry(settings.METRICS_DIR, settings.METRICS_FLUSH_INTERVAL)
+    return metrics_registry
+
+
+# обёртка выполнения SQL-запросов (подключается к каждому соединению с базой данных в app/signals.py):
+# считает запросы и их время для текущего HTTP-запроса
+def query_metrics_wrapper(execute, sql, params, many, context):
+    query_stats = current_query_stats.get()
+    if query_stats is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        query_stats[0] += 1
+        query_stats[1] += time.perf_counter() - started
+
+
+# функция возвращает шаблон маршрута из diploma_backend/urls.py, по которому был обработан запрос
+def get_route_label(request):
+    resolver_match = getattr(request, "resolver_match", None)
+    if resolver_match is None:
+        return "unmatched"
+    return resolver_match.route or resolver_match.view_name
+
+
+# функция возвращает метку метода HTTP запроса
+def get_method_label(request):
+    return request.method if request.method in HTTP_METHODS else OTHER_METHOD_LABEL
+
+
+# функция сохраняет метрики завершённого запроса; размер ответа потоковой передачи берётся из Content-Length
+def record_request_metrics(request, response, started, query_stats):
+    latency = time.perf_counter() - started
+    if response.streaming:
+        response_bytes = int(response.get("Content-Length") or 0)
+    else:
+        response_bytes = len(response.content)
+
+    get_metrics_registry().record(
+        (get_route_label(request), get_method_label(request), str(response.status_code)),
+        latency,
+        query_stats[0],
+        query_stats[1],
+        int(request.META.get("CONTENT_LENGTH") or 0),
+        response_bytes
+    )
+
+
+# Middleware собирает для каждого маршрута время ответа (до отправки заголовков), количество и время запросов
+# к базе данных и объём запроса и ответа. Поддерживает и синхронный, и асинхронный режим, чтобы Django
+# не переключал асинхронные представления в поток ради middleware
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = settings.METRICS_ENABLED
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+
+        query_stats = [0, 0.0]
+        token = current_query_stats.set(query_stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_query_stats.reset(token)
+        record_request_metrics(request, response, started, query_stats)
+        return response
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+
+        query_stats = [0, 0.0]
+        token = current_query_stats.set(query_stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_query_stats.reset(token)
+        record_request_metrics(request, response, started, query_stats)
+        return response
+
+
+# функция суммирует метрики всех рабочих процессов; файлы процессов, которые давно не обновлялись
+# (процесс завершён), удаляются
+def collect_metrics():
+    registry = get_metrics_registry()
+    registry.flush()
+
+    totals = {}
+    now = time.time()
+    for file_path in glob.glob(os.path.join(settings.METRICS_DIR, "*.json")):
+        try:
+            if now - os.path.getmtime(file_path) > settings.METRICS_RETENTION:
+                os.remove(file_path)
+                continue
+            with open(file_path) as metrics_file:
+                process_stats = json.load(metrics_file)
+        except (OSError, ValueError):
+            continue
+
+        for key, stats in process_stats:
+            key = tuple(key)
+            total = totals.get(key)
+            if total is None:
+                totals[key] = [*stats[:BUCKETS], list(stats[BUCKETS])]
+                continue
+            for index in range(BUCKETS):
+                total[index] += stats[index]
+            total[BUCKETS] = [left + right for left, right in zip(total[BUCKETS], stats[BUCKETS])]
+    return totals
+
+
+# функция экранирует значение метки Prometheus
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+# функция возвращает метки ряда метрик с экранированными значениями
+def get_labels(route, method, status_code):
+    return f'route="{escape_label(route)}",method="{escape_label(method)}",status="{escape_label(status_code)}"'
+
+
+# функция формирует текст метрик в формате Prometheus
+def render_prometheus(totals):
+    counters = (
+        ("mycloud_http_requests_total", "counter", "Количество HTTP-запросов", REQUESTS),
+        ("mycloud_db_queries_total", "counter", "Количество запросов к базе данных", DB_QUERIES),
+        ("mycloud_db_query_duration_seconds_total", "counter", "Суммарное время запросов к базе данных", DB_TIME),
+        ("mycloud_http_request_bytes_total", "counter", "Объём тел HTTP-запросов в байтах", REQUEST_BYTES),
+        ("mycloud_http_response_bytes_total", "counter", "Объём тел HTTP-ответов в байтах", RESPONSE_BYTES),
+    )
+    items = sorted(totals.items())
+    lines = []
+
+    lines.append("# HELP mycloud_http_request_duration_seconds Время обработки HTTP-запроса")
+    lines.append("# TYPE mycloud_http_request_duration_seconds histogram")
+    for (route, method, status_code), stats in items:
+        labels = get_labels(route, method, status_code)
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), stats[BUCKETS]):
+            cumulative += count
+            lines.append(f'mycloud_http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f"mycloud_http_request_duration_seconds_sum{{{labels}}} {stats[LATENCY_SUM]:.6f}")
+        lines.append(f"mycloud_http_request_duration_seconds_count{{{labels}}} {stats[REQUESTS]}")
+
+    for name, metric_type, description, index in counters:
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for (route, method, status_code), stats in items:
+            labels = get_labels(route, method, status_code)
+            lines.append(f"{name}{{{labels}}} {stats[index]}")
+
+    return "\n".join(lines) + "\n"
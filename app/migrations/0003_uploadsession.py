@@ -0,0 +1,30 @@
+# Generated by Django 5.2.4 on 2026-10-18 07:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0002_alter_file_user'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('upload_id', models.CharField(max_length=36, unique=True)),
+                ('file_name', models.CharField(max_length=255)),
+                ('comment', models.CharField(max_length=300)),
+                ('extension', models.CharField(max_length=100)),
+                ('file_size', models.BigIntegerField()),
+                ('received_size', models.BigIntegerField(default=0)),
+                ('received_chunks', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to='app.user')),
+            ],
+        ),
+    ]
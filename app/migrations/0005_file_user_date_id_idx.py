@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-18 07:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_blob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='file',
+            index=models.Index(fields=['user', 'date', 'id'], name='file_user_date_id_idx'),
+        ),
+    ]
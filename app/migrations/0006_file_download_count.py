@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 07:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_file_user_date_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='download_count',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 07:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_compression_codec'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='files_changed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='files_version',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
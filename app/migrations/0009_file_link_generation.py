@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 07:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_user_files_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='link_generation',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='file',
+            name='file_link',
+            field=models.CharField(db_index=True, max_length=200),
+        ),
+    ]
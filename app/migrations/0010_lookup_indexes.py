@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2026-10-18 08:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_file_link_generation'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='session',
+            name='session_id',
+            field=models.CharField(db_index=True, max_length=200),
+        ),
+        migrations.AddIndex(
+            model_name='file',
+            index=models.Index(fields=['user', 'file_name'], name='file_user_file_name_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-18 08:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StorageSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(max_length=20)),
+                ('key', models.CharField(max_length=100)),
+                ('files_count', models.BigIntegerField(default=0)),
+                ('files_size', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='file',
+            index=models.Index(fields=['-file_size', '-id'], name='file_size_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='storagesummary',
+            index=models.Index(fields=['dimension', '-files_size'], name='storage_summary_size_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='storagesummary',
+            constraint=models.UniqueConstraint(fields=('dimension', 'key'), name='storage_summary_dimension_key_uniq'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations
+
+from app.search import create_search_indexes, drop_search_indexes
+
+
+# Индексы для поиска по имени файла и комментарию: на PostgreSQL - pg_trgm GIN, на SQLite - таблица FTS5
+# с триграммным токенизатором и триггерами (см. app/search.py)
+def create_indexes(apps, schema_editor):
+    create_search_indexes(schema_editor.connection)
+
+
+def drop_indexes(apps, schema_editor):
+    drop_search_indexes(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0011_storage_summary'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -12,27 +12,96 @@ class User(models.Model):
     email = models.CharField(max_length=100)
     admin = models.BooleanField(default=False)
     files_storage_size = models.IntegerField(default=0)
+    # номер версии списка файлов пользователя: увеличивается при каждом изменении его файлов
+    files_version = models.BigIntegerField(default=0)
+    files_changed_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         return self.login
 
 
+class Blob(models.Model):
+    sha256 = models.CharField(max_length=64, unique=True)
+    size = models.BigIntegerField()
+    storage_path = models.CharField(max_length=255)
+    codec = models.CharField(max_length=20, blank=True, default='')
+    ref_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.sha256
+
+
 class File(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='files')
+    blob = models.ForeignKey(Blob, on_delete=models.PROTECT, related_name='files', null=True, blank=True)
     file_content = models.FileField(upload_to=user_directory_path)
     file_name = models.CharField(max_length=255)
     file_path_in_user_dir = models.CharField(max_length=255)
-    file_link = models.CharField(max_length=200)
+    file_link = models.CharField(max_length=200, db_index=True)
+    # поколение ссылок на файл: увеличивается при отзыве, после чего ранее выданные ссылки перестают действовать
+    link_generation = models.IntegerField(default=0)
     file_size = models.IntegerField()
+    codec = models.CharField(max_length=20, blank=True, default='')
+    original_size = models.BigIntegerField(null=True, blank=True)
     date = models.DateTimeField(auto_now_add=True)
     last_upload_date = models.DateTimeField(null=True, blank=True)
+    download_count = models.IntegerField(default=0)
     comment = models.CharField(max_length=300)
 
+    class Meta:
+        indexes = [
+            # индекс для постраничного вывода файлов пользователя с сортировкой по (date, id)
+            models.Index(fields=['user', 'date', 'id'], name='file_user_date_id_idx'),
+            # индекс для проверки, есть ли у пользователя файл с таким именем
+            models.Index(fields=['user', 'file_name'], name='file_user_file_name_idx'),
+            # индекс для выборки крупнейших файлов без сортировки всей таблицы
+            models.Index(fields=['-file_size', '-id'], name='file_size_id_idx'),
+        ]
+
     def __str__(self):
         return self.file_name
 
 
 class Session(models.Model):
-    session_id = models.CharField(max_length=200)
+    session_id = models.CharField(max_length=200, db_index=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     login = models.CharField(max_length=100, unique=True)
+
+
+class UploadSession(models.Model):
+    upload_id = models.CharField(max_length=36, unique=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_sessions')
+    file_name = models.CharField(max_length=255)
+    comment = models.CharField(max_length=300)
+    extension = models.CharField(max_length=100)
+    file_size = models.BigIntegerField()
+    received_size = models.BigIntegerField(default=0)
+    received_chunks = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.upload_id
+
+
+# Сводная таблица аналитики хранилища: количество и суммарный размер файлов по пользователям, расширениям
+# и дням загрузки. Обновляется при создании и удалении File (app/storage_analytics.py), поэтому отчёты
+# для администратора не читают таблицу файлов
+class StorageSummary(models.Model):
+    dimension = models.CharField(max_length=20)
+    key = models.CharField(max_length=100)
+    files_count = models.BigIntegerField(default=0)
+    files_size = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['dimension', 'key'], name='storage_summary_dimension_key_uniq'),
+        ]
+        indexes = [
+            # индекс для выборки крупнейших значений измерения (пользователей с наибольшим объёмом файлов)
+            models.Index(fields=['dimension', '-files_size'], name='storage_summary_size_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.dimension}:{self.key}'
@@ -0,0 +1,124 @@
+import base64
+import json
+
+import rest_framework.exceptions
+from django.conf import settings
+from django.db.models import Q
+
+from app.models import File
+
+
+# поля File, которые можно запросить в списке файлов через параметр fields
+FILE_LIST_FIELDS = [
+    'id',
+    'file_content',
+    'file_name',
+    'comment',
+    'file_link',
+    'file_size',
+    'date',
+    'last_upload_date',
+    'download_count',
+    'user_id',
+    'file_path_in_user_dir'
+]
+FILE_LIST_ORDERING = ('date', 'id')
+
+# поля User, которые можно запросить в списке пользователей через параметр fields
+USER_LIST_FIELDS = ['id', 'name', 'login', 'email', 'admin', 'files_storage_size']
+USER_LIST_ORDERING = ('id',)
+
+# поля списка пользователей с агрегированной статистикой по файлам
+USER_STATS_LIST_FIELDS = USER_LIST_FIELDS + ['files_count', 'files_total_size']
+
+
+# функция проверяет, запрошен ли постраничный вывод или выборка отдельных полей
+def is_paginated_request(data):
+    return any(key in data for key in ('cursor', 'page_size', 'fields'))
+
+
+# функция кодирует значения полей сортировки последней записи страницы в непрозрачный курсор
+def encode_cursor(values):
+    raw_cursor = json.dumps(values, default=str).encode('utf-8')
+    return base64.urlsafe_b64encode(raw_cursor).decode('ascii')
+
+
+# функция декодирует курсор в список значений полей сортировки
+def decode_cursor(cursor, ordering):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, UnicodeError):
+        raise rest_framework.exceptions.ValidationError('Некорректный курсор')
+
+    if not isinstance(values, list) or len(values) != len(ordering):
+        raise rest_framework.exceptions.ValidationError('Некорректный курсор')
+    return values
+
+
+# функция возвращает размер страницы из запроса с учётом ограничений из настроек
+def get_page_size(data):
+    try:
+        page_size = int(data.get('page_size') or settings.LIST_PAGE_SIZE)
+    except (TypeError, ValueError):
+        raise rest_framework.exceptions.ValidationError('Некорректный размер страницы')
+    return max(1, min(page_size, settings.LIST_MAX_PAGE_SIZE))
+
+
+# функция возвращает список запрошенных полей (строка через запятую или список) из числа разрешённых
+def get_projection_fields(data, allowed_fields):
+    fields = data.get('fields')
+    if not fields:
+        return list(allowed_fields)
+
+    if isinstance(fields, str):
+        fields = [field.strip() for field in fields.split(',') if field.strip()]
+
+    unknown_fields = [field for field in fields if field not in allowed_fields]
+    if unknown_fields:
+        raise rest_framework.exceptions.ValidationError(f'Неизвестные поля: {", ".join(unknown_fields)}')
+    return list(fields)
+
+
+# функция строит условие "строго после курсора" для сортировки по нескольким полям (keyset-пагинация)
+def get_keyset_filter(ordering, values):
+    keyset_filter = Q()
+    for index, field in enumerate(ordering):
+        condition = Q(**{f'{field}__gt': values[index]})
+        for previous_field, previous_value in zip(ordering[:index], values[:index]):
+            condition &= Q(**{previous_field: previous_value})
+        keyset_filter |= condition
+    return keyset_filter
+
+
+# функция возвращает страницу записей через .values() только с нужными столбцами и курсор следующей страницы;
+# время ответа не зависит от количества записей перед курсором
+def get_keyset_page(queryset, data, ordering, allowed_fields):
+    fields = get_projection_fields(data, allowed_fields)
+    page_size = get_page_size(data)
+
+    cursor = data.get('cursor')
+    if cursor:
+        queryset = queryset.filter(get_keyset_filter(ordering, decode_cursor(cursor, ordering)))
+
+    selected_fields = list(dict.fromkeys(fields + list(ordering)))
+    rows = list(queryset.order_by(*ordering).values(*selected_fields)[:page_size + 1])
+
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor([rows[-1][field] for field in ordering])
+
+    results = [format_row(row, fields) for row in rows]
+    return {
+        'results': results,
+        'next_cursor': next_cursor
+    }
+
+
+# функция оставляет в записи только запрошенные поля и приводит file_content к URL, как в FileSerializer
+def format_row(row, fields):
+    formatted_row = {field: row[field] for field in fields}
+    if formatted_row.get('file_content'):
+        storage = File._meta.get_field('file_content').storage
+        formatted_row['file_content'] = storage.url(formatted_row['file_content'])
+    return formatted_row
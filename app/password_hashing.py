@@ -0,0 +1,41 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password
+
+
+# Исключение означает, что пул проверки паролей перегружен и запрос нужно повторить позже
+class PasswordHashingBusy(Exception):
+    pass
+
+
+hashing_executor = None
+hashing_slots = None
+hashing_lock = threading.Lock()
+
+
+# функция лениво создаёт пул потоков для проверки паролей и семафор, ограничивающий очередь к нему
+def get_hashing_pool():
+    global hashing_executor, hashing_slots
+    if hashing_executor is None:
+        with hashing_lock:
+            if hashing_executor is None:
+                max_workers = settings.LOGIN_HASHING_MAX_WORKERS
+                hashing_slots = threading.BoundedSemaphore(max_workers + settings.LOGIN_HASHING_MAX_QUEUE)
+                hashing_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hashing")
+    return hashing_executor, hashing_slots
+
+
+# функция проверяет пароль в ограниченном пуле потоков: одновременно считается не больше
+# LOGIN_HASHING_MAX_WORKERS хешей PBKDF2, поэтому поток входов не занимает все процессоры и рабочие процессы API;
+# если очередь заполнена дольше LOGIN_HASHING_QUEUE_TIMEOUT секунд, выбрасывается PasswordHashingBusy
+def check_password_bounded(password, encoded_password):
+    executor, slots = get_hashing_pool()
+    if not slots.acquire(timeout=settings.LOGIN_HASHING_QUEUE_TIMEOUT):
+        raise PasswordHashingBusy("Сервер перегружен, повторите попытку входа позже")
+
+    try:
+        return executor.submit(check_password, password, encoded_password).result()
+    finally:
+        slots.release()
@@ -0,0 +1,42 @@
+import os
+import tempfile
+
+
+# Модуль выполняется в отдельных процессах пула генерации превью, поэтому не импортирует Django:
+# декодирование больших изображений не блокирует рабочие процессы, обслуживающие запросы
+
+
+# функция создаёт уменьшенную копию изображения (или первой страницы PDF) в формате JPEG;
+# результат сначала пишется во временный файл и затем атомарно переносится на место
+def generate_preview(source_path, target_path, max_dimension, source_kind):
+    from PIL import Image
+
+    if source_kind == "pdf":
+        import fitz
+
+        with fitz.open(source_path) as document:
+            page = document.load_page(0)
+            zoom = max_dimension / max(page.rect.width, page.rect.height, 1)
+            pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+            image = Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)
+    else:
+        image = Image.open(source_path)
+        # для JPEG декодер сразу уменьшает изображение, не распаковывая его в полном размере
+        image.draft("RGB", (max_dimension, max_dimension))
+
+    image.thumbnail((max_dimension, max_dimension))
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    file_descriptor, temporary_path = tempfile.mkstemp(dir=os.path.dirname(target_path), suffix=".tmp")
+    try:
+        with os.fdopen(file_descriptor, "wb") as temporary_file:
+            image.save(temporary_file, format="JPEG", quality=85)
+        os.replace(temporary_path, target_path)
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
+
+    return target_path
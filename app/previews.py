@@ -0,0 +1,154 @@
+import hashlib
+import importlib.util
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+
+from app.preview_worker import generate_preview
+
+
+IMAGE_EXTENSIONS = {'.bmp', '.gif', '.jpeg', '.jpg', '.png', '.tif', '.tiff', '.webp'}
+PDF_EXTENSIONS = {'.pdf'}
+
+# количество попыток сгенерировать и открыть превью
+PREVIEW_OPEN_ATTEMPTS = 3
+
+
+# Исключение означает, что для файла нельзя построить превью (тип не поддерживается или нет библиотек)
+class PreviewUnavailable(Exception):
+    pass
+
+
+preview_executor = None
+preview_executor_lock = threading.Lock()
+last_eviction_time = 0.0
+
+
+# функция лениво создаёт пул процессов для генерации превью; процессы запускаются через spawn,
+# чтобы не копировать при fork потоки и соединения с базой данных рабочего процесса
+def get_preview_executor():
+    global preview_executor
+    if preview_executor is None:
+        with preview_executor_lock:
+            if preview_executor is None:
+                preview_executor = ProcessPoolExecutor(
+                    max_workers=settings.PREVIEW_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+    return preview_executor
+
+
+# функция определяет вид исходного файла по расширению имени или выбрасывает PreviewUnavailable
+def get_preview_source_kind(file_obj):
+    extension = os.path.splitext(file_obj.file_name)[1].lower()
+    if extension in IMAGE_EXTENSIONS and importlib.util.find_spec("PIL") is not None:
+        return "image"
+    if extension in PDF_EXTENSIONS and importlib.util.find_spec("PIL") is not None \
+            and importlib.util.find_spec("fitz") is not None:
+        return "pdf"
+    raise PreviewUnavailable("Превью для этого типа файлов недоступно")
+
+
+# функция возвращает каталог с превью файла; весь каталог удаляется вместе с файлом
+def get_file_preview_dir(file_id):
+    return os.path.join(settings.PREVIEW_CACHE_ROOT, str(file_id))
+
+
+# функция возвращает путь к превью: имя зависит от содержимого файла, поэтому при замене файла
+# используется новое превью, а старое вытесняется из кэша
+def get_preview_path(file_obj, source_path, max_dimension):
+    if file_obj.blob_id is not None:
+        content_key = file_obj.blob.sha256[:32]
+    else:
+        source_stat = os.stat(source_path)
+        content_key = hashlib.sha256(
+            f"{file_obj.file_content.name}:{source_stat.st_size}:{source_stat.st_mtime_ns}".encode("utf-8")
+        ).hexdigest()[:32]
+    return os.path.join(get_file_preview_dir(file_obj.id), f"{content_key}_{max_dimension}.jpg")
+
+
+# функция открывает превью из кэша или возвращает None, если его нет (в том числе если его только что
+# удалило вытеснение); открытый файл остаётся доступным для чтения, даже если его удалят после открытия
+def open_cached_preview(preview_path):
+    try:
+        preview_file = open(preview_path, "rb")
+    except FileNotFoundError:
+        return None
+    # обновление времени изменения отмечает превью как недавно использованное для LRU-вытеснения
+    try:
+        os.utime(preview_path)
+    except FileNotFoundError:
+        pass
+    return preview_file
+
+
+# функция возвращает открытый файл превью, при первом запросе генерируя его в пуле процессов
+def get_or_create_preview(file_obj, max_dimension):
+    source_kind = get_preview_source_kind(file_obj)
+    source_path = file_obj.file_content.path
+    preview_path = get_preview_path(file_obj, source_path, max_dimension)
+
+    # превью, удалённое вытеснением между генерацией и открытием, генерируется повторно (не больше
+    # PREVIEW_OPEN_ATTEMPTS раз, чтобы при переполненном кэше запрос не зациклился)
+    preview_file = open_cached_preview(preview_path)
+    for _ in range(PREVIEW_OPEN_ATTEMPTS):
+        if preview_file is not None:
+            break
+        future = get_preview_executor().submit(
+            generate_preview, source_path, preview_path, max_dimension, source_kind
+        )
+        future.result(timeout=settings.PREVIEW_GENERATION_TIMEOUT)
+        preview_file = open_cached_preview(preview_path)
+
+    if preview_file is None:
+        raise FileNotFoundError(f"Превью не сохранено в кэше: {preview_path}")
+
+    evict_preview_cache()
+    return preview_file
+
+
+# функция удаляет все превью файла
+def delete_file_previews(file_id):
+    shutil.rmtree(get_file_preview_dir(file_id), ignore_errors=True)
+
+
+# функция удерживает размер кэша превью в пределах PREVIEW_CACHE_MAX_SIZE, удаляя давно не использованные файлы;
+# каталог кэша обходится не чаще одного раза в PREVIEW_CACHE_EVICTION_INTERVAL секунд
+def evict_preview_cache(force=False):
+    global last_eviction_time
+    now = time.monotonic()
+    if not force and now - last_eviction_time < settings.PREVIEW_CACHE_EVICTION_INTERVAL:
+        return
+    last_eviction_time = now
+
+    entries = []
+    total_size = 0
+    for directory, _, file_names in os.walk(settings.PREVIEW_CACHE_ROOT):
+        for file_name in file_names:
+            path = os.path.join(directory, file_name)
+            try:
+                file_stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((file_stat.st_mtime, file_stat.st_size, path))
+            total_size += file_stat.st_size
+
+    max_size = settings.PREVIEW_CACHE_MAX_SIZE
+    if total_size <= max_size:
+        return
+
+    # кэш очищается с запасом до 90% лимита, чтобы не обходить каталог после каждого нового превью
+    target_size = max_size * 0.9
+    for _, size, path in sorted(entries):
+        if total_size <= target_size:
+            break
+        try:
+            os.remove(path)
+            total_size -= size
+        except FileNotFoundError:
+            continue
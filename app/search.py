@@ -0,0 +1,181 @@
+import logging
+
+from django.db.models import CharField, Func, Q
+from django.db.models.expressions import RawSQL
+from django.db.models.lookups import Contains, StartsWith
+
+from app.models import File
+
+
+logger = logging.getLogger(__name__)
+
+# режимы поиска: вхождение строки в любом месте или только в начале имени файла или комментария
+SEARCH_MODES = ("substring", "prefix")
+SEARCH_MAX_QUERY_LENGTH = 100
+
+# триграммный индекс помогает только запросам не короче трёх символов, более короткие проверяются перебором
+# файлов пользователя
+TRIGRAM_MIN_QUERY_LENGTH = 3
+
+# индексы PostgreSQL: pg_trgm GIN по UPPER(...), так как icontains и istartswith в Django на PostgreSQL
+# сравнивают UPPER(столбец) LIKE UPPER(шаблон)
+POSTGRESQL_SEARCH_INDEXES = (
+    ("file_name_trgm_idx", "file_name"),
+    ("file_comment_trgm_idx", "comment"),
+)
+
+# таблица FTS5 для SQLite: хранит только индекс (content=app_file), строки берутся из таблицы файлов
+SQLITE_SEARCH_TABLE = f"{File._meta.db_table}_search"
+SQLITE_SEARCH_TRIGGERS = ("insert", "delete", "update")
+
+
+# функция SQLite, приводящая строку к нижнему регистру с учётом Unicode: встроенные lower() и LIKE в SQLite
+# не учитывают регистр только для латиницы. Регистрируется для каждого соединения в app/signals.py
+SQLITE_LOWER_FUNCTION = "app_unicode_lower"
+
+
+# функция приводит значение столбца к нижнему регистру (вызывается SQLite)
+def unicode_lower(value):
+    return value.lower() if isinstance(value, str) else value
+
+
+# функция регистрирует в соединении SQLite функции, которые используются при поиске
+def register_sqlite_search_functions(connection):
+    connection.connection.create_function(SQLITE_LOWER_FUNCTION, 1, unicode_lower, deterministic=True)
+
+
+# выражение app_unicode_lower(столбец) для запросов к SQLite
+class UnicodeLower(Func):
+    function = SQLITE_LOWER_FUNCTION
+    output_field = CharField()
+
+
+# функция возвращает условие поиска по имени файла и комментарию для выбранного режима. На SQLite регистр
+# приводится функцией app_unicode_lower, поэтому поиск без учёта регистра работает и для кириллицы,
+# как и в таблице FTS5
+def get_search_filter(query, mode, connection):
+    if connection.vendor == "sqlite":
+        lookup = StartsWith if mode == "prefix" else Contains
+        query = unicode_lower(query)
+        return Q(lookup(UnicodeLower("file_name"), query)) | Q(lookup(UnicodeLower("comment"), query))
+
+    lookup = "istartswith" if mode == "prefix" else "icontains"
+    return Q(**{f"file_name__{lookup}": query}) | Q(**{f"comment__{lookup}": query})
+
+
+# функция возвращает фразу запроса FTS5: кавычки внутри фразы удваиваются, поэтому символы синтаксиса
+# FTS5 в запросе пользователя ищутся как обычный текст
+def get_fts_phrase(query):
+    return '"{0}"'.format(query.replace('"', '""'))
+
+
+# функция проверяет, создана ли в SQLite таблица FTS5 для поиска (её нет, если SQLite собран без FTS5)
+def sqlite_search_table_exists(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [SQLITE_SEARCH_TABLE])
+        return cursor.fetchone() is not None
+
+
+# функция ограничивает queryset файлами, имя или комментарий которых содержат запрос (mode="substring")
+# или начинаются с него (mode="prefix"). На PostgreSQL условие LIKE выполняется по триграммным GIN-индексам,
+# на SQLite кандидаты сначала выбираются из триграммной таблицы FTS5, а начало строки проверяется только у них
+def search_files(queryset, query, mode, connection):
+    search_filter = get_search_filter(query, mode, connection)
+
+    if (connection.vendor == "sqlite" and len(query) >= TRIGRAM_MIN_QUERY_LENGTH
+            and sqlite_search_table_exists(connection)):
+        candidate_ids = RawSQL(
+            f"SELECT rowid FROM {SQLITE_SEARCH_TABLE} WHERE {SQLITE_SEARCH_TABLE} MATCH %s",
+            [get_fts_phrase(query)]
+        )
+        queryset = queryset.filter(id__in=candidate_ids)
+        # триграммы FTS5 сравниваются без учёта регистра, поэтому для поиска вхождения совпадения FTS5 достаточно
+        if mode == "substring":
+            return queryset
+
+    return queryset.filter(search_filter)
+
+
+# функция создаёт индексы для поиска; вызывается из миграции
+def create_search_indexes(connection):
+    if connection.vendor == "postgresql":
+        table = connection.ops.quote_name(File._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            for index_name, column in POSTGRESQL_SEARCH_INDEXES:
+                cursor.execute(
+                    f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} "
+                    f"USING gin (UPPER({connection.ops.quote_name(column)}) gin_trgm_ops)"
+                )
+
+    elif connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            try:
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_SEARCH_TABLE} USING fts5("
+                    f"file_name, comment, content='{File._meta.db_table}', content_rowid='id', tokenize='trigram')"
+                )
+            except Exception as e:
+                # без FTS5 или триграммного токенизатора (SQLite < 3.34) поиск работает перебором
+                logger.warning("Таблица полнотекстового поиска не создана: %s", e)
+                return
+        ensure_sqlite_search_triggers(connection)
+
+
+# функция удаляет индексы для поиска; вызывается при откате миграции
+def drop_search_indexes(connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            for index_name, _ in POSTGRESQL_SEARCH_INDEXES:
+                cursor.execute(f"DROP INDEX IF EXISTS {index_name}")
+
+        elif connection.vendor == "sqlite":
+            for trigger in SQLITE_SEARCH_TRIGGERS:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {SQLITE_SEARCH_TABLE}_{trigger}")
+            cursor.execute(f"DROP TABLE IF EXISTS {SQLITE_SEARCH_TABLE}")
+
+
+# функция создаёт триггеры, поддерживающие таблицу FTS5 в актуальном состоянии, и, если каких-то триггеров
+# не было, заново заполняет таблицу. Django при изменении столбцов таблицы в SQLite пересоздаёт её вместе
+# с триггерами, поэтому функция вызывается и после каждого применения миграций (app/signals.py)
+def ensure_sqlite_search_triggers(connection):
+    if not sqlite_search_table_exists(connection):
+        return False
+
+    table = File._meta.db_table
+    trigger_statements = {
+        "insert": (
+            f"AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {SQLITE_SEARCH_TABLE}(rowid, file_name, comment) "
+            f"VALUES (new.id, new.file_name, new.comment); END"
+        ),
+        "delete": (
+            f"AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {SQLITE_SEARCH_TABLE}({SQLITE_SEARCH_TABLE}, rowid, file_name, comment) "
+            f"VALUES ('delete', old.id, old.file_name, old.comment); END"
+        ),
+        "update": (
+            f"AFTER UPDATE OF file_name, comment ON {table} BEGIN "
+            f"INSERT INTO {SQLITE_SEARCH_TABLE}({SQLITE_SEARCH_TABLE}, rowid, file_name, comment) "
+            f"VALUES ('delete', old.id, old.file_name, old.comment); "
+            f"INSERT INTO {SQLITE_SEARCH_TABLE}(rowid, file_name, comment) "
+            f"VALUES (new.id, new.file_name, new.comment); END"
+        ),
+    }
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s", [table]
+        )
+        existing_triggers = {row[0] for row in cursor.fetchall()}
+
+        missing_triggers = [
+            trigger for trigger in SQLITE_SEARCH_TRIGGERS
+            if f"{SQLITE_SEARCH_TABLE}_{trigger}" not in existing_triggers
+        ]
+        for trigger in missing_triggers:
+            cursor.execute(f"CREATE TRIGGER {SQLITE_SEARCH_TABLE}_{trigger} {trigger_statements[trigger]}")
+        if missing_triggers:
+            cursor.execute(f"INSERT INTO {SQLITE_SEARCH_TABLE}({SQLITE_SEARCH_TABLE}) VALUES ('rebuild')")
+
+    return bool(missing_triggers)
@@ -23,6 +23,7 @@ class FileSerializer(serializers.ModelSerializer):
             'file_size',
             'date',
             'last_upload_date',
+            'download_count',
             'user_id',
             'file_path_in_user_dir'
         ]
@@ -32,3 +33,16 @@ class SessionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Session
         fields = ['login']
+
+
+# Быстрый сериализатор для списков только для чтения: принимает словари из .values()
+# и не создаёт отдельный объект поля DRF для каждого значения
+class ReadOnlyValuesSerializer(serializers.BaseSerializer):
+    fields_names = []
+
+    def to_representation(self, instance):
+        return {field: instance[field] for field in self.fields_names}
+
+
+class UserFileStatsSerializer(ReadOnlyValuesSerializer):
+    fields_names = ['id', 'name', 'login', 'email', 'admin', 'files_storage_size', 'files_count', 'files_total_size']
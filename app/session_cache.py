@@ -0,0 +1,128 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+# Кэш соответствия "идентификатор сессии -> данные пользователя" в памяти процесса:
+# записи живут не дольше TTL, при переполнении вытесняются давно не использованные (LRU)
+class LocalMemorySessionCache:
+    def __init__(self, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.user_sessions = {}
+        self.lock = threading.Lock()
+
+    def get(self, session_id):
+        with self.lock:
+            entry = self.entries.get(session_id)
+            if entry is None:
+                return None
+
+            user_id, payload, expires_at = entry
+            if expires_at < time.monotonic():
+                self._remove(session_id)
+                return None
+
+            self.entries.move_to_end(session_id)
+            return payload
+
+    def set(self, session_id, user_id, payload):
+        with self.lock:
+            self._remove(session_id)
+            self.entries[session_id] = (user_id, payload, time.monotonic() + self.ttl)
+            self.user_sessions.setdefault(user_id, set()).add(session_id)
+
+            while len(self.entries) > self.max_size:
+                oldest_session_id = next(iter(self.entries))
+                self._remove(oldest_session_id)
+
+    def invalidate_session(self, session_id):
+        with self.lock:
+            self._remove(session_id)
+
+    def invalidate_user(self, user_id):
+        with self.lock:
+            for session_id in list(self.user_sessions.get(user_id, ())):
+                self._remove(session_id)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.user_sessions.clear()
+
+    def _remove(self, session_id):
+        entry = self.entries.pop(session_id, None)
+        if entry is None:
+            return
+
+        user_id = entry[0]
+        session_ids = self.user_sessions.get(user_id)
+        if session_ids is not None:
+            session_ids.discard(session_id)
+            if not session_ids:
+                del self.user_sessions[user_id]
+
+
+# Тот же кэш поверх фреймворка кэширования Django (например, Redis или Memcached),
+# общий для всех рабочих процессов, поэтому инвалидация видна каждому из них
+class DjangoSessionCache:
+    key_prefix = "session_user"
+
+    def __init__(self, ttl, cache_alias):
+        self.ttl = ttl
+        self.cache = caches[cache_alias]
+
+    def get(self, session_id):
+        return self.cache.get(f"{self.key_prefix}:session:{session_id}")
+
+    def set(self, session_id, user_id, payload):
+        user_key = f"{self.key_prefix}:user:{user_id}"
+        session_ids = set(self.cache.get(user_key, ()))
+        session_ids.add(session_id)
+        self.cache.set_many({
+            f"{self.key_prefix}:session:{session_id}": payload,
+            user_key: list(session_ids)
+        }, self.ttl)
+
+    def invalidate_session(self, session_id):
+        self.cache.delete(f"{self.key_prefix}:session:{session_id}")
+
+    def invalidate_user(self, user_id):
+        user_key = f"{self.key_prefix}:user:{user_id}"
+        session_ids = self.cache.get(user_key, ())
+        self.cache.delete_many([f"{self.key_prefix}:session:{session_id}" for session_id in session_ids] + [user_key])
+
+    def clear(self):
+        self.cache.clear()
+
+
+session_cache = None
+session_cache_lock = threading.Lock()
+
+
+# функция возвращает кэш сессий, выбранный настройкой SESSION_USER_CACHE_BACKEND
+def get_session_cache():
+    global session_cache
+    if session_cache is None:
+        with session_cache_lock:
+            if session_cache is None:
+                if settings.SESSION_USER_CACHE_BACKEND == "django":
+                    session_cache = DjangoSessionCache(
+                        settings.SESSION_USER_CACHE_TTL,
+                        settings.SESSION_USER_CACHE_ALIAS
+                    )
+                else:
+                    session_cache = LocalMemorySessionCache(
+                        settings.SESSION_USER_CACHE_TTL,
+                        settings.SESSION_USER_CACHE_MAX_SIZE
+                    )
+    return session_cache
+
+
+# функция сбрасывает закэшированные данные всех сессий пользователя
+def invalidate_user_sessions(user_id):
+    get_session_cache().invalidate_user(int(user_id))
@@ -0,0 +1,92 @@
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.utils.http import base36_to_int, int_to_base36
+
+from app.models import File
+
+
+# Ссылки для доступа к файлу: токен "<id>.<поколение>.<срок действия>:<подпись>" подписан HMAC на SECRET_KEY,
+# поэтому файл определяется по первичному ключу без поиска по file_link. Срок действия (0 - бессрочная ссылка)
+# проверяется без обращения к базе данных, а поколение сравнивается с File.link_generation: после его увеличения
+# все выданные ранее ссылки на файл перестают действовать.
+# Ссылки старого формата (uuid) по-прежнему ищутся по индексированному полю file_link
+
+SHARE_LINK_SALT = "app.share_links"
+SHARE_LINK_SEPARATOR = ":"
+
+# максимальный срок действия ссылки, который можно указать в expires_in (10 лет)
+SHARE_LINK_MAX_TTL = 10 * 365 * 24 * 60 * 60
+SHARE_LINK_TTL_ERROR = (
+    f"expires_in должен быть целым числом секунд от 0 (бессрочная ссылка) до {SHARE_LINK_MAX_TTL}"
+)
+
+
+# Исключение означает, что срок действия ссылки истёк
+class ShareLinkExpired(Exception):
+    pass
+
+
+# функция возвращает подписыватель ссылок
+def get_share_link_signer():
+    return signing.Signer(sep=SHARE_LINK_SEPARATOR, salt=SHARE_LINK_SALT)
+
+
+# функция возвращает время окончания действия ссылки в секундах Unix или 0 для бессрочной ссылки;
+# некорректный срок действия (не целое число секунд от 0 до SHARE_LINK_MAX_TTL) вызывает ValueError
+def get_share_link_expiry(expires_in=None):
+    if expires_in is None:
+        expires_in = settings.SHARE_LINK_TTL
+    elif isinstance(expires_in, bool) or not isinstance(expires_in, (int, str)):
+        raise ValueError(SHARE_LINK_TTL_ERROR)
+
+    try:
+        expires_in = int(expires_in)
+    except ValueError:
+        raise ValueError(SHARE_LINK_TTL_ERROR)
+    if not 0 <= expires_in <= SHARE_LINK_MAX_TTL:
+        raise ValueError(SHARE_LINK_TTL_ERROR)
+    return int(time.time()) + expires_in if expires_in else 0
+
+
+# функция выдаёт подписанную ссылку на файл для текущего поколения ссылок
+def make_share_token(file_id, link_generation, expires_at):
+    payload = ".".join(int_to_base36(value) for value in (int(file_id), link_generation, expires_at))
+    return get_share_link_signer().sign(payload)
+
+
+# функция разбирает ссылку и возвращает условия поиска файла - (id, поколение) для подписанной ссылки или file_link
+# для ссылки старого формата - и время окончания её действия (0 - бессрочная ссылка); для поддельной ссылки
+# выбрасывается File.DoesNotExist, для просроченной - ShareLinkExpired
+def parse_share_link(link):
+    if not link:
+        raise File.DoesNotExist("File is not found")
+
+    if SHARE_LINK_SEPARATOR not in link:
+        return {"file_link": link}, 0
+
+    try:
+        payload = get_share_link_signer().unsign(link)
+        file_id, link_generation, expires_at = (base36_to_int(value) for value in payload.split("."))
+    except (signing.BadSignature, ValueError):
+        raise File.DoesNotExist("File is not found")
+
+    if expires_at and expires_at < time.time():
+        raise ShareLinkExpired("Срок действия ссылки истёк")
+
+    return {"id": file_id, "link_generation": link_generation}, expires_at
+
+
+# функция возвращает условия поиска файла по ссылке
+def get_share_link_lookup(link):
+    return parse_share_link(link)[0]
+
+
+# функция возвращает время хранения ответа по ссылке в кэшах: не дольше SHARE_LINK_CACHE_MAX_AGE
+# и не дольше оставшегося срока действия ссылки
+def get_share_link_cache_max_age(expires_at):
+    max_age = settings.SHARE_LINK_CACHE_MAX_AGE
+    if expires_at:
+        max_age = min(max_age, max(int(expires_at - time.time()), 0))
+    return max_age
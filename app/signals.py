@@ -1,7 +1,14 @@
-from django.db.models.signals import post_migrate
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate, post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth.hashers import make_password
-from .models import User
+from .blobs import release_blob
+from .metrics import query_metrics_wrapper
+from .previews import delete_file_previews
+from .search import ensure_sqlite_search_triggers, register_sqlite_search_functions
+from .storage_analytics import update_storage_summary
+from .models import User, File
 
 
 # Автоматизированное создание пользователя с административными привилегиями с помощью сигнала post_migrate,
@@ -18,3 +25,52 @@ def create_admin_user(sender, **kwargs):
                 'email': 'admin@admin.com'
             }
         )
+
+
+# Django пересоздаёт таблицу SQLite при изменении её столбцов и при этом удаляет триггеры, поддерживающие
+# таблицу полнотекстового поиска, поэтому после применения миграций они создаются заново
+@receiver(post_migrate)
+def restore_search_triggers(sender, using="default", **kwargs):
+    if sender.name == 'app' and connections[using].vendor == 'sqlite':
+        ensure_sqlite_search_triggers(connections[using])
+
+
+# При удалении File (в том числе каскадном, вместе с пользователем) освобождается ссылка на блоб,
+# физический файл удаляется вместе с последней ссылкой
+@receiver(post_delete, sender=File)
+def release_file_blob(sender, instance, **kwargs):
+    if instance.blob_id is not None:
+        release_blob(instance.blob_id)
+
+
+# Вместе с файлом удаляются его превью из кэша
+@receiver(post_delete, sender=File)
+def delete_file_preview_cache(sender, instance, **kwargs):
+    delete_file_previews(instance.id)
+
+
+# Созданные и удалённые файлы (в том числе удалённые каскадно вместе с пользователем) учитываются
+# в сводной таблице аналитики хранилища
+@receiver(post_save, sender=File)
+def add_file_to_storage_summary(sender, instance, created, **kwargs):
+    if created:
+        update_storage_summary([instance], 1)
+
+
+@receiver(post_delete, sender=File)
+def remove_file_from_storage_summary(sender, instance, **kwargs):
+    update_storage_summary([instance], -1)
+
+
+# К каждому соединению с базой данных подключается обёртка, считающая запросы и их время для метрик
+@receiver(connection_created)
+def install_query_metrics(sender, connection, **kwargs):
+    if query_metrics_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_metrics_wrapper)
+
+
+# К соединениям с SQLite подключаются функции, которые используются при поиске файлов
+@receiver(connection_created)
+def install_sqlite_search_functions(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite':
+        register_sqlite_search_functions(connection)
@@ -0,0 +1,287 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.db.models import F, Q
+
+from app.models import User, File, StorageSummary
+from app.storage_layout import clean_extension
+
+
+logger = logging.getLogger(__name__)
+
+# измерения сводной таблицы: пользователь, расширение файла и день загрузки (UTC, YYYY-MM-DD)
+USER_DIMENSION = "user"
+EXTENSION_DIMENSION = "extension"
+DAY_DIMENSION = "day"
+
+# строки расширений и дней изменяются загрузками всех пользователей, поэтому изменения этих измерений
+# копятся в буфере процесса, а не блокируют общие строки в транзакции каждой загрузки
+BUFFERED_DIMENSIONS = (EXTENSION_DIMENSION, DAY_DIMENSION)
+
+# размер списков пользователей и файлов и длина ряда загрузок в днях: по умолчанию и максимальные
+ANALYTICS_DEFAULT_LIMIT = 10
+ANALYTICS_MAX_LIMIT = 100
+ANALYTICS_DEFAULT_DAYS = 30
+ANALYTICS_MAX_DAYS = 366
+
+LARGEST_FILE_FIELDS = ("id", "file_name", "file_size", "date", "user_id", "user__login")
+
+
+# функция возвращает ключи сводной таблицы, к которым относится файл; расширение берётся из пути на диске,
+# а не из имени файла, поэтому переименование файла не меняет его ключ
+def get_summary_keys(file_obj):
+    extension = clean_extension(os.path.splitext(file_obj.file_path_in_user_dir)[1])
+    return (
+        (USER_DIMENSION, str(file_obj.user_id)),
+        (EXTENSION_DIMENSION, extension),
+        (DAY_DIMENSION, file_obj.date.astimezone(timezone.utc).date().isoformat()),
+    )
+
+
+# функция суммирует изменения по ключам сводной таблицы: sign = 1 для созданных файлов, -1 для удалённых
+def collect_summary_changes(files, sign, changes=None):
+    if changes is None:
+        changes = defaultdict(lambda: [0, 0])
+    for file_obj in files:
+        for summary_key in get_summary_keys(file_obj):
+            changes[summary_key][0] += sign
+            changes[summary_key][1] += sign * int(file_obj.file_size)
+    return changes
+
+
+# функция применяет изменения к сводной таблице атомарными UPDATE на стороне базы данных; строка создаётся
+# при первом файле ключа и удаляется вместе с последним. Ключи обновляются в одном порядке, чтобы
+# одновременные транзакции не блокировали друг друга
+def apply_summary_changes(changes):
+    emptied_keys = Q()
+    has_emptied_keys = False
+
+    with transaction.atomic():
+        for (dimension, key), (count_delta, size_delta) in sorted(changes.items()):
+            if not count_delta and not size_delta:
+                continue
+            summary = StorageSummary.objects.filter(dimension=dimension, key=key)
+            updated_count = summary.update(
+                files_count=F("files_count") + count_delta,
+                files_size=F("files_size") + size_delta
+            )
+            if not updated_count:
+                try:
+                    with transaction.atomic():
+                        StorageSummary.objects.create(
+                            dimension=dimension, key=key, files_count=count_delta, files_size=size_delta
+                        )
+                except IntegrityError:
+                    # такая же строка одновременно создана другим запросом, изменяем её
+                    summary.update(
+                        files_count=F("files_count") + count_delta,
+                        files_size=F("files_size") + size_delta
+                    )
+            if count_delta < 0:
+                emptied_keys |= Q(dimension=dimension, key=key)
+                has_emptied_keys = True
+
+        if has_emptied_keys:
+            StorageSummary.objects.filter(emptied_keys, files_count__lte=0).delete()
+
+
+# Буфер изменений общих строк сводной таблицы (расширения и дни): изменения после фиксации транзакции
+# складываются в памяти процесса и записываются фоновым потоком раз в STORAGE_SUMMARY_FLUSH_INTERVAL секунд
+# одним набором UPDATE, поэтому одновременные загрузки не ждут друг друга на блокировках этих строк
+class SummaryChangesBuffer:
+    def __init__(self, flush_interval):
+        self.flush_interval = flush_interval
+        self.pending = defaultdict(lambda: [0, 0])
+        self.lock = threading.Lock()
+        self.flush_thread = None
+
+    def record(self, changes):
+        self.restore(changes)
+        self.start()
+
+    def start(self):
+        if self.flush_thread is None:
+            with self.lock:
+                if self.flush_thread is None:
+                    self.flush_thread = threading.Thread(
+                        target=self.run, name="storage-summary-flush", daemon=True
+                    )
+                    self.flush_thread.start()
+                    atexit.register(self.flush)
+
+    def run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Не удалось записать изменения сводной таблицы аналитики")
+            finally:
+                connections.close_all()
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, defaultdict(lambda: [0, 0])
+
+        if not pending:
+            return
+        try:
+            apply_summary_changes(pending)
+        except Exception:
+            # незаписанные изменения возвращаются в буфер и будут записаны при следующем сбросе
+            self.restore(pending)
+            raise
+
+    # функция добавляет изменения в буфер, складывая их с уже накопленными
+    def restore(self, changes):
+        with self.lock:
+            for summary_key, (count_delta, size_delta) in changes.items():
+                self.pending[summary_key][0] += count_delta
+                self.pending[summary_key][1] += size_delta
+
+
+summary_changes_buffer = None
+summary_changes_buffer_lock = threading.Lock()
+
+
+# функция возвращает буфер изменений сводной таблицы текущего процесса
+def get_summary_changes_buffer():
+    global summary_changes_buffer
+    if summary_changes_buffer is None:
+        with summary_changes_buffer_lock:
+            if summary_changes_buffer is None:
+                summary_changes_buffer = SummaryChangesBuffer(settings.STORAGE_SUMMARY_FLUSH_INTERVAL)
+    return summary_changes_buffer
+
+
+# функция сохраняет изменения сводной таблицы: строки пользователей изменяются в текущей транзакции,
+# а изменения расширений и дней передаются в буфер после её фиксации (при откате транзакции они не учитываются)
+def save_summary_changes(changes):
+    user_changes = {}
+    buffered_changes = {}
+    for summary_key, summary_change in changes.items():
+        if summary_key[0] in BUFFERED_DIMENSIONS:
+            buffered_changes[summary_key] = summary_change
+        else:
+            user_changes[summary_key] = summary_change
+
+    if user_changes:
+        apply_summary_changes(user_changes)
+    if buffered_changes:
+        transaction.on_commit(lambda: get_summary_changes_buffer().record(buffered_changes))
+
+
+deferred_changes = threading.local()
+
+
+# функция учитывает созданные или удалённые файлы в сводной таблице сразу или, внутри batched_summary_updates,
+# откладывает изменения до конца блока
+def update_storage_summary(files, sign):
+    pending_changes = getattr(deferred_changes, "changes", None)
+    if pending_changes is not None:
+        collect_summary_changes(files, sign, pending_changes)
+        return
+    save_summary_changes(collect_summary_changes(files, sign))
+
+
+# контекстный менеджер для групповых удалений: сводная таблица изменяется одним набором запросов
+# после удаления всех файлов, а не отдельно для каждого файла
+@contextmanager
+def batched_summary_updates():
+    deferred_changes.changes = defaultdict(lambda: [0, 0])
+    try:
+        yield
+        changes = deferred_changes.changes
+    finally:
+        deferred_changes.changes = None
+    save_summary_changes(changes)
+
+
+# функция пересчитывает сводную таблицу по таблице файлов; файлы читаются пачками через iterator(),
+# а таблица заменяется в одной транзакции, поэтому отчёты не видят её частично заполненной. Буфер текущего
+# процесса предварительно записывается, чтобы его изменения не учлись повторно поверх пересчитанной таблицы;
+# буферы других процессов недоступны, поэтому пересчёт выполняется при остановленных рабочих процессах
+def rebuild_storage_summary(batch_size=2000):
+    get_summary_changes_buffer().flush()
+    changes = defaultdict(lambda: [0, 0])
+    files = File.objects.only("user_id", "file_path_in_user_dir", "file_size", "date").iterator(chunk_size=batch_size)
+    collect_summary_changes(files, 1, changes)
+
+    with transaction.atomic():
+        deleted_count, _ = StorageSummary.objects.all().delete()
+        created = StorageSummary.objects.bulk_create([
+            StorageSummary(dimension=dimension, key=key, files_count=files_count, files_size=files_size)
+            for (dimension, key), (files_count, files_size) in changes.items()
+            if files_count > 0
+        ], batch_size=batch_size)
+    return deleted_count, len(created)
+
+
+# функция возвращает строки измерения с наибольшим объёмом файлов
+def get_top_summary_rows(dimension, limit):
+    return list(
+        StorageSummary.objects.filter(dimension=dimension)
+        .order_by("-files_size", "key")
+        .values("key", "files_count", "files_size")[:limit]
+    )
+
+
+# функция формирует отчёт для администратора: итоги, пользователи с наибольшим объёмом файлов, крупнейшие
+# файлы, распределение по расширениям и объём загрузок по дням за последние days дней. Итоги и распределения
+# читаются из сводной таблицы, крупнейшие файлы - по индексу file_size_id_idx
+def get_storage_analytics(limit, days):
+    extensions = get_top_summary_rows(EXTENSION_DIMENSION, None)
+    top_users = get_top_summary_rows(USER_DIMENSION, limit)
+
+    logins = dict(
+        User.objects.filter(id__in=[int(row["key"]) for row in top_users]).values_list("id", "login")
+    )
+    users = [
+        {
+            "user_id": int(row["key"]),
+            "login": logins.get(int(row["key"])),
+            "files_count": row["files_count"],
+            "files_size": row["files_size"],
+        }
+        for row in top_users
+    ]
+
+    first_day = (datetime.now(timezone.utc).date() - timedelta(days=days - 1)).isoformat()
+    uploads = list(
+        StorageSummary.objects.filter(dimension=DAY_DIMENSION, key__gte=first_day)
+        .order_by("key")
+        .values("key", "files_count", "files_size")
+    )
+
+    largest_files = list(
+        File.objects.order_by("-file_size", "-id").values(*LARGEST_FILE_FIELDS)[:limit]
+    )
+    for file_data in largest_files:
+        file_data["login"] = file_data.pop("user__login")
+
+    return {
+        # итоги складываются из строк расширений: их немного, в отличие от строк пользователей
+        "totals": {
+            "users_with_files": StorageSummary.objects.filter(dimension=USER_DIMENSION).count(),
+            "files_count": sum(row["files_count"] for row in extensions),
+            "files_size": sum(row["files_size"] for row in extensions),
+        },
+        "users": users,
+        "largest_files": largest_files,
+        "extensions": [
+            {"extension": row["key"], "files_count": row["files_count"], "files_size": row["files_size"]}
+            for row in extensions
+        ],
+        "uploads": [
+            {"day": row["key"], "files_count": row["files_count"], "files_size": row["files_size"]}
+            for row in uploads
+        ],
+    }
@@ -0,0 +1,43 @@
+import re
+import uuid
+
+from django.conf import settings
+
+
+# допустимое расширение файла: точка и до 16 латинских букв или цифр; всё остальное отбрасывается,
+# чтобы расширение из запроса не могло изменить путь к файлу
+EXTENSION_PATTERN = re.compile(r"^\.[A-Za-z0-9]{1,16}$")
+
+# пространство имён для детерминированных имён файлов при переносе в новую структуру каталогов
+MIGRATION_NAMESPACE = uuid.UUID("5b0b1c1e-6f0e-4c53-9d0c-3f1a2b7d9e41")
+
+
+# функция возвращает безопасное расширение файла или пустую строку
+def clean_extension(extension):
+    extension = (extension or "").lower()
+    return extension if EXTENSION_PATTERN.match(extension) else ""
+
+
+# функция раскладывает уникальное имя объекта по вложенным каталогам: ab/cd/<имя>; первые символы
+# случайного имени распределены равномерно, поэтому в каждом каталоге оказывается небольшое число файлов
+def get_sharded_path(object_name, extension):
+    levels = settings.FILE_STORAGE_SHARD_LEVELS
+    shards = [object_name[level * 2:level * 2 + 2] for level in range(levels)]
+    return "/".join(shards + [f"{object_name}{clean_extension(extension)}"])
+
+
+# функция возвращает путь нового файла внутри каталога пользователя с уникальным именем
+def make_file_path_in_user_dir(extension):
+    return get_sharded_path(uuid.uuid4().hex, extension)
+
+
+# функция возвращает путь файла в новой структуре каталогов при переносе: имя вычисляется по id файла,
+# поэтому повторный запуск прерванного переноса находит уже перенесённый файл
+def make_migrated_file_path(file_id, old_path, extension):
+    object_name = uuid.uuid5(MIGRATION_NAMESPACE, f"{file_id}:{old_path}").hex
+    return get_sharded_path(object_name, extension)
+
+
+# функция проверяет, лежит ли файл уже во вложенных каталогах, а не в плоском каталоге пользователя
+def is_sharded_path(file_path_in_user_dir):
+    return "/" in file_path_in_user_dir
@@ -0,0 +1,315 @@
+import asyncio
+import os
+import re
+import uuid
+
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.encoding import iri_to_uri
+from django.utils.http import http_date, parse_http_date_safe
+
+from app.compression import client_accepts_gzip, open_stored_file
+from app.conditional import get_encoded_etag, not_modified_response, request_not_modified, set_validators
+
+
+RANGE_HEADER_PATTERN = re.compile(r"^\s*bytes\s*=\s*(.+)$", re.IGNORECASE)
+RANGE_SPEC_PATTERN = re.compile(r"^\s*(\d*)\s*-\s*(\d*)\s*$")
+
+# ограничение количества диапазонов в одном запросе, чтобы клиент не мог заставить сервер
+# собирать ответ из тысяч мелких кусков
+MAX_RANGES_PER_REQUEST = 32
+
+# способы отдачи файлов, при которых байты файла отправляет веб-сервер, а не процесс Python
+FILE_OFFLOAD_BACKENDS = ("x-accel-redirect", "x-sendfile")
+
+
+# функция разбирает заголовок Range и возвращает список диапазонов (start, end) включительно,
+# None - если заголовок нужно проигнорировать, или пустой список - если ни один диапазон не выполним
+def parse_range_header(range_header, file_size):
+    match = RANGE_HEADER_PATTERN.match(range_header or "")
+    if match is None:
+        return None
+
+    ranges = []
+    for spec in match.group(1).split(","):
+        spec_match = RANGE_SPEC_PATTERN.match(spec)
+        if spec_match is None:
+            return None
+
+        first, last = spec_match.groups()
+        if not first and not last:
+            return None
+
+        if not first:
+            # суффиксный диапазон "-N": последние N байт файла
+            suffix_length = int(last)
+            if suffix_length == 0:
+                continue
+            start = max(file_size - suffix_length, 0)
+            end = file_size - 1
+        else:
+            start = int(first)
+            end = int(last) if last else file_size - 1
+            if last and end < start:
+                return None
+            if start >= file_size:
+                continue
+            end = min(end, file_size - 1)
+
+        ranges.append((start, end))
+
+    if len(ranges) > MAX_RANGES_PER_REQUEST:
+        return None
+
+    return merge_ranges(ranges)
+
+
+# функция объединяет пересекающиеся и соседние диапазоны
+def merge_ranges(ranges):
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+# функция проверяет условие If-Range: диапазоны отдаются, только если файл не изменился
+def if_range_matches(request, etag, last_modified):
+    if_range = request.headers.get("If-Range")
+    if if_range is None:
+        return True
+
+    if_range = if_range.strip()
+    if if_range.startswith('"') or if_range.startswith("W/"):
+        # для If-Range допускается только строгое сравнение ETag
+        return etag is not None and not if_range.startswith("W/") and if_range == etag
+
+    if_range_date = parse_http_date_safe(if_range)
+    return (
+        if_range_date is not None
+        and last_modified is not None
+        and int(last_modified) == if_range_date
+    )
+
+
+# функция возвращает валидаторы файла на диске: строгий ETag по размеру и времени изменения и Last-Modified
+def file_validators(file_path):
+    file_stat = os.stat(file_path)
+    etag = f'"{file_stat.st_size:x}-{file_stat.st_mtime_ns:x}"'
+    return etag, int(file_stat.st_mtime)
+
+
+# класс отдаёт содержимое открытого файла частями, не загружая его целиком в память;
+# метод close вызывается Django после отправки ответа и закрывает файл
+class FileRangeIterator:
+    def __init__(self, file_handle, ranges, chunk_size, multipart_parts=None, closing_boundary=b""):
+        self.file_handle = file_handle
+        self.ranges = ranges
+        self.chunk_size = chunk_size
+        self.multipart_parts = multipart_parts
+        self.closing_boundary = closing_boundary
+
+    def __iter__(self):
+        for index, (start, end) in enumerate(self.ranges):
+            if self.multipart_parts is not None:
+                yield self.multipart_parts[index]
+
+            self.file_handle.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = self.file_handle.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+        if self.closing_boundary:
+            yield self.closing_boundary
+
+    def close(self):
+        self.file_handle.close()
+
+
+# асинхронный вариант для ASGI: чтение с диска выполняется в отдельном потоке, цикл событий не блокируется,
+# а Django не собирает синхронный итератор в список целиком
+class AsyncFileRangeIterator(FileRangeIterator):
+    def __iter__(self):
+        raise TypeError("AsyncFileRangeIterator поддерживает только асинхронную итерацию")
+
+    async def __aiter__(self):
+        for index, (start, end) in enumerate(self.ranges):
+            if self.multipart_parts is not None:
+                yield self.multipart_parts[index]
+
+            await asyncio.to_thread(self.file_handle.seek, start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = await asyncio.to_thread(self.file_handle.read, min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+        if self.closing_boundary:
+            yield self.closing_boundary
+
+
+# функция формирует потоковый ответ с поддержкой Range/If-Range (206 Partial Content, multipart/byteranges)
+def ranged_file_response(request, file_handle, file_size, file_name, content_type="application/octet-stream",
+                         etag=None, last_modified=None, asynchronous=False):
+    chunk_size = settings.FILE_STREAM_CHUNK_SIZE
+    iterator_class = AsyncFileRangeIterator if asynchronous else FileRangeIterator
+
+    ranges = None
+    range_header = request.headers.get("Range")
+    if range_header is not None and if_range_matches(request, etag, last_modified):
+        ranges = parse_range_header(range_header, file_size)
+
+    if ranges is not None and not ranges:
+        file_handle.close()
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{file_size}"
+        response["Accept-Ranges"] = "bytes"
+        return response
+
+    if ranges is None:
+        response = StreamingHttpResponse(
+            iterator_class(file_handle, [(0, file_size - 1)], chunk_size),
+            content_type=content_type
+        )
+        response["Content-Length"] = str(file_size)
+
+    elif len(ranges) == 1:
+        start, end = ranges[0]
+        response = StreamingHttpResponse(
+            iterator_class(file_handle, ranges, chunk_size),
+            content_type=content_type,
+            status=206
+        )
+        response["Content-Range"] = f"bytes {start}-{end}/{file_size}"
+        response["Content-Length"] = str(end - start + 1)
+
+    else:
+        boundary = uuid.uuid4().hex
+        multipart_parts = [
+            (
+                f"\r\n--{boundary}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Range: bytes {start}-{end}/{file_size}\r\n\r\n"
+            ).encode("ascii")
+            for start, end in ranges
+        ]
+        closing_boundary = f"\r\n--{boundary}--\r\n".encode("ascii")
+        content_length = (
+            sum(len(part) for part in multipart_parts)
+            + sum(end - start + 1 for start, end in ranges)
+            + len(closing_boundary)
+        )
+        response = StreamingHttpResponse(
+            iterator_class(file_handle, ranges, chunk_size, multipart_parts, closing_boundary),
+            content_type=f"multipart/byteranges; boundary={boundary}",
+            status=206
+        )
+        response["Content-Length"] = str(content_length)
+
+    response["Accept-Ranges"] = "bytes"
+    response["Content-Disposition"] = f'attachment; filename="{file_name}"'
+    if etag is not None:
+        response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified)
+    return response
+
+
+# функция передаёт отдачу файла веб-серверу: nginx (X-Accel-Redirect) или Apache/lighttpd (X-Sendfile);
+# тело ответа пустое, файл отправляется самим веб-сервером через sendfile(2)
+def offloaded_file_response(file_path, file_name, content_type="application/octet-stream"):
+    response = HttpResponse(content_type=content_type)
+    if settings.FILE_DELIVERY_BACKEND == "x-accel-redirect":
+        relative_path = os.path.relpath(file_path, settings.MEDIA_ROOT).replace(os.sep, "/")
+        accel_prefix = settings.FILE_DELIVERY_ACCEL_PREFIX.rstrip("/")
+        response["X-Accel-Redirect"] = iri_to_uri(f"{accel_prefix}/{relative_path}")
+    else:
+        response["X-Sendfile"] = file_path
+
+    response["Content-Disposition"] = f'attachment; filename="{file_name}"'
+    return response
+
+
+# функция отдаёт файл, сохранённый на диске в сжатом виде: клиенту, который принимает gzip, сжатые байты
+# отправляются без распаковки (Content-Encoding: gzip), остальным и для запросов Range - исходное содержимое,
+# распакованное потоком при чтении
+def compressed_file_response(request, file_path, file_name, codec, original_size, etag, last_modified,
+                             content_type="application/octet-stream", asynchronous=False):
+    if accepts_encoded_content(request):
+        iterator_class = AsyncFileRangeIterator if asynchronous else FileRangeIterator
+        stored_size = os.path.getsize(file_path)
+        response = StreamingHttpResponse(
+            iterator_class(open(file_path, "rb"), [(0, stored_size - 1)], settings.FILE_STREAM_CHUNK_SIZE),
+            content_type=content_type
+        )
+        response["Content-Length"] = str(stored_size)
+        response["Content-Encoding"] = codec
+        response["Content-Disposition"] = f'attachment; filename="{file_name}"'
+        set_validators(response, get_encoded_etag(etag, codec), last_modified)
+    else:
+        response = ranged_file_response(
+            request,
+            open_stored_file(file_path, codec),
+            original_size,
+            file_name,
+            content_type=content_type,
+            etag=etag,
+            last_modified=last_modified,
+            asynchronous=asynchronous
+        )
+
+    response["Vary"] = "Accept-Encoding"
+    return response
+
+
+# функция проверяет, можно ли отдать клиенту сжатое представление файла без распаковки
+def accepts_encoded_content(request):
+    return client_accepts_gzip(request) and "Range" not in request.headers
+
+
+# функция выбирает способ отдачи файла в соответствии с настройкой FILE_DELIVERY_BACKEND;
+# потоковая отдача средствами Django остаётся вариантом по умолчанию.
+# Сжатые на диске файлы всегда отдаются через Django: веб-сервер отдал бы их без заголовка Content-Encoding.
+# etag - строгий ETag содержимого (например, по sha256 блоба), по умолчанию вычисляется по размеру и времени
+# изменения файла; если копия клиента актуальна, возвращается 304 без чтения файла
+def file_delivery_response(request, file_path, file_name, content_type="application/octet-stream",
+                           codec="", original_size=None, etag=None, asynchronous=False):
+    file_etag, last_modified = file_validators(file_path)
+    etag = etag or file_etag
+
+    response_etag = etag
+    if codec and accepts_encoded_content(request):
+        response_etag = get_encoded_etag(etag, codec)
+    if request_not_modified(request, response_etag, last_modified):
+        response = not_modified_response(response_etag, last_modified)
+        if codec:
+            response["Vary"] = "Accept-Encoding"
+        return response
+
+    if codec:
+        return compressed_file_response(
+            request, file_path, file_name, codec, original_size, etag, last_modified,
+            content_type=content_type, asynchronous=asynchronous
+        )
+
+    if settings.FILE_DELIVERY_BACKEND in FILE_OFFLOAD_BACKENDS:
+        return offloaded_file_response(file_path, file_name, content_type)
+
+    return ranged_file_response(
+        request,
+        open(file_path, "rb"),
+        os.path.getsize(file_path),
+        file_name,
+        content_type=content_type,
+        etag=etag,
+        last_modified=last_modified,
+        asynchronous=asynchronous
+    )
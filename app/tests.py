@@ -1,3 +1,660 @@
-from django.test import TestCase
+import io
+import os
+import threading
+import time
+import uuid
+import zipfile
+from datetime import datetime, timedelta, timezone
 
-# Create your tests here.
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DEFAULT_DB_ALIAS, connection, transaction
+from django.db.models import Sum
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+
+from app.blobs import (
+    BLOB_STAGING_DIR_NAME, BLOB_STAGING_MAX_AGE, BLOBS_DIR_NAME, get_blob_full_path, remove_stale_staged_blobs
+)
+from app.db_router import PRIMARY_PIN_COOKIE, ReadReplicaRouter, current_routing_state
+from app.models import Blob, User, File, Session, UploadSession
+from app.search import search_files, sqlite_search_table_exists
+from app.share_links import make_share_token
+from app.storage_analytics import get_summary_changes_buffer
+from app.streaming import parse_range_header
+from app.uploads import get_staging_path
+from app.views import create_file_object
+
+
+# Базовый класс тестов, выполняющих обработчики on_commit: изменения, накопленные в буфере сводной таблицы
+# аналитики, записываются в тестовую базу данных в конце теста, а не при выходе из процесса, когда её уже нет
+class AppTestCase(TestCase):
+    def tearDown(self):
+        get_summary_changes_buffer().flush()
+        super().tearDown()
+
+
+# функция создаёт пользователя для тестов
+def create_test_user(login, admin=False):
+    return User.objects.create(name=login, login=login, password="-", email=f"{login}@test.com", admin=admin)
+
+
+# функция загружает файл пользователя так же, как представление create_file
+def upload_test_file(user, file_name, content=b"content"):
+    extension = "." + file_name.rsplit(".", 1)[-1] if "." in file_name else ""
+    return create_file_object(
+        user.id, file_name, "", SimpleUploadedFile(file_name, content), len(content), extension
+    )
+
+
+# Поиск файлов на SQLite: кандидаты выбираются из таблицы FTS5, регистр не учитывается и для кириллицы
+class SqliteSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(name="Test", login="tester", password="-", email="tester@test.com")
+        cls.other_user = User.objects.create(name="Other", login="other", password="-", email="other@test.com")
+        cls.report = cls.create_file(cls.user, "Отчёт Квартал.pdf", "Проверено бухгалтерией")
+        cls.photo = cls.create_file(cls.user, "Photo_2024.JPG", "Отпуск")
+        cls.notes = cls.create_file(cls.user, "notes.txt", "черновик отчёта")
+        cls.other_report = cls.create_file(cls.other_user, "Отчёт.pdf", "")
+
+    @classmethod
+    def create_file(cls, user, file_name, comment):
+        return File.objects.create(
+            user=user, file_name=file_name, comment=comment, file_content=f"user_{user.id}/{file_name}",
+            file_path_in_user_dir=file_name, file_link="", file_size=1
+        )
+
+    def search(self, query, mode):
+        files = search_files(File.objects.filter(user=self.user), query, mode, connection)
+        return set(files.values_list("id", flat=True))
+
+    def test_fts_table_is_used(self):
+        self.assertEqual(connection.vendor, "sqlite")
+        self.assertTrue(sqlite_search_table_exists(connection))
+
+    def test_substring_mode_ignores_case(self):
+        self.assertEqual(self.search("ОТЧЁТ", "substring"), {self.report.id, self.notes.id})
+        self.assertEqual(self.search("квартал", "substring"), {self.report.id})
+        self.assertEqual(self.search("photo_20", "substring"), {self.photo.id})
+
+    def test_prefix_mode_ignores_case(self):
+        self.assertEqual(self.search("отчёт к", "prefix"), {self.report.id})
+        self.assertEqual(self.search("ОТП", "prefix"), {self.photo.id})
+        self.assertEqual(self.search("PHOTO", "prefix"), {self.photo.id})
+
+    def test_prefix_mode_matches_only_start(self):
+        self.assertEqual(self.search("квартал", "prefix"), set())
+        self.assertEqual(self.search("Черновик", "prefix"), {self.notes.id})
+
+    def test_short_queries_without_index(self):
+        self.assertEqual(self.search("оТ", "prefix"), {self.report.id, self.photo.id})
+        self.assertEqual(self.search("кв", "substring"), {self.report.id})
+
+    def test_like_wildcards_are_literal(self):
+        self.assertEqual(self.search("photo_", "prefix"), {self.photo.id})
+        self.assertEqual(self.search("%", "substring"), set())
+
+    def test_index_follows_rename_and_delete(self):
+        File.objects.filter(id=self.notes.id).update(file_name="Итоги.txt", comment="")
+        self.assertEqual(self.search("итоги", "prefix"), {self.notes.id})
+        self.assertEqual(self.search("черновик", "substring"), set())
+
+        File.objects.filter(id=self.report.id).delete()
+        self.assertEqual(self.search("квартал", "substring"), set())
+
+
+# Маршрутизация чтений на реплику: основная база данных и реплика - разные базы SQLite с разным содержимым,
+# поэтому по ответу видно, откуда прочитаны данные. TransactionTestCase нужен потому, что внутри транзакции
+# TestCase маршрутизатор всегда читает с основной базы данных
+class ReadReplicaRoutingTests(TransactionTestCase):
+    databases = {DEFAULT_DB_ALIAS, "replica_1"}
+
+    def setUp(self):
+        # реплика отстаёт от основной базы данных: у файла другой комментарий
+        for alias, comment in ((DEFAULT_DB_ALIAS, "primary"), ("replica_1", "replica")):
+            User.objects.using(alias).bulk_create([
+                User(id=1000, name="Test", login="tester", password="-", email="tester@test.com")
+            ])
+            File.objects.using(alias).bulk_create([
+                File(id=1000, user_id=1000, file_name="a.txt", comment=comment, file_content="user_1000/a.txt",
+                     file_path_in_user_dir="a.txt", file_link="legacy-link", file_size=1)
+            ])
+
+    def retrieve(self, client, link):
+        return client.get("/api/retrieve_by_link/", {"link": link})
+
+    def test_reads_go_to_replica(self):
+        response = self.retrieve(self.client, "legacy-link")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["comment"], "replica")
+        self.assertNotIn(PRIMARY_PIN_COOKIE, response.cookies)
+
+    def test_writes_go_to_primary_and_pin_the_client(self):
+        response = self.client.patch("/api/get_link_for_file/", {"file_id": 1000}, content_type="application/json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(File.objects.using(DEFAULT_DB_ALIAS).get(id=1000).file_link, response.data["file_link"])
+        self.assertEqual(File.objects.using("replica_1").get(id=1000).file_link, "legacy-link")
+
+        pin_cookie = response.cookies[PRIMARY_PIN_COOKIE]
+        window = settings.DATABASE_READ_YOUR_WRITES_WINDOW
+        self.assertEqual(pin_cookie["max-age"], window)
+        self.assertAlmostEqual(float(pin_cookie.value), time.time() + window, delta=2)
+
+    def test_pinned_client_reads_its_writes_from_primary(self):
+        file_link = self.client.patch(
+            "/api/get_link_for_file/", {"file_id": 1000}, content_type="application/json"
+        ).data["file_link"]
+
+        # клиент с cookie закрепления читает с основной базы данных, другой клиент - с реплики
+        response = self.retrieve(self.client, file_link)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["comment"], "primary")
+        self.assertEqual(self.retrieve(self.client_class(), file_link).data["comment"], "replica")
+
+    def test_pin_expires_after_window(self):
+        file_link = self.client.patch(
+            "/api/get_link_for_file/", {"file_id": 1000}, content_type="application/json"
+        ).data["file_link"]
+
+        self.assertEqual(self.retrieve(self.client, file_link).data["comment"], "primary")
+
+        self.client.cookies[PRIMARY_PIN_COOKIE] = f"{time.time() - 1:.3f}"
+        self.assertEqual(self.retrieve(self.client, file_link).data["comment"], "replica")
+
+    def test_router_reads_primary_after_write_and_in_transaction(self):
+        router = ReadReplicaRouter()
+        state = {"replica_reads": True, "replica": None, "wrote": False, "pinned": False}
+        token = current_routing_state.set(state)
+        try:
+            self.assertEqual(router.db_for_read(File), "replica_1")
+            with transaction.atomic():
+                self.assertIsNone(router.db_for_read(File))
+
+            self.assertEqual(router.db_for_write(File), DEFAULT_DB_ALIAS)
+            self.assertIsNone(router.db_for_read(File))
+        finally:
+            current_routing_state.reset(token)
+
+    def test_views_without_decorator_read_primary(self):
+        state = {"replica_reads": False, "replica": None, "wrote": False, "pinned": False}
+        token = current_routing_state.set(state)
+        try:
+            self.assertEqual(File.objects.get(id=1000).comment, "primary")
+        finally:
+            current_routing_state.reset(token)
+
+
+# Групповые операции над файлами: результат по каждому id и проверка file_ids
+class BulkFilesOperationTests(AppTestCase):
+    def setUp(self):
+        self.user = create_test_user("owner")
+        self.other_user = create_test_user("stranger")
+        self.files = [upload_test_file(self.user, f"{index}.txt", f"file {index}".encode()) for index in range(3)]
+        self.other_file = upload_test_file(self.other_user, "other.txt", b"other")
+
+    def bulk(self, **data):
+        data.setdefault("user_id", self.user.id)
+        data.setdefault("is_user_files_for_admin", False)
+        return self.client.post("/api/files/bulk/", data, content_type="application/json")
+
+    def test_results_per_file_id(self):
+        file_ids = [self.files[0].id, self.other_file.id, 999999]
+        response = self.bulk(file_ids=file_ids, operation="delete")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {result["file_id"]: result["status"] for result in response.data["results"]},
+            {self.files[0].id: "deleted", self.other_file.id: "forbidden", 999999: "not_found"}
+        )
+        self.assertFalse(File.objects.filter(id=self.files[0].id).exists())
+        self.assertTrue(File.objects.filter(id=self.other_file.id).exists())
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.files_storage_size, sum(file.file_size for file in self.files[1:]))
+
+    def test_comment_operation(self):
+        response = self.bulk(file_ids=[file.id for file in self.files], operation="comment", value="новый")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(File.objects.filter(user=self.user).values_list("comment", flat=True)), {"новый"})
+
+    def test_invalid_file_ids_are_rejected(self):
+        for file_ids in (str(self.files[0].id), [], [True], [1.5], [str(self.files[0].id)], None, {"1": 1}):
+            with self.subTest(file_ids=file_ids):
+                response = self.bulk(file_ids=file_ids, operation="delete")
+                self.assertEqual(response.status_code, 400)
+
+        self.assertEqual(File.objects.count(), 4)
+
+
+# Сессии возобновляемой загрузки: порядок частей, повторная отправка и завершение загрузки
+class UploadSessionTests(AppTestCase):
+    def setUp(self):
+        self.user = create_test_user("uploader")
+
+    def create_session(self, file_size=10, **data):
+        data = {"user_id": self.user.id, "file_name": "big.bin", "comment": "", "file_size": file_size,
+                "extension": ".bin", **data}
+        return self.client.post("/api/upload_sessions/", data, content_type="application/json")
+
+    def send_chunk(self, upload_id, chunk_number, content):
+        return self.client.put(
+            f"/api/upload_sessions/{upload_id}/chunks/{chunk_number}/", content,
+            content_type="application/octet-stream"
+        )
+
+    def finalize(self, upload_id):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(f"/api/upload_sessions/{upload_id}/finalize/")
+
+    def test_chunks_are_appended_in_order(self):
+        upload_id = self.create_session().data["upload_session"]["upload_id"]
+
+        self.assertEqual(self.send_chunk(upload_id, 0, b"hello").status_code, 200)
+        # повторная отправка полученной части ничего не меняет, часть не по порядку отклоняется
+        self.assertEqual(self.send_chunk(upload_id, 0, b"HELLO").data["upload_session"]["received_size"], 5)
+        self.assertEqual(self.send_chunk(upload_id, 2, b"!").status_code, 409)
+        self.assertEqual(self.send_chunk(upload_id, 1, b"world!").status_code, 400)
+
+        response = self.send_chunk(upload_id, 1, b"world")
+        self.assertEqual(response.data["upload_session"]["received_chunks"], 2)
+        with open(get_staging_path(upload_id), "rb") as staging_file:
+            self.assertEqual(staging_file.read(), b"helloworld")
+
+    def test_finalize_creates_file_once(self):
+        upload_id = self.create_session().data["upload_session"]["upload_id"]
+        self.send_chunk(upload_id, 0, b"hello")
+        self.assertEqual(self.finalize(upload_id).status_code, 400)
+        self.send_chunk(upload_id, 1, b"world")
+
+        response = self.finalize(upload_id)
+        self.assertEqual(response.status_code, 200)
+        file_obj = File.objects.get(id=response.data["create_object"]["id"])
+        with file_obj.file_content.open("rb") as stored_file:
+            self.assertEqual(stored_file.read(), b"helloworld")
+        self.assertFalse(os.path.exists(get_staging_path(upload_id)))
+
+        # повторное завершение не создаёт второй файл и не увеличивает размер хранилища
+        self.assertEqual(self.finalize(upload_id).status_code, 404)
+        self.assertEqual(File.objects.filter(user=self.user).count(), 1)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.files_storage_size, 10)
+
+    def test_expired_session_is_rejected(self):
+        upload_id = self.create_session(file_size=5).data["upload_session"]["upload_id"]
+        self.send_chunk(upload_id, 0, b"hello")
+        UploadSession.objects.filter(upload_id=upload_id).update(
+            expires_at=datetime.now(timezone.utc) - timedelta(seconds=1)
+        )
+
+        self.assertEqual(self.send_chunk(upload_id, 1, b"").status_code, 410)
+        self.assertEqual(self.finalize(upload_id).status_code, 410)
+        self.assertFalse(File.objects.filter(user=self.user).exists())
+
+    def test_invalid_file_size_is_rejected(self):
+        for file_size in (-1, "abc", 1.5, True, None):
+            with self.subTest(file_size=file_size):
+                self.assertEqual(self.create_session(file_size=file_size).status_code, 400)
+        self.assertEqual(self.create_session(file_size="0").status_code, 200)
+
+
+# Хранилище блобов: одинаковое содержимое хранится один раз, файл блоба удаляется вместе с последней ссылкой
+# и не остаётся на диске после отката транзакции
+class BlobStorageTests(AppTestCase):
+    def setUp(self):
+        self.user = create_test_user("blob_owner")
+        # содержимое уникально для теста: каталог медиафайлов общий для всех тестов
+        self.content = uuid.uuid4().hex.encode()
+
+    def upload(self, file_name):
+        with self.captureOnCommitCallbacks(execute=True):
+            return upload_test_file(self.user, file_name, self.content)
+
+    def delete(self, file_obj):
+        with self.captureOnCommitCallbacks(execute=True):
+            file_obj.delete()
+
+    def test_same_content_is_stored_once(self):
+        first_file = self.upload("first.bin")
+        second_file = self.upload("second.bin")
+
+        self.assertEqual(first_file.blob_id, second_file.blob_id)
+        blob = Blob.objects.get(id=first_file.blob_id)
+        self.assertEqual(blob.ref_count, 2)
+        with open(get_blob_full_path(blob.storage_path), "rb") as blob_file:
+            self.assertEqual(blob_file.read(), self.content)
+
+    def test_last_reference_removes_blob(self):
+        first_file = self.upload("first.bin")
+        second_file = self.upload("second.bin")
+        blob = Blob.objects.get(id=first_file.blob_id)
+
+        self.delete(first_file)
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+        self.assertTrue(os.path.exists(get_blob_full_path(blob.storage_path)))
+
+        self.delete(second_file)
+        self.assertFalse(Blob.objects.filter(id=blob.id).exists())
+        self.assertFalse(os.path.exists(get_blob_full_path(blob.storage_path)))
+
+    def test_rollback_leaves_no_blob_file(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                file_obj = upload_test_file(self.user, "rollback.bin", self.content)
+                storage_path = file_obj.blob.storage_path
+                raise RuntimeError
+
+        self.assertEqual(callbacks, [])
+        self.assertFalse(Blob.objects.exists())
+        self.assertFalse(os.path.exists(get_blob_full_path(storage_path)))
+
+        # временные файлы отменённых транзакций удаляются, когда становятся старше BLOB_STAGING_MAX_AGE
+        staging_dir = get_blob_full_path(f"{BLOBS_DIR_NAME}/{BLOB_STAGING_DIR_NAME}")
+        stale_time = time.time() - BLOB_STAGING_MAX_AGE - 1
+        for entry in os.scandir(staging_dir):
+            os.utime(entry.path, (stale_time, stale_time))
+        remove_stale_staged_blobs()
+        self.assertEqual(os.listdir(staging_dir), [])
+
+    def test_released_blob_reused_before_removal_is_kept(self):
+        first_file = self.upload("first.bin")
+        blob = Blob.objects.get(id=first_file.blob_id)
+
+        # удаление блоба без ссылок выполняется после фиксации; до него то же содержимое загружается снова
+        with self.captureOnCommitCallbacks() as callbacks:
+            first_file.delete()
+        second_file = self.upload("second.bin")
+        for callback in callbacks:
+            callback()
+
+        self.assertEqual(second_file.blob_id, blob.id)
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+        self.assertTrue(os.path.exists(get_blob_full_path(blob.storage_path)))
+
+
+# Асинхронные представления: разбор тела запроса и загрузка файла через форму
+class AsyncViewsTests(AppTestCase):
+    def setUp(self):
+        self.user = create_test_user("async_user")
+
+    def test_json_body_must_be_object(self):
+        for body in ("[]", "1", '"text"', "{"):
+            with self.subTest(body=body):
+                response = self.client.patch("/api/async/download_file/", body, content_type="application/json")
+                self.assertEqual(response.status_code, 400)
+
+    def test_create_file_from_form(self):
+        content = uuid.uuid4().hex.encode()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/api/async/files/", {
+                "file_name": "form.txt", "user_id": self.user.id, "comment": "", "file_size": len(content),
+                "extension": ".txt", "new_file": SimpleUploadedFile("form.txt", content)
+            })
+
+        self.assertEqual(response.status_code, 200)
+        file_obj = File.objects.get(id=response.json()["create_object"]["id"])
+        with file_obj.file_content.open("rb") as stored_file:
+            self.assertEqual(stored_file.read(), content)
+
+
+# Поиск по файлам всех пользователей доступен только администратору с открытой сессией
+class AdminSearchTests(AppTestCase):
+    def setUp(self):
+        self.admin = create_test_user("search_admin", admin=True)
+        self.user = create_test_user("search_user")
+        upload_test_file(self.user, "secret.txt")
+        # чтения выполняются на основной базе данных: тестовая реплика не содержит данных теста
+        self.client.cookies[PRIMARY_PIN_COOKIE] = str(time.time() + 60)
+
+    def login(self, user):
+        session_id = uuid.uuid4().hex
+        Session.objects.create(session_id=session_id, user=user, login=user.login)
+        self.client.cookies["user_session_id"] = session_id
+
+    def search_all(self):
+        return self.client.post(
+            "/api/search_files/", {"query": "secret", "is_user_files_for_admin": True}, content_type="application/json"
+        )
+
+    def test_flag_without_session_is_rejected(self):
+        self.assertEqual(self.search_all().status_code, 401)
+
+    def test_non_admin_session_is_rejected(self):
+        self.login(self.user)
+        self.assertEqual(self.search_all().status_code, 403)
+
+    def test_admin_session_searches_all_users(self):
+        self.login(self.admin)
+        response = self.search_all()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([file["file_name"] for file in response.data["results"]], ["secret.txt"])
+
+
+# Разбор заголовка Range: обычные, открытые и суффиксные диапазоны, объединение и невыполнимые диапазоны
+class RangeHeaderTests(SimpleTestCase):
+    def test_single_and_open_ranges(self):
+        self.assertEqual(parse_range_header("bytes=0-9", 100), [(0, 9)])
+        self.assertEqual(parse_range_header("bytes=90-", 100), [(90, 99)])
+        self.assertEqual(parse_range_header("bytes=95-200", 100), [(95, 99)])
+
+    def test_suffix_ranges(self):
+        self.assertEqual(parse_range_header("bytes=-10", 100), [(90, 99)])
+        self.assertEqual(parse_range_header("bytes=-200", 100), [(0, 99)])
+        self.assertEqual(parse_range_header("bytes=-0", 100), [])
+
+    def test_multiple_ranges_are_merged(self):
+        self.assertEqual(parse_range_header("bytes=20-29,0-4", 100), [(0, 4), (20, 29)])
+        self.assertEqual(parse_range_header("bytes=0-4,5-9,8-12", 100), [(0, 12)])
+
+    def test_unsatisfiable_ranges(self):
+        self.assertEqual(parse_range_header("bytes=100-", 100), [])
+        self.assertEqual(parse_range_header("bytes=100-200,150-", 100), [])
+
+    def test_invalid_headers_are_ignored(self):
+        for range_header in (None, "", "items=0-1", "bytes=5-2", "bytes=-", "bytes=a-b"):
+            with self.subTest(range_header=range_header):
+                self.assertIsNone(parse_range_header(range_header, 100))
+
+
+# Скачивание по ссылке: Range (в том числе multipart и 416), ETag с ответом 304, срок действия, подделка
+# и отзыв ссылок
+class ShareLinkDownloadTests(AppTestCase):
+    def setUp(self):
+        self.user = create_test_user("sharer")
+        self.content = bytes(range(100))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.file = upload_test_file(self.user, f"{uuid.uuid4().hex}.bin", self.content)
+
+    def download(self, link, **headers):
+        response = self.client.get("/api/download_by_link/", {"link": link}, headers=headers)
+        content = b"".join(response.streaming_content) if response.streaming else response.content
+        return response, content
+
+    def share_token(self, expires_at=0):
+        return make_share_token(self.file.id, self.file.link_generation, expires_at)
+
+    def test_full_download(self):
+        response, content = self.download(self.share_token())
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(content, self.content)
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+
+    def test_single_range(self):
+        response, content = self.download(self.share_token(), Range="bytes=-10")
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], "bytes 90-99/100")
+        self.assertEqual(content, self.content[90:])
+
+    def test_multipart_ranges(self):
+        response, content = self.download(self.share_token(), Range="bytes=0-1,50-51")
+
+        self.assertEqual(response.status_code, 206)
+        self.assertTrue(response["Content-Type"].startswith("multipart/byteranges; boundary="))
+        self.assertIn(b"Content-Range: bytes 0-1/100", content)
+        self.assertIn(b"Content-Range: bytes 50-51/100", content)
+        self.assertIn(self.content[50:52], content)
+
+    def test_unsatisfiable_range(self):
+        response, _ = self.download(self.share_token(), Range="bytes=100-")
+
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], "bytes */100")
+
+    def test_not_modified(self):
+        response, _ = self.download(self.share_token())
+        etag = response["ETag"]
+
+        response, content = self.download(self.share_token(), If_None_Match=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(content, b"")
+        self.assertEqual(response["ETag"], etag)
+
+        response, _ = self.download(self.share_token(), If_None_Match='"other"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_issued_link_with_expiry(self):
+        response = self.client.patch(
+            "/api/get_link_for_file/", {"file_id": self.file.id, "expires_in": 60}, content_type="application/json"
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertAlmostEqual(response.data["expires_at"], time.time() + 60, delta=5)
+        response, content = self.download(response.data["file_link"])
+        self.assertEqual(content, self.content)
+        # ответ по ссылке кэшируется не дольше оставшегося срока её действия
+        self.assertLessEqual(int(response["Cache-Control"].rsplit("max-age=", 1)[1]), 60)
+
+    def test_expired_link(self):
+        response, _ = self.download(self.share_token(expires_at=int(time.time()) - 1))
+        self.assertEqual(response.status_code, 410)
+
+    def test_tampered_link(self):
+        payload, signature = self.share_token().split(":")
+        file_id, link_generation, expires_at = payload.split(".")
+        other_file = upload_test_file(self.user, "other.bin", b"other")
+        other_payload = make_share_token(other_file.id, other_file.link_generation, 0).split(":")[0]
+        for link in (
+            f"{payload}:{signature[:-1]}{'B' if signature.endswith('A') else 'A'}",
+            f"{other_payload}:{signature}",
+            f"{file_id}.{link_generation}.zz:{signature}",
+            f"{payload}:",
+        ):
+            with self.subTest(link=link):
+                self.assertEqual(self.download(link)[0].status_code, 404)
+
+    def test_revoked_links_stop_working(self):
+        link = self.share_token()
+        response = self.client.post("/api/files/bulk/", {
+            "user_id": self.user.id, "is_user_files_for_admin": False, "file_ids": [self.file.id],
+            "operation": "revoke_links"
+        }, content_type="application/json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.download(link)[0].status_code, 404)
+        self.file.refresh_from_db()
+        self.assertEqual(self.download(self.share_token())[0].status_code, 200)
+
+
+# Скачивание нескольких файлов ZIP-архивом: содержимое сжатых и несжатых файлов и проверка прав
+class ZipDownloadTests(AppTestCase):
+    def setUp(self):
+        self.user = create_test_user("zipper")
+        self.text = ("строка журнала\n" * 500).encode()
+        self.binary = os.urandom(3000)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.text_file = upload_test_file(self.user, "log.txt", self.text)
+            self.binary_file = upload_test_file(self.user, "data.bin", self.binary)
+
+    def download_zip(self, file_ids, user_id=None):
+        return self.client.patch("/api/download_zip/", {
+            "user_id": user_id or self.user.id, "file_ids": file_ids, "is_user_files_for_admin": False
+        }, content_type="application/json")
+
+    def test_archive_contents(self):
+        self.assertEqual(self.text_file.codec, "gzip")
+        response = self.download_zip([self.text_file.id, self.binary_file.id])
+
+        self.assertEqual(response.status_code, 200)
+        with zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content))) as archive:
+            self.assertEqual(archive.namelist(), ["log.txt", "data.bin"])
+            self.assertEqual(archive.read("log.txt"), self.text)
+            self.assertEqual(archive.read("data.bin"), self.binary)
+
+    def test_foreign_and_missing_files(self):
+        other_user = create_test_user("zip_stranger")
+        self.assertEqual(self.download_zip([self.text_file.id], user_id=other_user.id).status_code, 401)
+        self.assertEqual(self.download_zip([self.text_file.id, 999999]).status_code, 404)
+        self.assertEqual(self.download_zip("1").status_code, 400)
+
+
+# Список пользователей для администратора: количество и суммарный размер файлов считаются одним запросом
+class UserFileStatsTests(AppTestCase):
+    def setUp(self):
+        self.client.cookies[PRIMARY_PIN_COOKIE] = str(time.time() + 60)
+
+    def test_files_count_in_user_list(self):
+        owner = create_test_user("stats_owner")
+        create_test_user("stats_empty")
+        for index in range(3):
+            upload_test_file(owner, f"{index}.bin", b"x" * (index + 1))
+
+        response = self.client.post(
+            "/api/get_users/", {"request_from_admin": True, "file_stats": True}, content_type="application/json"
+        )
+
+        self.assertEqual(response.status_code, 200)
+        stats = {user["login"]: (user["files_count"], user["files_total_size"]) for user in response.data}
+        self.assertEqual(stats["stats_owner"], (3, 6))
+        self.assertEqual(stats["stats_empty"], (0, 0))
+
+
+# Размер хранилища пользователя после параллельных загрузок и удалений совпадает с SUM(file_size) его файлов
+class StorageSizeConcurrencyTests(TransactionTestCase):
+    THREADS_COUNT = 4
+    FILES_PER_THREAD = 5
+
+    def tearDown(self):
+        get_summary_changes_buffer().flush()
+        super().tearDown()
+
+    def upload_and_delete(self, user, thread_number, errors):
+        try:
+            for file_number in range(self.FILES_PER_THREAD):
+                content = f"{thread_number}-{file_number}-{uuid.uuid4().hex}".encode() * (file_number + 1)
+                file_obj = upload_test_file(user, f"{thread_number}_{file_number}.bin", content)
+                # каждый второй файл удаляется сразу, параллельно с загрузками других потоков
+                if file_number % 2:
+                    response = self.client_class().post("/api/files/bulk/", {
+                        "user_id": user.id, "is_user_files_for_admin": False, "file_ids": [file_obj.id],
+                        "operation": "delete"
+                    }, content_type="application/json")
+                    if response.status_code != 200:
+                        errors.append(response.status_code)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            connection.close()
+
+    def test_storage_size_matches_files(self):
+        user = create_test_user("concurrent")
+        errors = []
+        threads = [
+            threading.Thread(target=self.upload_and_delete, args=(user, thread_number, errors))
+            for thread_number in range(self.THREADS_COUNT)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        user.refresh_from_db()
+        self.assertEqual(File.objects.filter(user=user).count(), self.THREADS_COUNT * 3)
+        files_size = File.objects.filter(user=user).aggregate(files_size=Sum("file_size"))["files_size"]
+        self.assertEqual(user.files_storage_size, files_size)
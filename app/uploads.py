@@ -0,0 +1,176 @@
+import fcntl
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.core.files import File as DjangoFile
+from django.db import transaction
+from django.db.models import F
+
+from app.models import UploadSession
+
+
+UPLOAD_SESSIONS_DIR_NAME = "upload_sessions"
+
+
+# класс-обёртка над файлом из промежуточного каталога: благодаря методу temporary_file_path
+# хранилище Django перемещает файл на место, а не копирует его содержимое
+class StagedUploadFile(DjangoFile):
+    def __init__(self, staging_path, name):
+        super().__init__(open(staging_path, "rb"), name=name)
+        self.staging_path = staging_path
+
+    def temporary_file_path(self):
+        return self.staging_path
+
+
+# функция возвращает путь к промежуточному файлу сессии загрузки
+def get_staging_path(upload_id):
+    return os.path.join(settings.MEDIA_ROOT, UPLOAD_SESSIONS_DIR_NAME, f"{upload_id}.part")
+
+
+# функция возвращает время, до которого сессия загрузки считается активной
+def get_upload_session_expiry():
+    return datetime.now(timezone.utc) + timedelta(seconds=settings.UPLOAD_SESSION_TTL)
+
+
+# функция проверяет, истёк ли срок действия сессии загрузки
+def is_upload_session_expired(upload_session):
+    return upload_session.expires_at < datetime.now(timezone.utc)
+
+
+# функция проверяет заявленный размер файла: целое число байт не меньше 0 или ValueError
+def get_upload_file_size(file_size):
+    error_message = "file_size должен быть целым неотрицательным числом байт"
+    if isinstance(file_size, bool) or not isinstance(file_size, (int, str)):
+        raise ValueError(error_message)
+
+    try:
+        file_size = int(file_size)
+    except ValueError:
+        raise ValueError(error_message)
+    if file_size < 0:
+        raise ValueError(error_message)
+    return file_size
+
+
+# функция создаёт сессию загрузки и пустой промежуточный файл
+def create_upload_session(user_id, file_name, comment, file_size, extension):
+    upload_session = UploadSession(
+        upload_id=str(uuid.uuid4()),
+        user_id=user_id,
+        file_name=file_name,
+        comment=comment,
+        extension=extension,
+        file_size=get_upload_file_size(file_size),
+        expires_at=get_upload_session_expiry()
+    )
+
+    staging_path = get_staging_path(upload_session.upload_id)
+    os.makedirs(os.path.dirname(staging_path), exist_ok=True)
+    open(staging_path, "wb").close()
+
+    upload_session.save()
+    return upload_session
+
+
+# функция дописывает часть chunk_number из потока запроса в конец промежуточного файла блоками фиксированного
+# размера; хвост от прерванной записи предыдущей части отбрасывается, поэтому повторная отправка части безопасна.
+# Запись выполняется вне транзакции базы данных, чтобы медленный клиент не держал транзакцию и блокировку строки:
+# одновременные запросы одной сессии упорядочиваются блокировкой промежуточного файла (flock), а размер полученных
+# данных увеличивается условным UPDATE по ожидаемому received_size. Возвращает False, если часть уже была получена
+def append_chunk(upload_session, chunk_number, stream, content_length):
+    max_chunk_size = settings.UPLOAD_CHUNK_MAX_SIZE
+    if content_length > max_chunk_size:
+        raise ValueError(f"Размер части не должен превышать {max_chunk_size} байт")
+
+    staging_path = get_staging_path(upload_session.upload_id)
+    block_size = settings.FILE_STREAM_CHUNK_SIZE
+    written = 0
+
+    with open(staging_path, "r+b") as staging_file:
+        fcntl.flock(staging_file, fcntl.LOCK_EX)
+        # пока запрос ждал блокировку, эту часть мог записать параллельный запрос
+        upload_session.refresh_from_db(fields=["received_size", "received_chunks", "expires_at"])
+        if chunk_number < upload_session.received_chunks:
+            return False
+        if upload_session.received_size + content_length > upload_session.file_size:
+            raise ValueError("Размер загружаемых данных превышает заявленный размер файла")
+
+        staging_file.truncate(upload_session.received_size)
+        staging_file.seek(upload_session.received_size)
+
+        while written < content_length:
+            block = stream.read(min(block_size, content_length - written))
+            if not block:
+                break
+            staging_file.write(block)
+            written += len(block)
+
+        if written != content_length:
+            raise ValueError("Часть файла получена не полностью")
+        staging_file.flush()
+
+        expires_at = get_upload_session_expiry()
+        updated_count = UploadSession.objects.filter(
+            id=upload_session.id,
+            received_size=upload_session.received_size,
+            received_chunks=upload_session.received_chunks
+        ).update(
+            received_size=F("received_size") + written,
+            received_chunks=F("received_chunks") + 1,
+            expires_at=expires_at
+        )
+    if not updated_count:
+        # сессия удалена во время записи (завершена или удалена как просроченная)
+        raise UploadSession.DoesNotExist("Upload session is not found")
+
+    upload_session.received_size += written
+    upload_session.received_chunks += 1
+    upload_session.expires_at = expires_at
+    return True
+
+
+# функция удаляет сессию загрузки вместе с промежуточным файлом; файл удаляется после фиксации транзакции,
+# поэтому при её откате сессию можно завершить повторно
+def delete_upload_session(upload_session):
+    staging_path = get_staging_path(upload_session.upload_id)
+    upload_session.delete()
+    transaction.on_commit(lambda: remove_staging_file(staging_path))
+
+
+# функция удаляет промежуточный файл, если он ещё существует
+def remove_staging_file(staging_path):
+    if os.path.exists(staging_path):
+        os.remove(staging_path)
+
+
+# функция удаляет сессии загрузки с истёкшим сроком действия и возвращает их количество. Каждая сессия
+# блокируется и проверяется заново, поэтому сессия, которую в это время завершает другой запрос, не удаляется
+def clear_expired_upload_sessions():
+    expired_ids = list(
+        UploadSession.objects.filter(expires_at__lt=datetime.now(timezone.utc)).values_list("id", flat=True)
+    )
+    deleted_count = 0
+    for upload_session_id in expired_ids:
+        with transaction.atomic():
+            upload_session = UploadSession.objects.select_for_update().filter(
+                id=upload_session_id, expires_at__lt=datetime.now(timezone.utc)
+            ).first()
+            if upload_session is not None:
+                delete_upload_session(upload_session)
+                deleted_count += 1
+    return deleted_count
+
+
+# функция возвращает данные о состоянии сессии загрузки для ответа клиенту
+def get_upload_session_data(upload_session):
+    return {
+        "upload_id": upload_session.upload_id,
+        "file_name": upload_session.file_name,
+        "file_size": upload_session.file_size,
+        "received_size": upload_session.received_size,
+        "received_chunks": upload_session.received_chunks,
+        "expires_at": upload_session.expires_at.isoformat()
+    }
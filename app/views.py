@@ -1,21 +1,51 @@
 import os
+import hmac
 import json
 import uuid
 import re
+from contextlib import ExitStack
 from datetime import datetime, timezone
 
 import rest_framework.exceptions
-from django.contrib.auth.hashers import make_password, check_password
+from django.contrib.auth.hashers import make_password
 from django.core.exceptions import ObjectDoesNotExist, ValidationError
-from django.http import HttpResponse, Http404
+from django.http import HttpResponse, Http404, StreamingHttpResponse, FileResponse, JsonResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import require_http_methods
 from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Count, F, Prefetch, Sum
+from django.db.models.functions import Coalesce
 from rest_framework import status
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 
-from app.models import User, File, Session
-from app.serializers import UserSerializer, FileSerializer
+from app.models import User, File, Session, UploadSession
+from app.serializers import UserSerializer, FileSerializer, UserFileStatsSerializer
+from app.download_stats import record_download
+from app.blobs import store_blob, batched_blob_release
+from app.compression import get_content_codec, compress_to_staging_file
+from app.storage_layout import make_file_path_in_user_dir
+from app.metrics import collect_metrics, render_prometheus
+from app.db_router import read_from_replica
+from app.search import search_files, SEARCH_MODES, SEARCH_MAX_QUERY_LENGTH
+from app.storage_analytics import (batched_summary_updates, get_storage_analytics, ANALYTICS_DEFAULT_LIMIT,
+                                   ANALYTICS_MAX_LIMIT, ANALYTICS_DEFAULT_DAYS, ANALYTICS_MAX_DAYS)
+from app.share_links import (ShareLinkExpired, get_share_link_expiry, get_share_link_lookup, make_share_token,
+                             parse_share_link, get_share_link_cache_max_age)
+from app.conditional import (bump_files_version, make_listing_etag, get_content_etag, get_last_modified,
+                             request_not_modified, not_modified_response, set_validators)
+from app.password_hashing import check_password_bounded, PasswordHashingBusy
+from app.pagination import (is_paginated_request, get_keyset_page, FILE_LIST_FIELDS, FILE_LIST_ORDERING,
+                            USER_LIST_FIELDS, USER_LIST_ORDERING, USER_STATS_LIST_FIELDS)
+from app.session_cache import get_session_cache, invalidate_user_sessions
+from app.previews import get_or_create_preview, PreviewUnavailable
+from app.streaming import file_delivery_response
+from app.zip_streaming import iter_zip_archive
+from app.uploads import (StagedUploadFile, create_upload_session, append_chunk, delete_upload_session,
+                         clear_expired_upload_sessions, get_staging_path, get_upload_session_data,
+                         get_upload_file_size, is_upload_session_expired)
 
 
 # функция проверяет корректность данных пользователя или выбрасывает ошибку
@@ -30,7 +60,7 @@ def user_data_is_valid(pattern, value, error_message):
 def get_user_data(user_login, user_password):
     try:
         search_user = User.objects.get(login=user_login)
-        is_password_valid = check_password(user_password, search_user.password)
+        is_password_valid = check_password_bounded(user_password, search_user.password)
         if is_password_valid:
             user_data = UserSerializer(search_user).data
             return user_data
@@ -54,13 +84,21 @@ def get_user_session(request):
     return None
 
 
-# функция возвращает данные о пользователе с открытой сессией или возвращает None
+# функция возвращает данные о пользователе с открытой сессией или возвращает None;
+# результат кэшируется по идентификатору сессии, поэтому повторные запросы не обращаются к базе данных
 def get_user_data_with_exist_session(request):
+    session_id = request.COOKIES.get("user_session_id", None)
+    if session_id is not None:
+        cached_user_data = get_session_cache().get(session_id)
+        if cached_user_data is not None:
+            return cached_user_data
+
     user_session = get_user_session(request)
     if user_session is not None:
         user = User.objects.filter(login=user_session.login)
         user_data = UserSerializer(user, many=True).data
         if user_data:
+            get_session_cache().set(session_id, user_data[0]["id"], user_data[0])
             return user_data[0]
 
     return None
@@ -96,6 +134,7 @@ def delete_session_id(response, user_login):
     try:
         search_session = Session.objects.get(login=user_login)
         search_session.delete()
+        get_session_cache().invalidate_session(search_session.session_id)
         cookie_key = "user_session_id"
         response.delete_cookie(cookie_key)
         return response
@@ -109,7 +148,7 @@ def get_file_name_or_name_with_postfix(user_id, filename):
     files_with_this_name = File.objects.filter(user_id=user_id, file_name=filename)
     final_file_name = filename
 
-    if files_with_this_name:
+    if files_with_this_name.exists():
         now = datetime.now(timezone.utc)
         formatted_date = now.strftime("%Y-%m-%d_%H_%M_%S")
 
@@ -136,6 +175,7 @@ def change_file_field_value(instance, changing_field, new_value):
         setattr(instance, changing_field, final_field_value)
         serializer = FileSerializer(instance)
         instance.save()
+        bump_files_version([instance.user_id])
 
         content = {
             "status_code": 200,
@@ -158,11 +198,107 @@ def change_file_field_value(instance, changing_field, new_value):
     return Response(content)
 
 
+# функция атомарно изменяет размер хранилища пользователя на стороне базы данных,
+# поэтому одновременные загрузки и удаления одного пользователя не теряют обновления
+def change_files_storage_size(user_id, size_delta):
+    updated_count = User.objects.filter(id=user_id).update(
+        files_storage_size=F('files_storage_size') + size_delta
+    )
+    if not updated_count:
+        raise User.DoesNotExist("User is not found")
+
+
+# функция создаёт объект File с уникальным для пользователя именем и увеличивает размер хранилища владельца
+def create_file_object(user_id, file_name, comment, file_content, file_size, extension):
+    final_file_name = get_file_name_or_name_with_postfix(user_id, file_name)
+
+    now = datetime.now(timezone.utc)
+    # уникальное имя во вложенных каталогах: загрузки в одну секунду не конфликтуют,
+    # а каталоги не разрастаются до сотен тысяч файлов
+    file_path_in_user_dir = make_file_path_in_user_dir(extension)
+
+    # сжимаемые файлы хранятся на диске в gzip, а размер для квоты и списков остаётся исходным
+    original_size = file_content.size
+    codec = get_content_codec(file_name, getattr(file_content, "content_type", None), original_size)
+
+    with transaction.atomic(), ExitStack() as staged_files:
+        blob = None
+        if settings.FILE_BLOB_STORAGE:
+            # одинаковое содержимое хранится на диске в одном экземпляре, File ссылается на блоб
+            blob = store_blob(file_content, codec)
+            file_content = blob.storage_path
+            codec = blob.codec
+        elif codec:
+            file_content = staged_files.enter_context(compress_to_staging_file(file_content, file_path_in_user_dir))
+
+        file = File(
+            file_name=final_file_name,
+            comment=comment,
+            file_content=file_content,
+            blob=blob,
+            codec=codec,
+            original_size=original_size,
+            file_link="",
+            file_size=file_size,
+            date=now,
+            file_path_in_user_dir=file_path_in_user_dir,
+            user_id=user_id
+        )
+        file.save()
+        change_files_storage_size(user_id, int(file_size))
+        bump_files_version([user_id])
+
+    invalidate_user_sessions(user_id)
+    return file
+
+
+# функция возвращает queryset пользователей с идентификаторами файлов, загруженными одним дополнительным запросом
+def get_users_with_file_ids():
+    return User.objects.prefetch_related(Prefetch('files', queryset=File.objects.only('id', 'user_id')))
+
+
+# функция возвращает пользователей с количеством и суммарным размером файлов, посчитанными одним запросом
+def get_users_with_file_stats():
+    return User.objects.annotate(
+        files_count=Count('files'),
+        files_total_size=Coalesce(Sum('files__file_size'), 0)
+    ).order_by('id')
+
+
+# функция проверяет, запрошен ли список пользователей со статистикой по файлам вместо списков их id
+def is_file_stats_request(value):
+    return str(value).lower() in ('1', 'true')
+
+
+FILE_IDS_ERROR = "file_ids должен быть непустым списком идентификаторов файлов"
+
+
+# функция проверяет список идентификаторов файлов из запроса: непустой список целых чисел (bool, строки
+# и дробные числа не принимаются) или ValueError
+def get_file_ids(value):
+    if (not isinstance(value, list) or not value
+            or not all(isinstance(file_id, int) and not isinstance(file_id, bool) for file_id in value)):
+        raise ValueError(FILE_IDS_ERROR)
+    return value
+
+
+# функция проверяет, может ли пользователь работать с файлом: владелец файла или администратор
+def user_can_access_file(file_obj, user_id, is_user_files_for_admin):
+    return bool(is_user_files_for_admin) or str(file_obj.user_id) == str(user_id)
+
+
 # ModelViewSet объектов User
 class UsersViewSet(ModelViewSet):
-    queryset = User.objects.all()
+    queryset = get_users_with_file_ids()
     serializer_class = UserSerializer
 
+    def list(self, request, *args, **kwargs):
+        if is_file_stats_request(request.query_params.get('file_stats')):
+            users_data = get_users_with_file_stats().values(*UserFileStatsSerializer.fields_names)
+            return Response(UserFileStatsSerializer(users_data, many=True).data)
+
+        return super().list(request, *args, **kwargs)
+
     def create(self, request, *args, **kwargs):
         try:
             name, login, password, email = (
@@ -224,6 +360,7 @@ class UsersViewSet(ModelViewSet):
             if request_from_admin:
                 instance.admin = request.data.get('new_admin_rights')
                 instance.save()
+                invalidate_user_sessions(instance.id)
                 serializer = self.get_serializer(instance)
                 content = {
                     "status_code": 200,
@@ -245,7 +382,10 @@ class UsersViewSet(ModelViewSet):
     def destroy(self, request, *args, **kwargs):
         try:
             instance = self.get_object()
-            self.perform_destroy(instance)
+            user_id = instance.id
+            with transaction.atomic(), batched_blob_release(), batched_summary_updates():
+                self.perform_destroy(instance)
+            invalidate_user_sessions(user_id)
         except Http404:
             return Response({"detail": "User is not found"}, status=status.HTTP_404_NOT_FOUND)
 
@@ -268,29 +408,7 @@ class FilesViewSet(ModelViewSet):
                 request.data["extension"]
             )
 
-            final_file_name = get_file_name_or_name_with_postfix(user_id, file_name)
-
-            now = datetime.now(timezone.utc)
-            formatted_date = now.strftime("%Y-%m-%d_%H_%M_%S")
-            file_path_in_user_dir = f'{formatted_date}{extension}'
-
-            file = File(
-                file_name=final_file_name,
-                comment=comment,
-                file_content=file_content,
-                file_link="",
-                file_size=file_size,
-                date=now,
-                file_path_in_user_dir=file_path_in_user_dir,
-                user_id=user_id
-            )
-            file.save()
-
-            file_owner = User.objects.get(id=user_id)
-            storage_size_of_owner = file_owner.files_storage_size
-            final_storage_size = storage_size_of_owner + int(file_size)
-            file_owner.files_storage_size = final_storage_size
-            file_owner.save()
+            file = create_file_object(user_id, file_name, comment, file_content, file_size, extension)
 
             file_data = FileSerializer(file).data
             content = {
@@ -318,13 +436,18 @@ class FilesViewSet(ModelViewSet):
         try:
             instance = self.get_object()
 
-            file_owner = User.objects.get(id=instance.user_id)
-            storage_size_of_owner = file_owner.files_storage_size
-            final_storage_size = storage_size_of_owner - int(instance.file_size)
-            file_owner.files_storage_size = final_storage_size
-            file_owner.save()
+            with transaction.atomic():
+                # строка блокируется до конца транзакции: одновременное удаление того же файла дождётся
+                # её завершения и получит 404, а не уменьшит размер хранилища повторно
+                instance = File.objects.select_for_update().filter(pk=instance.pk).first()
+                if instance is None:
+                    raise Http404("File is not found")
 
-            self.perform_destroy(instance)
+                change_files_storage_size(instance.user_id, -int(instance.file_size))
+                self.perform_destroy(instance)
+                bump_files_version([instance.user_id])
+
+            invalidate_user_sessions(instance.user_id)
 
         except Http404:
             return Response({"detail": "File is not found"}, status=status.HTTP_404_NOT_FOUND)
@@ -332,21 +455,137 @@ class FilesViewSet(ModelViewSet):
         return Response({"status": "deleted"}, status=204)
 
 
+# Групповые операции над файлами (удаление, изменение комментария, получение и отзыв ссылок) в одной транзакции:
+# несколько запросов к наборам строк вместо запроса на каждый файл, размер хранилища меняется один раз на владельца
+BULK_FILE_OPERATIONS = ("delete", "comment", "link", "revoke_links")
+
+
+@api_view(["POST"])
+def bulk_files_operation(request):
+    try:
+        file_ids, operation, user_id, is_user_files_for_admin = (
+            request.data["file_ids"],
+            request.data["operation"],
+            request.data["user_id"],
+            request.data["is_user_files_for_admin"]
+        )
+        new_value = request.data.get("value")
+
+        if operation not in BULK_FILE_OPERATIONS:
+            return Response({
+                "status_code": 400,
+                "status": "ERROR",
+                "error_message": f"Неизвестная операция: {operation}"
+            }, status=400)
+
+        if operation == "comment" and not new_value:
+            return Response({
+                "status_code": 400,
+                "status": "ERROR",
+                "error_message": "Comment is required"
+            }, status=400)
+
+        # срок действия ссылок проверяется до блокировки строк файлов
+        expires_at = get_share_link_expiry(request.data.get("expires_in")) if operation == "link" else None
+
+        file_ids = get_file_ids(file_ids)
+        results = {file_id: {"file_id": file_id, "status": "not_found"} for file_id in file_ids}
+        changed_owner_ids = set()
+
+        with transaction.atomic():
+            files = list(File.objects.select_for_update().filter(id__in=file_ids).only(
+                "id", "user_id", "file_size", "blob_id", "link_generation"
+            ))
+
+            allowed_files = []
+            for file in files:
+                if user_can_access_file(file, user_id, is_user_files_for_admin):
+                    allowed_files.append(file)
+                else:
+                    results[file.id]["status"] = "forbidden"
+
+            allowed_ids = [file.id for file in allowed_files]
+
+            if operation == "delete":
+                size_by_owner = {}
+                for file in allowed_files:
+                    size_by_owner[file.user_id] = size_by_owner.get(file.user_id, 0) + int(file.file_size)
+
+                with batched_blob_release(), batched_summary_updates():
+                    File.objects.filter(id__in=allowed_ids).delete()
+                for owner_id, deleted_size in size_by_owner.items():
+                    change_files_storage_size(owner_id, -deleted_size)
+                changed_owner_ids.update(size_by_owner)
+
+                for file in allowed_files:
+                    results[file.id]["status"] = "deleted"
+
+            elif operation == "comment":
+                File.objects.filter(id__in=allowed_ids).update(comment=new_value)
+                for file in allowed_files:
+                    results[file.id].update({"status": "updated", "comment": new_value})
+
+            elif operation == "link":
+                for file in allowed_files:
+                    file.file_link = make_share_token(file.id, file.link_generation, expires_at)
+                File.objects.bulk_update(allowed_files, ["file_link"])
+                for file in allowed_files:
+                    results[file.id].update({"status": "updated", "file_link": file.file_link})
+
+            else:
+                # после увеличения поколения все выданные ранее ссылки на файлы перестают действовать
+                File.objects.filter(id__in=allowed_ids).update(
+                    link_generation=F("link_generation") + 1,
+                    file_link=""
+                )
+                for file in allowed_files:
+                    results[file.id].update({"status": "updated", "file_link": ""})
+
+            bump_files_version({file.user_id for file in allowed_files})
+
+        for owner_id in changed_owner_ids:
+            invalidate_user_sessions(owner_id)
+
+        return Response({
+            "status_code": 200,
+            "status": "OK",
+            "operation": operation,
+            "results": list(results.values())
+        })
+
+    except (KeyError, TypeError, ValueError) as e:
+        return Response({
+            "status_code": 400,
+            "status": "ERROR",
+            "error_message": f"Некорректный запрос: {e}"
+        }, status=400)
+
+    except Exception as e:
+        return Response({"Error": f"{e}"}, status=500)
+
+
 # Декоратор @api_view принимает список методов HTTP, на которые должно отвечать представление.
 @api_view(['PATCH'])
 def get_link_for_file(request):
     try:
         file_id = request.data["file_id"]
-        file_id_str = str(file_id)
-        file_link = str(uuid.uuid5(uuid.NAMESPACE_URL, file_id_str))
-        file_for_update = File.objects.filter(id=file_id).update(file_link=file_link)
+        expires_at = get_share_link_expiry(request.data.get("expires_in"))
+        file_obj = File.objects.filter(id=file_id).only('id', 'user_id', 'link_generation').first()
+
+        file_for_update = 0
+        if file_obj is not None:
+            file_link = make_share_token(file_obj.id, file_obj.link_generation, expires_at)
+            # последняя выданная ссылка сохраняется, чтобы показывать её в списке файлов
+            file_for_update = File.objects.filter(id=file_id).update(file_link=file_link)
+            bump_files_version([file_obj.user_id])
 
         if file_for_update:
             content = {
                 "status_code": 200,
                 "status": "OK",
                 "file_id": file_id,
-                "file_link": file_link
+                "file_link": file_link,
+                "expires_at": expires_at or None
             }
         else:
             content = {
@@ -357,19 +596,38 @@ def get_link_for_file(request):
 
         return Response(content)
 
+    except ValueError as e:
+        return Response({
+            "status_code": 400,
+            "status": "ERROR",
+            "error_message": f"{e}"
+        }, status=status.HTTP_400_BAD_REQUEST)
+
     except Exception as e:
         return Response({"Error": f"{e}"}, status=500)
 
 
 @api_view(['GET'])
+@read_from_replica
 def retrieve_by_link(request):
     try:
         file_link = request.GET.get("link")
-        file_instance = File.objects.get(file_link=file_link)
+        file_instance = File.objects.annotate(
+            files_version=F('user__files_version'),
+            files_changed_at=F('user__files_changed_at')
+        ).get(**get_share_link_lookup(file_link))
+
+        etag = make_listing_etag('file', file_instance.id, file_instance.files_version)
+        last_modified = get_last_modified(file_instance.files_changed_at)
+        if request_not_modified(request, etag, last_modified):
+            return not_modified_response(etag, last_modified)
+
         serializer = FileSerializer(file_instance)
-        return Response(serializer.data)
+        return set_validators(Response(serializer.data), etag, last_modified)
     except ObjectDoesNotExist:
         return Response({"Error": "File is not found"}, status=status.HTTP_404_NOT_FOUND)
+    except ShareLinkExpired as e:
+        return Response({"Error": f"{e}"}, status=status.HTTP_410_GONE)
     except Exception as e:
         return Response({"Error": f"{e}"}, status=500)
 
@@ -381,7 +639,7 @@ def login_view(request):
         user_data = get_user_data(user_login, user_password)
 
         if user_data is not None:
-            if Session.objects.filter(login=user_login):
+            if Session.objects.filter(login=user_login).exists():
                 return Response({
                     "status": 401,
                     "error_message": "Пользователь уже вошел в систему"
@@ -392,6 +650,9 @@ def login_view(request):
 
         return Response({"Error_msg": "user not found"}, status=404)
 
+    except PasswordHashingBusy as e:
+        return Response({"Error": f"{e}"}, status=503, headers={"Retry-After": "1"})
+
     except Exception as e:
         return Response({"Error": f"{e}"}, status=500)
 
@@ -414,6 +675,7 @@ def logout_view(request):
 
 
 @api_view(["GET"])
+@read_from_replica
 def get_mycloud_user(request):
     try:
         exist_session_user = get_user_data_with_exist_session(request)
@@ -430,21 +692,20 @@ def get_mycloud_user(request):
         return Response({"Error": f"{e}"}, status=500)
 
 
+# Сессия проверяется по токену из cookie user_session_id, без повторной проверки пароля:
+# медленное хеширование PBKDF2 выполняется только при входе
 @api_view(["POST"])
 def check_session(request):
     try:
-        user_login, user_password = request.data["login"], request.data["password"]
-        search_session = Session.objects.filter(login=user_login)
+        user_login = request.data.get("login")
+        user_data = get_user_data_with_exist_session(request)
 
-        if search_session:
-            user_data = get_user_data(user_login, user_password)
-            if user_data is not None:
-                return Response({
-                    "status_code": 200,
-                    "status": True,
-                    "user": user_data
-                })
-            return Response({"Error_message": "Неверный логин или пароль"}, status=status.HTTP_400_BAD_REQUEST)
+        if user_data is not None and (not user_login or user_data["login"] == user_login):
+            return Response({
+                "status_code": 200,
+                "status": True,
+                "user": user_data
+            })
 
         return Response({"Error_message": "user not found"}, status=404)
 
@@ -453,36 +714,302 @@ def check_session(request):
 
 
 @api_view(["POST"])
+@read_from_replica
 def get_user_files(request):
     try:
         user_id = request.data["user_id"]
         user = User.objects.get(id=user_id)
         user_files = File.objects.filter(user_id=user.id)
-        user_files_data = FileSerializer(user_files, many=True).data
-        return Response(user_files_data)
+
+        # ответ зависит только от версии списка файлов пользователя и параметров постраничного вывода,
+        # поэтому актуальность копии клиента проверяется до выборки и сериализации файлов
+        page_params = {key: request.data.get(key) for key in ('cursor', 'page_size', 'fields')}
+        etag = make_listing_etag('files', user.id, user.files_version, page_params)
+        last_modified = get_last_modified(user.files_changed_at)
+        if request_not_modified(request, etag, last_modified):
+            return not_modified_response(etag, last_modified)
+
+        if is_paginated_request(request.data):
+            response = Response(get_keyset_page(user_files, request.data, FILE_LIST_ORDERING, FILE_LIST_FIELDS))
+        else:
+            response = Response(FileSerializer(user_files, many=True).data)
+
+        response['Cache-Control'] = 'private, no-cache'
+        return set_validators(response, etag, last_modified)
+
+    except ObjectDoesNotExist:
+        return Response({'error': 'User is not found'}, status=404)
+
+    except rest_framework.exceptions.ValidationError as e:
+        return Response({'error': e.detail}, status=400)
+
+    except Exception as e:
+        return Response({'error': f'{e}'}, status=500)
+
+
+# Поиск файлов по имени и комментарию (вхождение или начало строки) с постраничным выводом как в get_user_files:
+# среди файлов пользователя user_id, а для администратора без user_id - среди файлов всех пользователей
+# (администратор определяется по cookie сессии)
+@api_view(["POST"])
+@read_from_replica
+def search_user_files(request):
+    try:
+        query = str(request.data["query"]).strip()
+        mode = request.data.get("mode") or "substring"
+        user_id = request.data.get("user_id")
+        is_user_files_for_admin = request.data.get("is_user_files_for_admin")
+
+        if not query or len(query) > SEARCH_MAX_QUERY_LENGTH:
+            raise rest_framework.exceptions.ValidationError(
+                f"Длина поискового запроса должна быть от 1 до {SEARCH_MAX_QUERY_LENGTH} символов"
+            )
+        if mode not in SEARCH_MODES:
+            raise rest_framework.exceptions.ValidationError(f"Неизвестный режим поиска: {mode}")
+
+        files = File.objects.all()
+        if user_id is not None:
+            files = files.filter(user_id=User.objects.get(id=user_id).id)
+        elif not is_user_files_for_admin:
+            raise rest_framework.exceptions.ValidationError("Не указан пользователь")
+        else:
+            # результаты поиска по файлам всех пользователей содержат их ссылки file_link, поэтому права
+            # администратора проверяются по cookie сессии, а не по флагу из тела запроса
+            user_data = get_user_data_with_exist_session(request)
+            if user_data is None:
+                return Response({"Error_message": "Ошибка авторизации"}, status=401)
+            if not user_data["admin"]:
+                return Response({"Error_message": "Права администратора не подтверждены"}, status=403)
+
+        # поиск выполняется на той базе данных, с которой читает queryset (основная или реплика)
+        files = search_files(files, query, mode, connections[files.db])
+        response = Response(get_keyset_page(files, request.data, FILE_LIST_ORDERING, FILE_LIST_FIELDS))
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    except KeyError as e:
+        return Response({'error': f'Некорректный запрос: {e}'}, status=400)
 
     except ObjectDoesNotExist:
         return Response({'error': 'User is not found'}, status=404)
 
+    except rest_framework.exceptions.ValidationError as e:
+        return Response({'error': e.detail}, status=400)
+
     except Exception as e:
         return Response({'error': f'{e}'}, status=500)
 
 
 @api_view(["POST"])
+@read_from_replica
 def get_users(request):
     try:
         request_from_admin = request.data["request_from_admin"]
         if request_from_admin:
-            users_queryset = User.objects.all()
+            if is_file_stats_request(request.data.get("file_stats")):
+                users_queryset = get_users_with_file_stats()
+
+                if is_paginated_request(request.data):
+                    return Response(get_keyset_page(
+                        users_queryset, request.data, USER_LIST_ORDERING, USER_STATS_LIST_FIELDS
+                    ))
+
+                users_data = users_queryset.values(*UserFileStatsSerializer.fields_names)
+                return Response(UserFileStatsSerializer(users_data, many=True).data)
+
+            users_queryset = get_users_with_file_ids()
+
+            if is_paginated_request(request.data):
+                return Response(get_keyset_page(users_queryset, request.data, USER_LIST_ORDERING, USER_LIST_FIELDS))
+
             users_data = UserSerializer(users_queryset, many=True).data
             return Response(users_data)
 
         return Response({"Error_message": "Права администратора не подтверждены"}, status=401)
 
+    except rest_framework.exceptions.ValidationError as e:
+        return Response({'error': e.detail}, status=400)
+
     except Exception as e:
         return Response({'error': f'{e}'}, status=500)
 
 
+# Аналитика хранилища для администратора: итоги, пользователи с наибольшим объёмом файлов, крупнейшие файлы,
+# распределение по расширениям и объём загрузок по дням. Данные читаются из сводной таблицы StorageSummary,
+# а администратор определяется по cookie сессии
+@api_view(["GET"])
+def get_storage_analytics_view(request):
+    try:
+        user_data = get_user_data_with_exist_session(request)
+        if user_data is None:
+            return Response({"Error_message": "Ошибка авторизации"}, status=401)
+        if not user_data["admin"]:
+            return Response({"Error_message": "Права администратора не подтверждены"}, status=403)
+
+        limit = min(max(int(request.GET.get("limit") or ANALYTICS_DEFAULT_LIMIT), 1), ANALYTICS_MAX_LIMIT)
+        days = min(max(int(request.GET.get("days") or ANALYTICS_DEFAULT_DAYS), 1), ANALYTICS_MAX_DAYS)
+
+        return Response(get_storage_analytics(limit, days))
+
+    except ValueError as e:
+        return Response({"error": f"Некорректный запрос: {e}"}, status=400)
+
+    except Exception as e:
+        return Response({"error": f"{e}"}, status=500)
+
+
+# Сессии возобновляемой загрузки: создание сессии, отправка пронумерованных частей,
+# запрос количества полученных байт и завершение загрузки
+@api_view(["POST"])
+def create_upload_session_view(request):
+    try:
+        user_id, file_name, comment, file_size, extension = (
+            request.data["user_id"],
+            request.data["file_name"],
+            request.data["comment"],
+            request.data["file_size"],
+            request.data["extension"]
+        )
+        file_size = get_upload_file_size(file_size)
+        User.objects.get(id=user_id)
+        clear_expired_upload_sessions()
+
+        upload_session = create_upload_session(user_id, file_name, comment, file_size, extension)
+        content = {
+            "status_code": 200,
+            "status": "OK",
+            "upload_session": get_upload_session_data(upload_session)
+        }
+        return Response(content)
+
+    except KeyError as e:
+        return Response({
+            "status_code": 400,
+            "status": "ERROR",
+            "error_message": f"Некорректный запрос: {e}"
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    except ValueError as e:
+        return Response({
+            "status_code": 400,
+            "status": "ERROR",
+            "error_message": f"{e}"
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    except ObjectDoesNotExist:
+        return Response({'error': 'User is not found'}, status=404)
+
+    except Exception as e:
+        return Response({"Error": f"{e}"}, status=500)
+
+
+# ответ на запрос к сессии загрузки, срок действия которой истёк
+def expired_upload_session_response():
+    return Response({
+        "status_code": 410,
+        "status": "ERROR",
+        "error_message": "Срок действия сессии загрузки истёк"
+    }, status=status.HTTP_410_GONE)
+
+
+@api_view(["GET"])
+def get_upload_session_view(request, upload_id):
+    try:
+        upload_session = UploadSession.objects.get(upload_id=upload_id)
+        return Response({
+            "status_code": 200,
+            "status": "OK",
+            "upload_session": get_upload_session_data(upload_session)
+        })
+
+    except ObjectDoesNotExist:
+        return Response({"Error": "Upload session is not found"}, status=status.HTTP_404_NOT_FOUND)
+
+
+@api_view(["PUT"])
+def upload_chunk(request, upload_id, chunk_number):
+    try:
+        # часть записывается без транзакции и блокировки строки сессии: порядок записи обеспечивает append_chunk
+        upload_session = UploadSession.objects.get(upload_id=upload_id)
+        if is_upload_session_expired(upload_session):
+            return expired_upload_session_response()
+
+        if chunk_number > upload_session.received_chunks:
+            return Response({
+                "status_code": 409,
+                "status": "ERROR",
+                "error_message": f"Ожидается часть с номером {upload_session.received_chunks}",
+                "upload_session": get_upload_session_data(upload_session)
+            }, status=status.HTTP_409_CONFLICT)
+
+        # часть, полученная ранее, не записывается повторно: ответ содержит текущее состояние сессии
+        if chunk_number == upload_session.received_chunks:
+            content_length = int(request.META.get("CONTENT_LENGTH") or 0)
+            append_chunk(upload_session, chunk_number, request.stream, content_length)
+
+        return Response({
+            "status_code": 200,
+            "status": "OK",
+            "upload_session": get_upload_session_data(upload_session)
+        })
+
+    except ObjectDoesNotExist:
+        return Response({"Error": "Upload session is not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    except ValueError as e:
+        return Response({
+            "status_code": 400,
+            "status": "ERROR",
+            "error_message": f"{e}"
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    except Exception as e:
+        return Response({"Error": f"{e}"}, status=500)
+
+
+@api_view(["POST"])
+def finalize_upload_session(request, upload_id):
+    try:
+        # строка сессии блокируется до конца транзакции: повторный или одновременный запрос завершения
+        # и удаление просроченных сессий ждут её и затем не находят сессию, поэтому файл создаётся один раз
+        with transaction.atomic():
+            upload_session = UploadSession.objects.select_for_update().get(upload_id=upload_id)
+            if is_upload_session_expired(upload_session):
+                return expired_upload_session_response()
+            if upload_session.received_size != upload_session.file_size:
+                return Response({
+                    "status_code": 400,
+                    "status": "ERROR",
+                    "error_message": "Файл загружен не полностью",
+                    "upload_session": get_upload_session_data(upload_session)
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            staged_file = StagedUploadFile(get_staging_path(upload_session.upload_id), upload_session.file_name)
+            with staged_file:
+                file = create_file_object(
+                    upload_session.user_id,
+                    upload_session.file_name,
+                    upload_session.comment,
+                    staged_file,
+                    upload_session.file_size,
+                    upload_session.extension
+                )
+            delete_upload_session(upload_session)
+
+        file_data = FileSerializer(file).data
+        content = {
+            "status_code": 200,
+            "status": "OK",
+            "create_object": file_data
+        }
+        return Response(content)
+
+    except ObjectDoesNotExist:
+        return Response({"Error": "Upload session is not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    except Exception as e:
+        return Response({"Error": f"{e}"}, status=500)
+
+
 @api_view(['PATCH'])
 def download_file(request):
     try:
@@ -492,25 +1019,149 @@ def download_file(request):
             request.data["is_user_files_for_admin"]
         )
 
-        file_obj = File.objects.get(id=file_id)
-        if is_user_files_for_admin or file_obj.user_id == user_id:
-            file_path_in_user_dir = str(FileSerializer(file_obj).data["file_path_in_user_dir"])
-            dir_name_in_media = f'user_{user_id}'
-            file_path = os.path.join(settings.MEDIA_ROOT, dir_name_in_media, file_path_in_user_dir)
+        file_obj = File.objects.select_related('blob').get(id=file_id)
+        if user_can_access_file(file_obj, user_id, is_user_files_for_admin):
+            # путь берётся из file_content: файл может лежать как в каталоге пользователя, так и в хранилище блобов
+            file_path = file_obj.file_content.path
             print(file_path)
             if not os.path.exists(file_path):
                 raise Http404("File does not exist")
 
-            current_datetime = datetime.now(timezone.utc)
-            file_obj.last_upload_date = current_datetime
-            file_obj.save()
-
-            with open(file_path, 'rb') as f:
-                response = HttpResponse(f.read(), content_type='application/octet-stream')
-                response['Content-Disposition'] = f'attachment; filename="{file_obj.file_name}"'
-                return response
+            response = file_delivery_response(
+                request, file_path, file_obj.file_name, codec=file_obj.codec, original_size=file_obj.original_size,
+                etag=get_content_etag(file_obj)
+            )
+            # проверка актуальности копии клиента (304) не считается скачиванием
+            if response.status_code != 304:
+                record_download(file_obj.id)
+            return response
 
         return Response({"Error_message": "Недостаточно прав"}, status=401)
 
     except ObjectDoesNotExist:
         raise Http404("File is not found")
+
+
+# Скачивание файла по ссылке без авторизации: GET с поддержкой Range, ETag и Cache-Control, поэтому ответ
+# может кэшироваться прокси-сервером или CDN. Используется обычное представление Django, а не DRF, чтобы в ответ
+# не добавлялся Vary: Accept, Cookie. Ответ всё же содержит Vary: origin (его добавляет CorsMiddleware)
+# и, для сжатых файлов, Vary: Accept-Encoding, поэтому общий кэш должен учитывать эти заголовки в ключе кэша
+@require_http_methods(["GET"])
+def download_by_link(request):
+    try:
+        lookup, expires_at = parse_share_link(request.GET.get("link"))
+        file_obj = File.objects.select_related('blob').get(**lookup)
+
+        file_path = file_obj.file_content.path
+        if not os.path.exists(file_path):
+            raise Http404("File does not exist")
+
+        response = file_delivery_response(
+            request, file_path, file_obj.file_name, codec=file_obj.codec, original_size=file_obj.original_size,
+            etag=get_content_etag(file_obj)
+        )
+        if response.status_code != 304:
+            record_download(file_obj.id)
+
+        patch_cache_control(response, public=True, max_age=get_share_link_cache_max_age(expires_at))
+        return response
+
+    except ObjectDoesNotExist:
+        return JsonResponse({"Error": "File is not found"}, status=404)
+    except ShareLinkExpired as e:
+        return JsonResponse({"Error": f"{e}"}, status=410)
+
+
+# Скачивание нескольких файлов одним ZIP-архивом, который формируется на лету во время отправки
+@api_view(['PATCH'])
+def download_zip(request):
+    try:
+        user_id, file_ids, is_user_files_for_admin = (
+            request.data["user_id"],
+            request.data["file_ids"],
+            request.data["is_user_files_for_admin"]
+        )
+
+        try:
+            file_ids = get_file_ids(file_ids)
+        except ValueError as e:
+            return Response({
+                "status_code": 400,
+                "status": "ERROR",
+                "error_message": f"{e}"
+            }, status=400)
+
+        files = list(File.objects.filter(id__in=file_ids).order_by('id'))
+        if not files or len(files) != len(set(file_ids)):
+            raise Http404("File is not found")
+
+        for file_obj in files:
+            if not user_can_access_file(file_obj, user_id, is_user_files_for_admin):
+                return Response({"Error_message": "Недостаточно прав"}, status=401)
+            if not os.path.exists(file_obj.file_content.path):
+                raise Http404("File does not exist")
+
+        for file_obj in files:
+            record_download(file_obj.id)
+
+        archive_files = [
+            (file_obj.file_name, file_obj.file_content.path, file_obj.codec, file_obj.original_size)
+            for file_obj in files
+        ]
+        response = StreamingHttpResponse(iter_zip_archive(archive_files), content_type='application/zip')
+        response['Content-Disposition'] = 'attachment; filename="files.zip"'
+        return response
+
+    except KeyError as e:
+        return Response({"Error": f"{e}"}, status=400)
+
+
+# Превью изображений (и первой страницы PDF): генерируется при первом запросе и хранится в кэше на диске;
+# пользователь определяется по cookie сессии, чтобы превью можно было подставить прямо в <img>
+@api_view(["GET"])
+def get_file_preview(request):
+    try:
+        user_data = get_user_data_with_exist_session(request)
+        if user_data is None:
+            return Response({"Error_message": "Ошибка авторизации"}, status=401)
+
+        file_id = request.GET.get("file_id")
+        requested_size = int(request.GET.get("size") or settings.PREVIEW_SIZES[0])
+        # размер округляется вверх до одного из разрешённых, чтобы в кэше не копились превью произвольных размеров
+        max_dimension = min(
+            [size for size in settings.PREVIEW_SIZES if size >= requested_size] or [max(settings.PREVIEW_SIZES)]
+        )
+
+        file_obj = File.objects.select_related('blob').get(id=file_id)
+        if not user_can_access_file(file_obj, user_data["id"], user_data["admin"]):
+            return Response({"Error_message": "Недостаточно прав"}, status=401)
+        if not os.path.exists(file_obj.file_content.path):
+            return Response({"Error": "File does not exist"}, status=404)
+
+        response = FileResponse(get_or_create_preview(file_obj, max_dimension), content_type='image/jpeg')
+        response['Cache-Control'] = f'private, max-age={settings.PREVIEW_CACHE_MAX_AGE}'
+        return response
+
+    except (ObjectDoesNotExist, ValueError):
+        return Response({"Error": "File is not found"}, status=404)
+
+    except PreviewUnavailable as e:
+        return Response({"Error": f"{e}"}, status=415)
+
+    except Exception as e:
+        return Response({"Error": f"{e}"}, status=500)
+
+
+# Метрики запросов всех рабочих процессов в формате Prometheus: сборщик метрик должен передать METRICS_TOKEN
+# в заголовке Authorization: Bearer <токен>; если токен не задан, эндпоинт закрыт
+@require_http_methods(["GET"])
+def metrics_view(request):
+    if not settings.METRICS_TOKEN:
+        return JsonResponse({"Error_message": "Доступ к метрикам не настроен: задайте METRICS_TOKEN"}, status=403)
+    if not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {settings.METRICS_TOKEN}"):
+        return JsonResponse({"Error_message": "Ошибка авторизации"}, status=401)
+
+    return HttpResponse(
+        render_prometheus(collect_metrics()),
+        content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -0,0 +1,90 @@
+import os
+import time
+import zipfile
+
+from django.conf import settings
+
+from app.compression import open_stored_file
+
+
+# расширения файлов, которые уже сжаты: повторное сжатие не уменьшает их размер и только тратит процессор,
+# поэтому такие файлы кладутся в архив без сжатия (ZIP_STORED)
+COMPRESSED_EXTENSIONS = {
+    '.7z', '.aac', '.avi', '.bz2', '.docx', '.flac', '.gif', '.gz', '.heic', '.jpeg', '.jpg', '.m4a', '.mkv',
+    '.mov', '.mp3', '.mp4', '.odp', '.ods', '.odt', '.ogg', '.pdf', '.png', '.pptx', '.rar', '.tgz', '.webm',
+    '.webp', '.xlsx', '.xz', '.zip', '.zst'
+}
+
+
+# класс-приёмник для zipfile: собирает записанные байты, которые генератор архива сразу отдаёт клиенту;
+# у объекта нет seek, поэтому zipfile пишет размеры файлов в дескрипторы данных после содержимого
+class ZipOutputBuffer:
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+# функция возвращает уникальное имя файла внутри архива, добавляя номер копии к повторяющимся именам
+def get_unique_archive_name(file_name, used_names):
+    archive_name = file_name
+    copy_number = 1
+    while archive_name in used_names:
+        name, extension = os.path.splitext(file_name)
+        archive_name = f"{name} ({copy_number}){extension}"
+        copy_number += 1
+    used_names.add(archive_name)
+    return archive_name
+
+
+# генератор ZIP-архива: файлы читаются с диска блоками и сразу отдаются частями архива, поэтому
+# архив не собирается ни в памяти, ни во временном файле; для больших файлов используется ZIP64.
+# archive_files - кортежи (имя файла, путь, способ сжатия на диске, исходный размер или None)
+def iter_zip_archive(archive_files):
+    chunk_size = settings.FILE_STREAM_CHUNK_SIZE
+    output = ZipOutputBuffer()
+    used_names = set()
+
+    with zipfile.ZipFile(output, mode="w", allowZip64=True) as archive:
+        for file_name, file_path, codec, original_size in archive_files:
+            file_stat = os.stat(file_path)
+            file_size = original_size if original_size is not None else file_stat.st_size
+            extension = os.path.splitext(file_name)[1].lower()
+
+            zip_info = zipfile.ZipInfo(
+                get_unique_archive_name(file_name, used_names),
+                date_time=time.localtime(file_stat.st_mtime)[:6]
+            )
+            zip_info.file_size = file_size
+            if extension in COMPRESSED_EXTENSIONS:
+                zip_info.compress_type = zipfile.ZIP_STORED
+            else:
+                zip_info.compress_type = zipfile.ZIP_DEFLATED
+
+            with archive.open(zip_info, mode="w", force_zip64=file_size > zipfile.ZIP64_LIMIT) as entry:
+                # сжатые на диске файлы распаковываются при чтении, в архив попадает исходное содержимое
+                with open_stored_file(file_path, codec) as source_file:
+                    while True:
+                        chunk = source_file.read(chunk_size)
+                        if not chunk:
+                            break
+                        entry.write(chunk)
+                        data = output.drain()
+                        if data:
+                            yield data
+
+            data = output.drain()
+            if data:
+                yield data
+
+    yield output.drain()
@@ -0,0 +1,293 @@
+"""
+Нагрузочный тест API: заполняет локальную базу данных (SQLite или локальный PostgreSQL, см. benchmarks/settings.py)
+воспроизводимым набором пользователей, сессий и файлов и выполняет запросы конкурентными клиентами через настоящие
+URLconf и middleware проекта (django.test.Client в нескольких потоках, без сетевого сервера).
+
+Сценарии: login (login_view), get_mycloud_user, get_user_files, create_file (FilesViewSet.create),
+download_file. Для каждого сценария выводятся пропускная способность и p50/p95/p99 в JSON.
+
+Режим проверки регрессий для CI: результат сравнивается с сохранённым базовым отчётом, и скрипт завершается
+с кодом 1, если p95 вырос или пропускная способность упала больше чем на --threshold (доля).
+
+Пример:
+    python -m benchmarks.api_load --concurrency 8 --requests 400 --output baseline.json
+    python -m benchmarks.api_load --concurrency 8 --requests 400 --baseline baseline.json --threshold 0.2
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth.hashers import make_password  # noqa: E402
+from django.core.files.uploadedfile import SimpleUploadedFile  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import connection, connections  # noqa: E402
+from django.test import Client  # noqa: E402
+
+from app.models import User, Session  # noqa: E402
+from app.views import create_file_object  # noqa: E402
+
+
+SCENARIOS = ("login", "get_mycloud_user", "get_user_files", "create_file", "download_file")
+PASSWORD = "Benchmark#1"
+WARMUP_REQUEST_OFFSET = 10 ** 9
+
+
+# функция пересоздаёт базу данных бенчмарка и медиафайлы
+def reset_database():
+    connections.close_all()
+    if connection.vendor == "sqlite":
+        database_path = settings.DATABASES["default"]["NAME"]
+        if os.path.exists(database_path):
+            os.remove(database_path)
+    shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+    os.makedirs(os.path.dirname(settings.DATABASES["default"]["NAME"]) or ".", exist_ok=True)
+
+    call_command("migrate", verbosity=0)
+    if connection.vendor != "sqlite":
+        call_command("flush", interactive=False, verbosity=0)
+
+
+# функция заполняет базу данных: у каждого клиента (потока) свой пользователь для входа и свой пользователь
+# с сессией и файлами, чтобы конкурентные клиенты не мешали друг другу
+def seed(clients, files_per_user, file_size, seed_value):
+    generator = random.Random(seed_value)
+    password_hash = make_password(PASSWORD)
+
+    User.objects.bulk_create([
+        User(name=f"Login {index}", login=f"benchlogin{index}", password=password_hash, email=f"l{index}@bench.local")
+        for index in range(clients)
+    ])
+    User.objects.bulk_create([
+        User(name=f"User {index}", login=f"benchuser{index}", password=password_hash, email=f"u{index}@bench.local")
+        for index in range(clients)
+    ])
+    users = list(User.objects.filter(login__startswith="benchuser").order_by("id"))
+    Session.objects.bulk_create([
+        Session(session_id=f"bench-session-{user.id}", login=user.login, user=user) for user in users
+    ])
+
+    contexts = []
+    for index, user in enumerate(users):
+        file_ids = []
+        for file_number in range(files_per_user):
+            content = generator.randbytes(file_size)
+            file_obj = create_file_object(
+                user.id, f"file{file_number}.bin", "benchmark", SimpleUploadedFile("file.bin", content),
+                file_size, ".bin"
+            )
+            file_ids.append(file_obj.id)
+        contexts.append({"login": f"benchlogin{index}", "user": user, "file_ids": file_ids})
+    return contexts
+
+
+# функция выполняет один запрос сценария и возвращает признак успеха
+def run_request(scenario, client, context, request_number, upload_size):
+    user = context["user"]
+
+    if scenario == "login":
+        response = client.post(
+            "/api/login/", {"login": context["login"], "password": PASSWORD}, content_type="application/json"
+        )
+        return response.status_code == 200
+
+    if scenario == "get_mycloud_user":
+        response = client.get("/api/get_mycloud_user/")
+        return response.status_code == 200
+
+    if scenario == "get_user_files":
+        response = client.post("/api/get_user_files/", {"user_id": user.id}, content_type="application/json")
+        return response.status_code == 200
+
+    if scenario == "create_file":
+        # содержимое уникально для каждого запроса, чтобы дедупликация блобов не пропускала запись на диск
+        content = request_number.to_bytes(8, "big") * (upload_size // 8 + 1)
+        response = client.post("/api/files/", {
+            "file_name": f"upload{request_number}.bin",
+            "user_id": user.id,
+            "comment": "benchmark",
+            "new_file": SimpleUploadedFile("upload.bin", content[:upload_size]),
+            "file_size": upload_size,
+            "extension": ".bin",
+        })
+        return response.status_code == 200 and response.json().get("status_code") == 200
+
+    if scenario == "download_file":
+        file_id = context["file_ids"][request_number % len(context["file_ids"])]
+        response = client.patch("/api/download_file/", {
+            "user_id": user.id, "file_id": file_id, "is_user_files_for_admin": False
+        }, content_type="application/json")
+        for _ in response.streaming_content:
+            pass
+        response.close()
+        return response.status_code == 200
+
+    raise ValueError(f"Неизвестный сценарий: {scenario}")
+
+
+# функция выполняет служебные запросы после каждого запроса сценария (не входят в замер)
+def after_request(scenario, client, context):
+    if scenario == "login":
+        client.delete("/api/logout/", {"login": context["login"]}, content_type="application/json")
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+# функция выполняет сценарий: каждый из clients потоков последовательно отправляет свою долю запросов
+def run_scenario(scenario, contexts, total_requests, warmup, upload_size):
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(len(contexts))
+    requests_per_client = max(total_requests // len(contexts), 1)
+
+    def worker(worker_number):
+        nonlocal errors
+        context = contexts[worker_number]
+        client = Client()
+        client.cookies["user_session_id"] = f"bench-session-{context['user'].id}"
+        worker_latencies = []
+        worker_errors = 0
+        try:
+            # номера разогревающих запросов не пересекаются с номерами измеряемых
+            for request_number in range(warmup):
+                run_request(scenario, client, context, WARMUP_REQUEST_OFFSET + worker_number * warmup + request_number,
+                            upload_size)
+                after_request(scenario, client, context)
+
+            start_barrier.wait()
+            for request_number in range(requests_per_client):
+                started = time.perf_counter()
+                try:
+                    succeeded = run_request(
+                        scenario, client, context, worker_number * requests_per_client + request_number, upload_size
+                    )
+                except Exception:
+                    succeeded = False
+                worker_latencies.append(time.perf_counter() - started)
+                if not succeeded:
+                    worker_errors += 1
+                after_request(scenario, client, context)
+        finally:
+            connections.close_all()
+
+        with lock:
+            latencies.extend(worker_latencies)
+            errors += worker_errors
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(contexts)) as executor:
+        list(executor.map(worker, range(len(contexts))))
+    duration = time.perf_counter() - started
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(len(latencies) / duration, 2),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+# функция сравнивает результаты с базовым отчётом и возвращает список регрессий
+def find_regressions(report, baseline, threshold):
+    regressions = []
+    for scenario, result in report["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(scenario)
+        if base is None:
+            continue
+        if result["errors"] > base["errors"]:
+            regressions.append(f"{scenario}: ошибок {result['errors']} (было {base['errors']})")
+        if base["p95_ms"] and result["p95_ms"] > base["p95_ms"] * (1 + threshold):
+            regressions.append(f"{scenario}: p95 {result['p95_ms']} мс (было {base['p95_ms']} мс)")
+        if base["throughput_rps"] and result["throughput_rps"] < base["throughput_rps"] * (1 - threshold):
+            regressions.append(
+                f"{scenario}: пропускная способность {result['throughput_rps']} rps (было {base['throughput_rps']} rps)"
+            )
+    return regressions
+
+
+def main(args):
+    reset_database()
+    contexts = seed(args.concurrency, args.files_per_user, args.file_size, args.seed)
+
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "file_size": args.file_size,
+            "upload_size": args.upload_size,
+            "seed": args.seed,
+        },
+        "scenarios": {},
+    }
+    for scenario in args.scenarios:
+        report["scenarios"][scenario] = run_scenario(
+            scenario, contexts, args.requests, args.warmup, args.upload_size
+        )
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(output)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = find_regressions(report, json.load(baseline_file), args.threshold)
+        for regression in regressions:
+            print(f"Регрессия: {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=4, help="количество конкурентных клиентов")
+    parser.add_argument("--requests", type=int, default=200, help="количество запросов в каждом сценарии")
+    parser.add_argument("--warmup", type=int, default=2, help="количество разогревающих запросов на клиента")
+    parser.add_argument("--scenarios", type=lambda value: value.split(","), default=list(SCENARIOS),
+                        help=f"сценарии через запятую: {','.join(SCENARIOS)}")
+    parser.add_argument("--files-per-user", type=int, default=20, help="количество файлов у каждого пользователя")
+    parser.add_argument("--file-size", type=int, default=64 * 1024, help="размер файлов для скачивания в байтах")
+    parser.add_argument("--upload-size", type=int, default=64 * 1024, help="размер загружаемых файлов в байтах")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="файл для сохранения отчёта JSON")
+    parser.add_argument("--baseline", help="базовый отчёт JSON для проверки регрессий")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="допустимое ухудшение p95 и пропускной способности (доля, 0.2 = 20%%)")
+    args = parser.parse_args()
+    if args.concurrency < 1:
+        parser.error("--concurrency должно быть не меньше 1")
+    unknown_scenarios = set(args.scenarios) - set(SCENARIOS)
+    if unknown_scenarios:
+        parser.error(f"неизвестные сценарии: {', '.join(sorted(unknown_scenarios))}")
+    return args
+
+
+if __name__ == "__main__":
+    main(parse_args())
@@ -0,0 +1,166 @@
+"""
+Сравнение количества одновременных медленных соединений, которые выдерживают WSGI- и ASGI-развёртывания.
+
+Скрипт открывает C соединений, которые скачивают файл с ограниченной скоростью (как клиенты на медленном канале),
+и одновременно отправляет лёгкие пробные запросы. Если все рабочие процессы заняты передачей файлов,
+пробные запросы начинают ждать или отваливаться по таймауту - это и есть предел развёртывания.
+
+Пример (серверы запускаются отдельно):
+    gunicorn --workers 3 diploma_backend.wsgi:application --bind 127.0.0.1:8001
+    gunicorn --workers 1 -k uvicorn.workers.UvicornWorker diploma_backend.asgi:application --bind 127.0.0.1:8002
+
+    python -m benchmarks.asgi_vs_wsgi \\
+        --target wsgi=http://127.0.0.1:8001/api/download_file/ \\
+        --target asgi=http://127.0.0.1:8002/api/async/download_file/ \\
+        --probe-path /api/get_mycloud_user/ --file-id 1 --user-id 1 --concurrency 10,50,200
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from urllib.parse import urlsplit
+
+
+# функция отправляет HTTP/1.1-запрос в открытое соединение
+async def send_request(writer, method, url, body=b"", headers=None):
+    parts = urlsplit(url)
+    path = parts.path + (f"?{parts.query}" if parts.query else "")
+    request_headers = {
+        "Host": parts.netloc,
+        "Content-Length": str(len(body)),
+        "Connection": "close",
+    }
+    request_headers.update(headers or {})
+    head = f"{method} {path} HTTP/1.1\r\n" + "".join(f"{key}: {value}\r\n" for key, value in request_headers.items())
+    writer.write(head.encode("latin-1") + b"\r\n" + body)
+    await writer.drain()
+
+
+# функция скачивает файл, читая ответ с ограниченной скоростью, и возвращает количество полученных байт
+async def slow_download(url, body, read_rate, duration):
+    parts = urlsplit(url)
+    reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80, limit=16 * 1024)
+    received = 0
+    try:
+        await send_request(writer, "PATCH", url, body, {"Content-Type": "application/json"})
+        block_size = max(read_rate // 10, 1)
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            chunk = await reader.read(block_size)
+            if not chunk:
+                break
+            received += len(chunk)
+            await asyncio.sleep(0.1)
+    finally:
+        writer.close()
+    return received
+
+
+# функция выполняет один пробный запрос и возвращает время ответа в секундах или None при ошибке/таймауте
+async def probe(url, timeout):
+    parts = urlsplit(url)
+    started = time.perf_counter()
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(parts.hostname, parts.port or 80), timeout
+        )
+        try:
+            await send_request(writer, "GET", url)
+            status_line = await asyncio.wait_for(reader.readline(), timeout)
+            if not status_line.startswith(b"HTTP/1."):
+                return None
+        finally:
+            writer.close()
+    except (OSError, asyncio.TimeoutError):
+        return None
+    return time.perf_counter() - started
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+# функция проводит один замер: C медленных скачиваний и последовательные пробные запросы на их фоне
+async def run_level(download_url, probe_url, body, concurrency, read_rate, duration, probe_timeout):
+    downloads = [
+        asyncio.create_task(slow_download(download_url, body, read_rate, duration))
+        for _ in range(concurrency)
+    ]
+    await asyncio.sleep(min(1.0, duration / 4))
+
+    latencies = []
+    failures = 0
+    deadline = time.monotonic() + duration / 2
+    while time.monotonic() < deadline:
+        latency = await probe(probe_url, probe_timeout)
+        if latency is None:
+            failures += 1
+        else:
+            latencies.append(latency)
+
+    results = await asyncio.gather(*downloads, return_exceptions=True)
+    active_downloads = sum(1 for result in results if isinstance(result, int) and result > 0)
+
+    return {
+        "concurrency": concurrency,
+        "active_downloads": active_downloads,
+        "probe_requests": len(latencies) + failures,
+        "probe_failures": failures,
+        "probe_p50_ms": round(percentile(latencies, 0.5) * 1000, 2) if latencies else None,
+        "probe_p95_ms": round(percentile(latencies, 0.95) * 1000, 2) if latencies else None,
+        "probe_mean_ms": round(statistics.mean(latencies) * 1000, 2) if latencies else None,
+    }
+
+
+async def main(args):
+    body = json.dumps({
+        "user_id": args.user_id,
+        "file_id": args.file_id,
+        "is_user_files_for_admin": False
+    }).encode("utf-8")
+    levels = [int(level) for level in args.concurrency.split(",")]
+
+    report = {"read_rate": args.read_rate, "duration": args.duration, "targets": {}}
+    for target in args.target:
+        name, download_url = target.split("=", 1)
+        base = urlsplit(download_url)
+        probe_url = f"{base.scheme}://{base.netloc}{args.probe_path}"
+
+        target_results = []
+        for concurrency in levels:
+            target_results.append(await run_level(
+                download_url, probe_url, body, concurrency, args.read_rate, args.duration, args.probe_timeout
+            ))
+
+        # ёмкость - наибольшее число медленных соединений, при котором пробные запросы ещё успевают
+        capacity = 0
+        for level in target_results:
+            if level["probe_failures"] == 0 and level["probe_p95_ms"] is not None \
+                    and level["probe_p95_ms"] <= args.probe_timeout * 1000:
+                capacity = level["concurrency"]
+        report["targets"][name] = {"capacity": capacity, "levels": target_results}
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", action="append", required=True,
+                        help="имя=URL эндпоинта скачивания, например asgi=http://127.0.0.1:8002/api/async/download_file/")
+    parser.add_argument("--probe-path", default="/api/get_mycloud_user/")
+    parser.add_argument("--file-id", type=int, required=True)
+    parser.add_argument("--user-id", type=int, required=True)
+    parser.add_argument("--concurrency", default="10,50,100,200")
+    parser.add_argument("--read-rate", type=int, default=64 * 1024, help="скорость чтения одного клиента, байт/с")
+    parser.add_argument("--duration", type=float, default=20.0, help="длительность одного замера, с")
+    parser.add_argument("--probe-timeout", type=float, default=2.0, help="таймаут пробного запроса, с")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
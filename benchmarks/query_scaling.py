@@ -0,0 +1,171 @@
+"""
+Бенчмарк запросов к базе данных на большом наборе данных: для каждого шаблона поиска (список файлов
+пользователя, поиск по ссылке, проверка имени файла, поиск сессии) выводит время выполнения (p50/p95) и план
+запроса (EXPLAIN). С параметром --without-indexes те же замеры повторяются после удаления индексов по file_link,
+session_id и (user_id, file_name) внутри транзакции, которая затем откатывается, поэтому видно, какой выигрыш
+даёт каждый индекс.
+
+Набор данных создаётся командой generate_dataset, например 100 тыс. пользователей и 1 млн файлов:
+    python manage.py generate_dataset --settings=benchmarks.settings --users 100000 --files 1000000
+    python -m benchmarks.query_scaling --samples 200 --without-indexes
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import time
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection, transaction  # noqa: E402
+
+from app.models import User, File, Session  # noqa: E402
+from app.pagination import FILE_LIST_FIELDS, FILE_LIST_ORDERING  # noqa: E402
+from app.share_links import SHARE_LINK_SEPARATOR, get_share_link_lookup  # noqa: E402
+
+
+# индексы, выигрыш от которых проверяется: (таблица, столбцы)
+INDEXES_UNDER_TEST = (
+    (File._meta.db_table, ["file_link"]),
+    (Session._meta.db_table, ["session_id"]),
+    (File._meta.db_table, ["user_id", "file_name"]),
+)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+# функция выбирает случайные ключи поиска из набора данных
+def load_samples(samples, generator):
+    max_user_id = User.objects.order_by("-id").values_list("id", flat=True).first() or 0
+    max_file_id = File.objects.order_by("-id").values_list("id", flat=True).first() or 0
+    if not max_file_id:
+        raise SystemExit("Набор данных пуст: сначала выполните python manage.py generate_dataset")
+
+    file_ids = [generator.randint(1, max_file_id) for _ in range(samples)]
+    files = list(File.objects.filter(id__in=file_ids).values("id", "user_id", "file_name", "file_link"))
+    links = [file["file_link"] for file in files if file["file_link"]]
+    signed_links = [link for link in links if SHARE_LINK_SEPARATOR in link]
+
+    return {
+        "user_ids": [generator.randint(1, max_user_id) for _ in range(samples)],
+        "files": files,
+        "links": links or [""],
+        "signed_links": signed_links or [""],
+        "session_ids": list(
+            Session.objects.order_by("?").values_list("session_id", flat=True)[:samples]
+        ) or [""],
+    }
+
+
+# шаблоны поиска: имя -> функция, возвращающая queryset для случайного ключа
+def get_patterns(samples, generator):
+    return {
+        "get_user_files_all": lambda: File.objects.filter(user_id=generator.choice(samples["user_ids"])),
+        "get_user_files_first_page": lambda: (
+            File.objects.filter(user_id=generator.choice(samples["user_ids"]))
+            .order_by(*FILE_LIST_ORDERING).values(*FILE_LIST_FIELDS)[:50]
+        ),
+        "retrieve_by_link_legacy": lambda: File.objects.filter(file_link=generator.choice(samples["links"])),
+        "retrieve_by_link_signed": lambda: File.objects.filter(
+            **get_share_link_lookup(generator.choice(samples["signed_links"]))
+        ),
+        "file_name_postfix_check": lambda: (
+            lambda file: File.objects.filter(user_id=file["user_id"], file_name=file["file_name"])[:1]
+        )(generator.choice(samples["files"])),
+        "session_by_session_id": lambda: Session.objects.filter(
+            session_id=generator.choice(samples["session_ids"])
+        ),
+    }
+
+
+# функция возвращает план запроса; для SQLite план запрашивается с комментарием этапа, так как sqlite3 кэширует
+# подготовленные EXPLAIN-запросы по тексту и после удаления индексов вернул бы прежний план
+def get_query_plan(queryset, stage):
+    if connection.vendor != "sqlite":
+        return queryset.explain().splitlines()
+
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql} /* {stage} */", params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+# функция измеряет время выполнения шаблона поиска и возвращает статистику и план запроса
+def measure_pattern(make_queryset, repeats, stage):
+    timings = []
+    for _ in range(repeats):
+        queryset = make_queryset()
+        started = time.perf_counter()
+        list(queryset)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    return {
+        "mean_ms": round(statistics.fmean(timings), 3),
+        "p50_ms": round(percentile(timings, 0.50), 3),
+        "p95_ms": round(percentile(timings, 0.95), 3),
+        "plan": get_query_plan(make_queryset(), stage),
+    }
+
+
+# функция удаляет индексы, выигрыш от которых проверяется (вызывается внутри транзакции, которая откатывается)
+def drop_indexes_under_test():
+    dropped = []
+    with connection.cursor() as cursor:
+        for table, columns in INDEXES_UNDER_TEST:
+            constraints = connection.introspection.get_constraints(cursor, table)
+            for name, constraint in constraints.items():
+                if constraint["index"] and not constraint["unique"] and not constraint["primary_key"] \
+                        and constraint["columns"] == columns:
+                    cursor.execute(f"DROP INDEX {connection.ops.quote_name(name)}")
+                    dropped.append(name)
+    return dropped
+
+
+def main(args):
+    generator = random.Random(args.seed)
+    samples = load_samples(args.samples, generator)
+    patterns = get_patterns(samples, generator)
+
+    report = {
+        "database": connection.vendor,
+        "users": User.objects.count(),
+        "files": File.objects.count(),
+        "sessions": Session.objects.count(),
+        "patterns": {},
+    }
+    for name, make_queryset in patterns.items():
+        report["patterns"][name] = {"with_indexes": measure_pattern(make_queryset, args.samples, "with_indexes")}
+
+    if args.without_indexes:
+        with transaction.atomic():
+            report["dropped_indexes"] = drop_indexes_under_test()
+            for name, make_queryset in patterns.items():
+                report["patterns"][name]["without_indexes"] = measure_pattern(
+                    make_queryset, args.samples, "without_indexes"
+                )
+            # удаление индексов откатывается вместе с транзакцией
+            transaction.set_rollback(True)
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=200, help="количество замеров каждого шаблона")
+    parser.add_argument("--without-indexes", action="store_true",
+                        help="повторить замеры без индексов по file_link, session_id и (user_id, file_name)")
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main(parse_args())
@@ -0,0 +1,121 @@
+"""
+Сравнение задержки поиска файлов в плоском каталоге пользователя и во вложенных каталогах (user_<id>/ab/cd/<имя>).
+
+Скрипт создаёт во временном каталоге N пустых файлов в каждой из структур, затем измеряет время os.stat
+и open для случайных файлов и время чтения содержимого одного каталога, которое определяет скорость резервного
+копирования и обхода хранилища. Измерения выполняются при прогретом кэше каталогов ядра; разница между
+структурами сильнее всего проявляется на сетевых файловых системах и при холодном кэше.
+
+Пример:
+    python -m benchmarks.storage_layout --files 10000,100000 --lookups 20000 --levels 2
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+import uuid
+
+
+# функция возвращает относительный путь файла в плоской или вложенной структуре
+def make_path(object_name, levels):
+    shards = [object_name[level * 2:level * 2 + 2] for level in range(levels)]
+    return os.path.join(*shards, f"{object_name}.txt")
+
+
+# функция создаёт файлы и возвращает их пути
+def create_files(root, count, levels):
+    paths = []
+    for _ in range(count):
+        path = os.path.join(root, make_path(uuid.uuid4().hex, levels))
+        if levels:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb"):
+            pass
+        paths.append(path)
+    return paths
+
+
+# функция возвращает перцентиль списка значений
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+# функция измеряет задержку операции для случайных файлов в микросекундах
+def measure(paths, lookups, operation):
+    timings = []
+    for path in random.choices(paths, k=lookups):
+        started = time.perf_counter()
+        operation(path)
+        timings.append((time.perf_counter() - started) * 1_000_000)
+    return {
+        "mean_us": round(statistics.fmean(timings), 2),
+        "p50_us": round(percentile(timings, 0.50), 2),
+        "p95_us": round(percentile(timings, 0.95), 2),
+        "p99_us": round(percentile(timings, 0.99), 2),
+    }
+
+
+# функция открывает и закрывает файл
+def open_file(path):
+    with open(path, "rb"):
+        pass
+
+
+# функция создаёт одну структуру каталогов и измеряет операции с ней
+def benchmark_layout(base_dir, count, levels, lookups):
+    root = tempfile.mkdtemp(dir=base_dir)
+    try:
+        started = time.perf_counter()
+        paths = create_files(root, count, levels)
+        create_seconds = time.perf_counter() - started
+
+        # каталог, в котором лежит случайный файл: для плоской структуры это весь каталог пользователя
+        directory = os.path.dirname(random.choice(paths))
+        started = time.perf_counter()
+        entries_count = len(os.listdir(directory))
+        listdir_ms = (time.perf_counter() - started) * 1000
+
+        return {
+            "create_files_per_second": round(count / create_seconds),
+            "entries_per_directory": entries_count,
+            "listdir_ms": round(listdir_ms, 3),
+            "stat": measure(paths, lookups, os.stat),
+            "open": measure(paths, lookups, open_file),
+            "missing_stat": measure(
+                [path + ".missing" for path in paths], lookups, lambda path: os.path.exists(path)
+            ),
+        }
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main(args):
+    random.seed(args.seed)
+    report = []
+    for count in args.files:
+        report.append({
+            "files": count,
+            "flat": benchmark_layout(args.dir, count, 0, args.lookups),
+            f"sharded_{args.levels}_levels": benchmark_layout(args.dir, count, args.levels, args.lookups),
+        })
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=lambda value: [int(item) for item in value.split(",")], default=[10000],
+                        help="количество файлов через запятую, например 10000,100000")
+    parser.add_argument("--lookups", type=int, default=10000, help="количество случайных обращений")
+    parser.add_argument("--levels", type=int, default=2, help="количество уровней вложенных каталогов")
+    parser.add_argument("--dir", default=None, help="каталог для временных файлов (на тестируемой файловой системе)")
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main(parse_args())
@@ -0,0 +1,46 @@
+"""
+Настройки Django для тестов (python manage.py test --settings=diploma_backend.test_settings): те же приложения,
+middleware и URLconf, что и в diploma_backend.settings, но без файла .env и PostgreSQL.
+
+Основная база данных и реплика replica_1 - отдельные базы SQLite: тестовая реплика не зеркалит основную базу,
+поэтому тесты маршрутизатора могут проверить, с какой базы данных выполнено чтение. Тестовая основная база
+данных хранится в файле, а не в памяти, и транзакции сразу захватывают блокировку записи, как в настройках
+бенчмарков: тесты с параллельными запросами из нескольких потоков ждут блокировку, а не получают
+"database is locked". Медиафайлы, кэш превью и метрики находятся во временном каталоге TEST_DIR.
+"""
+import os
+import tempfile
+
+TEST_DIR = os.environ.setdefault("TEST_DIR", os.path.join(tempfile.gettempdir(), "mycloud_test"))
+
+# переменные, обязательные для diploma_backend.settings, получают значения по умолчанию
+for name, value in {
+    "SECRET_KEY": "test-secret-key-test-secret-key-test-secret-key-test",
+    "DEBUG": "False",
+    "ALLOWED_HOSTS": "*",
+    "DB_NAME": "",
+    "DB_USER": "",
+    "DB_PASSWORD": "",
+    "DB_HOST": "",
+    "DB_PORT": "5432",
+    "MEDIA_URL": "/media/",
+    "MEDIA_ROOT_NAME": os.path.join(TEST_DIR, "media"),
+}.items():
+    os.environ.setdefault(name, value)
+
+from diploma_backend.settings import *  # noqa: E402,F401,F403
+
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.path.join(TEST_DIR, "db.sqlite3"),
+        "OPTIONS": {"timeout": 30, "transaction_mode": "IMMEDIATE"},
+        "TEST": {"NAME": os.path.join(TEST_DIR, "test_db.sqlite3")},
+    },
+    "replica_1": {"ENGINE": "django.db.backends.sqlite3", "NAME": os.path.join(TEST_DIR, "replica.sqlite3")},
+}
+DATABASE_REPLICAS = ["replica_1"]
+
+MEDIA_ROOT = os.path.join(TEST_DIR, "media")
+PREVIEW_CACHE_ROOT = os.path.join(TEST_DIR, "preview_cache")
+METRICS_DIR = os.path.join(TEST_DIR, "metrics")
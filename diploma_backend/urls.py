@@ -18,8 +18,13 @@ from django.urls import path
 
 from rest_framework.routers import DefaultRouter
 
+from app.async_views import async_download_file, async_retrieve_by_link, async_get_mycloud_user, async_create_file
+
 from app.views import (UsersViewSet, FilesViewSet, get_link_for_file, retrieve_by_link, get_users,
-                       get_user_files, get_mycloud_user, check_session, download_file, login_view, logout_view)
+                       get_user_files, get_mycloud_user, check_session, download_file, login_view, logout_view,
+                       create_upload_session_view, get_upload_session_view, upload_chunk, finalize_upload_session,
+                       bulk_files_operation, download_zip, get_file_preview, download_by_link, metrics_view,
+                       get_storage_analytics_view, search_user_files)
 
 
 router = DefaultRouter()
@@ -29,14 +34,29 @@ router.register("api/files", FilesViewSet)
 
 urlpatterns = [
     path("api/get_link_for_file/", get_link_for_file),
+    path("api/files/bulk/", bulk_files_operation),
     path("api/retrieve_by_link/", retrieve_by_link),
     path("api/login/", login_view),
     path("api/logout/", logout_view),
     path("api/get_mycloud_user/", get_mycloud_user),
     path("api/check_session/", check_session),
     path("api/get_user_files/", get_user_files),
+    path("api/search_files/", search_user_files),
     path("api/get_users/", get_users),
     path("api/download_file/", download_file),
+    path("api/download_by_link/", download_by_link),
+    path("api/metrics", metrics_view),
+    path("api/storage_analytics/", get_storage_analytics_view),
+    path("api/download_zip/", download_zip),
+    path("api/file_preview/", get_file_preview),
+    path("api/async/download_file/", async_download_file),
+    path("api/async/retrieve_by_link/", async_retrieve_by_link),
+    path("api/async/get_mycloud_user/", async_get_mycloud_user),
+    path("api/async/files/", async_create_file),
+    path("api/upload_sessions/", create_upload_session_view),
+    path("api/upload_sessions/<str:upload_id>/", get_upload_session_view),
+    path("api/upload_sessions/<str:upload_id>/chunks/<int:chunk_number>/", upload_chunk),
+    path("api/upload_sessions/<str:upload_id>/finalize/", finalize_upload_session),
     path("api/users/", UsersViewSet.as_view({
         'post': 'create',
         'patch': 'update',
@@ -72,7 +72,7 @@ export function OneUser ({adminState, elem, navigate, setLastUsersUpload}) {
       <div className="one-user-cell">Admin права: {String(elem.admin)}</div>
       <button onClick={() => {changeAdminRights(elem, adminState["admin"])}}>Изменить права</button>
       <div className="one-user-cell">Размер файлового хранилища: {`${elem.files_storage_size / 1000000} MB`}</div>
-      <div className="one-user-cell">Количество файлов: {elem.files ? elem.files.length : "0"}</div>
+      <div className="one-user-cell">Количество файлов: {elem.files_count ?? (elem.files ? elem.files.length : "0")}</div>
       <div className="one-user-cell buttons-block">
         <button onClick={() => {goToUserFiles(elem.id, elem.name, adminState)}}>Перейти в файловое хранилище</button>
         <button onClick={() => {deleteUser(elem)}}>Удалить пользователя</button>
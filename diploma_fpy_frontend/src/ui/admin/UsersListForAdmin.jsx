@@ -19,7 +19,7 @@ function AdminIsAuthorized ({state}) {
         method: 'POST',
         credentials: 'include', 
         mode: 'cors',
-        body: JSON.stringify({request_from_admin: admin}),
+        body: JSON.stringify({request_from_admin: admin, file_stats: true}),
         headers: { 
           'Content-Type': 'application/json',
         }
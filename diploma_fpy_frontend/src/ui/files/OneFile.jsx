@@ -6,8 +6,10 @@ import { formatDate } from '../../common/formatDate';
 export function OneFile ({userId, isUserFilesForAdmin, fileLink, elem, setLastFileUpload}) {
   const [currentFileLink, setCurrentFileLink] = useState(fileLink);
   const [errorMsg, setErrorMsg] = useState("");
+  const [linkExpiry, setLinkExpiry] = useState("");
   
-  const onGetLink = async (fileId) => {
+  // expiresIn = 0 - бессрочная ссылка, без expiresIn ссылка действует срок, заданный на сервере (по умолчанию 30 дней)
+  const onGetLink = async (fileId, expiresIn) => {
     setErrorMsg("");
     console.log("Получение ссылки на файл");
     try {
@@ -17,7 +19,7 @@ export function OneFile ({userId, isUserFilesForAdmin, fileLink, elem, setLastFi
         headers: {
           "Content-Type": "application/json",
         },
-        body: JSON.stringify({file_id: fileId})
+        body: JSON.stringify(expiresIn === undefined ? {file_id: fileId} : {file_id: fileId, expires_in: expiresIn})
       });
 
       if (response.status === 200) {
@@ -25,6 +27,7 @@ export function OneFile ({userId, isUserFilesForAdmin, fileLink, elem, setLastFi
         if (responseJson.status_code === 200) {
           setErrorMsg("");
           setCurrentFileLink(`${import.meta.env.VITE_APP_BASE_URL_WEBSITE}share/${responseJson.file_link}`);          
+          setLinkExpiry(responseJson.expires_at ? `до ${formatDate(responseJson.expires_at * 1000)}` : "бессрочно");
           console.log(responseJson);
         } else {
           setErrorMsg(`Не удалось получить ссылку, ошибка: ${responseJson.error_message}`);
@@ -107,10 +110,12 @@ export function OneFile ({userId, isUserFilesForAdmin, fileLink, elem, setLastFi
       </div> 
       <span>Последняя дата скачивания: {elem.last_upload_date !== null ? formatDate(elem.last_upload_date) : ""}</span><br />
       <div>Комментарий к файлу: {elem.comment}</div>
-      <span>Ссылка на файл (если ссылка не отображается, нажмите на кнопку "Поделиться файлом"): </span>
+      <span>Ссылка на файл (если ссылка не отображается, нажмите на кнопку "Поделиться файлом"; ссылка действует 30 дней, бессрочную ссылку можно получить кнопкой "Бессрочная ссылка"): </span>
       <a href={currentFileLink}>{currentFileLink ? "Действующая ссылка" : ""}</a>
+      <span>{linkExpiry ? ` (действует ${linkExpiry})` : ""}</span>
       <div className="buttons-block">
         <button onClick={() => onGetLink(elem.id)}>Поделиться файлом</button>
+        <button onClick={() => onGetLink(elem.id, 0)}>Бессрочная ссылка</button>
         <button onClick={() => onDelete(elem.id)}>Удалить файл</button>
       </div>
       <div className="error-msg">{errorMsg}</div>      
@@ -20,7 +20,7 @@ export function Authorization ({ SetViewPage }) {
           "Content-Type": "application/json",
         },
         credentials: 'include',
-        body: JSON.stringify({login: storedLogin, password: storedPassword})
+        body: JSON.stringify({login: storedLogin})
       });
       if (response.status === 200) {
         const responseJson = await response.json();